@@ -1,24 +1,44 @@
 # app/api/v1/deps.py
 from __future__ import annotations
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional
 
 import jwt
-from jwt import PyJWKClient, InvalidTokenError
+from jwt import InvalidTokenError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.core.config import settings
+from app.core.jwks import JWKSCache, ClaimsCache
 
 bearer_scheme = HTTPBearer(auto_error=True)
 
-def _get_jwk_client() -> PyJWKClient:
+_jwks_lock = threading.Lock()
+_jwks_cache: Optional[JWKSCache] = None
+_claims_cache = ClaimsCache(max_size=settings.JWT_CLAIMS_CACHE_SIZE)
+
+def _get_jwks_cache() -> JWKSCache:
+    global _jwks_cache
     if not settings.KEYCLOAK_JWKS_URL:
         raise RuntimeError("Keycloak no está configurado (falta KEYCLOAK_JWKS_URL).")
-    return PyJWKClient(settings.KEYCLOAK_JWKS_URL)
+    with _jwks_lock:
+        if _jwks_cache is None or _jwks_cache.jwks_url != settings.KEYCLOAK_JWKS_URL:
+            _jwks_cache = JWKSCache(
+                settings.KEYCLOAK_JWKS_URL,
+                ttl=settings.KEYCLOAK_JWKS_TTL,
+                min_refresh_interval=settings.KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL,
+                retry_delay=settings.KEYCLOAK_JWKS_RETRY_DELAY,
+            )
+        return _jwks_cache
 
 def _decode_and_validate(token: str) -> Dict[str, Any]:
+    cached = _claims_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
-        signing_key = _get_jwk_client().get_signing_key_from_jwt(token).key
+        kid = jwt.get_unverified_header(token).get("kid")
+        signing_key = _get_jwks_cache().get_signing_key(kid).key
         claims = jwt.decode(
             token,
             signing_key,
@@ -33,6 +53,7 @@ def _decode_and_validate(token: str) -> Dict[str, Any]:
                 "verify_aud": True,
             },
         )
+        _claims_cache.put(token, claims)
         return claims
     except InvalidTokenError as e:
         raise HTTPException(
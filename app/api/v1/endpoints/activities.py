@@ -1,42 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from app.api.v1.deps import get_current_tenant_id
 from app.services.activity_manager import ACTIVITIES
 from app.models.schemas import ActivityInfo, ActivityDetail, ActivityInvokeRequest, InvokeResponse, QuestionDetail
 from app.services.pipeline_registry import PIPELINES
+from app.utils.streaming import sse_response
 
 router = APIRouter()
 
+def _not_modified(request: Request, response: Response) -> bool:
+    """Sets the catalog ETag; True if the client already has this version (If-None-Match)"""
+    etag = ACTIVITIES.etag()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")])
+
+def _304(response: Response) -> Response:
+    return Response(status_code=304, headers={"ETag": response.headers["ETag"], "Cache-Control": "no-cache"})
+
 @router.get("/activities", response_model=List[ActivityInfo])
-def list_activities():
+def list_activities(request: Request, response: Response):
+    if _not_modified(request, response):
+        return _304(response)
     activities = ACTIVITIES.list_activities()
     return activities
 
 @router.get("/activities/{activity_id}", response_model=ActivityDetail)
-def get_activity(activity_id: str):
+def get_activity(activity_id: str, request: Request, response: Response):
     activity = ACTIVITIES.get_activity(activity_id)
     if not activity:
         raise HTTPException(status_code=404, detail="Actividad no encontrada")
+    if _not_modified(request, response):
+        return _304(response)
     return activity
 
 @router.get("/activities/{activity_id}/questions/{question_id}", response_model=QuestionDetail)
-def get_question(activity_id: str, question_id: str):
+def get_question(activity_id: str, question_id: str, request: Request, response: Response):
     question = ACTIVITIES.get_question(activity_id, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Pregunta no encontrada")
+    if _not_modified(request, response):
+        return _304(response)
     return question
 
 @router.post("/activities/{activity_id}/questions/{question_id}/invoke", response_model=InvokeResponse)
-def invoke_pipeline(activity_id: str, question_id: str, req: ActivityInvokeRequest, tenant_id: str = Depends(get_current_tenant_id)):
+async def invoke_pipeline(activity_id: str, question_id: str, req: ActivityInvokeRequest, tenant_id: str = Depends(get_current_tenant_id)):
     
     try:
-        reg = PIPELINES.get("pipeline_historia")
+        pipeline = await run_in_threadpool(PIPELINES.get_instance, "pipeline_historia", tenant_id)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
     session_id = activity_id + "__" + question_id
 
-    pipeline_builder = reg.factory
-    pipeline = pipeline_builder(tenant_id)
-    output = pipeline.invoke(tenant_id, session_id, req.user_message, [m.model_dump() for m in req.messages])
+    output = await pipeline.ainvoke(tenant_id, session_id, req.user_message, [m.model_dump() for m in req.messages], stream=req.stream)
+    if req.stream:
+        return sse_response(output)
     return InvokeResponse(output=output)
@@ -1,40 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import InvokeRequest, InvokeResponse, PipelinesList, PipelineInfo, EndConversationRequest, EndConversationResponse
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from app.models.schemas import InvokeRequest, InvokeResponse, PipelinesList, PipelineInfo, EndConversationRequest, EndConversationResponse, JobInfo, EntityPage, RelationPage, TenantStatus
 from app.services.pipeline_registry import PIPELINES, RegisteredPipeline
-from app.pipelines.pipeline_guardar import pipeline_guardar_factory, PipelineGuardar
+from app.services.ingestion_queue import INGESTION
+from app.services.memory_graph import MEMORY_GRAPH
+from app.services.bulk_import import IMPORTS, parse_ndjson
+from app.pipelines.pipeline_guardar import pipeline_guardar_factory, PipelineGuardar, KG_BULK_IMPORT_JOB
 from app.pipelines.pipeline_preguntas import PipelinePreguntas, pipeline_preguntas_factory
 from app.pipelines.pipeline_recuperar import PipelineRecuperar, pipeline_recuperar_factory
 from app.api.v1.deps import get_current_tenant_id
+from app.services.tenant_manager import TENANTS, TenantNotReadyError
+from app.services.retrieval import retrieval_stats
+from app.utils.streaming import sse_response
 
 router = APIRouter()
 
-@router.post("/memories/invoke", response_model=InvokeResponse)
-def invoke_pipeline(
+@router.post("/memories/invoke", response_model=InvokeResponse, response_model_exclude_none=True)
+async def invoke_pipeline(
     req: InvokeRequest,
     tenant_id: str = Depends(get_current_tenant_id)
 ):
     
     try:
-        reg = PIPELINES.get(req.pipeline_id)
+        # Building a pipeline touches SQLite/Neo4j: do it off the event loop
+        pipeline = await run_in_threadpool(PIPELINES.get_instance, req.pipeline_id, tenant_id)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except TenantNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
 
-    pipeline_builder = reg.factory
-    pipeline = pipeline_builder(tenant_id)
-    output = pipeline.invoke(tenant_id, req.session_id or "default", req.user_message, [m.model_dump() for m in req.messages])
-    return InvokeResponse(output=output)
+    args = (tenant_id, req.session_id or "default", req.user_message, [m.model_dump() for m in req.messages])
+    # The threadpool copies the context: the searches append to this same list
+    collected = [] if req.debug and not req.stream else None
+    retrieval_stats.set(collected)
+    if hasattr(pipeline, "ainvoke"):
+        output = await pipeline.ainvoke(*args, stream=req.stream)
+    else:
+        output = await run_in_threadpool(pipeline.invoke, *args, stream=req.stream)
+
+    if req.stream:
+        return sse_response(output)
+    return InvokeResponse(output=output, metadata={"retrieval": collected} if collected is not None else None)
 
 @router.post("/memories/end", response_model=EndConversationResponse)
-def end_conversation(
+async def end_conversation(
     req: EndConversationRequest,
     tenant_id: str = Depends(get_current_tenant_id)
 ):
 
     try:
-        reg = PIPELINES.get(req.pipeline_id)
+        pipeline = await run_in_threadpool(PIPELINES.get_instance, req.pipeline_id, tenant_id)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    pipeline_builder = reg.factory
-    pipeline = pipeline_builder(tenant_id)
-    message = pipeline.finalizar_conversacion(tenant_id, req.session_id or "default")
-    return EndConversationResponse(message=message)
\ No newline at end of file
+    except TenantNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if hasattr(pipeline, "afinalizar_conversacion"):
+        return await pipeline.afinalizar_conversacion(tenant_id, req.session_id or "default")
+    return await run_in_threadpool(pipeline.finalizar_conversacion, tenant_id, req.session_id or "default")
+
+@router.post("/memories/import", response_model=JobInfo, status_code=202)
+async def import_memories(request: Request, tenant_id: str = Depends(get_current_tenant_id)):
+    """
+    Bulk import: NDJSON body, one {"text": ..., "images": [descriptions]} per line. Runs as a
+    background job; poll /memories/jobs/{job_id} for done/failed/total and throughput.
+    """
+    try:
+        memories = parse_ndjson((await request.body()).splitlines())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_id = await run_in_threadpool(INGESTION.enqueue, tenant_id, KG_BULK_IMPORT_JOB, {"memories": memories})
+    return INGESTION.get(job_id)
+
+@router.get("/memories/import/stats")
+def import_stats(tenant_id: str = Depends(get_current_tenant_id)):
+    """Memories imported and failed by this worker for the tenant, and memories per second"""
+    return IMPORTS.tenant(tenant_id)
+
+@router.get("/memories/status", response_model=TenantStatus)
+def memories_status(tenant_id: str = Depends(get_current_tenant_id)):
+    """Provisioning status of the caller's graph: poll it while /memories/* answer 503"""
+    status = TENANTS.status(tenant_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return status
+
+@router.get("/memories/jobs/{job_id}", response_model=JobInfo)
+def get_job(job_id: int, tenant_id: str = Depends(get_current_tenant_id)):
+    job = INGESTION.get(job_id, tenant_id=tenant_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+
+# ---------- Consultas directas al grafo (sin LLM) ----------
+async def _graph_query(coro):
+    try:
+        return await coro
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TenantNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+@router.get("/memories/graph/entities", response_model=EntityPage)
+async def lookup_entities(
+    q: str = Query(..., min_length=1, description="Names or words to look for"),
+    label: Optional[str] = None,
+    limit: int = Query(20, ge=1),
+    tenant_id: str = Depends(get_current_tenant_id),
+):
+    return await _graph_query(MEMORY_GRAPH.lookup(tenant_id, q, label=label, limit=limit))
+
+@router.get("/memories/graph/entities/{entity_id}/neighbors", response_model=RelationPage)
+async def entity_neighbors(
+    entity_id: str,
+    type: Optional[str] = Query(None, description="Relation type, e.g. KNOWS"),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    tenant_id: str = Depends(get_current_tenant_id),
+):
+    page = await _graph_query(MEMORY_GRAPH.neighbors(tenant_id, entity_id, rel_type=type, limit=limit, cursor=cursor))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Entidad no encontrada")
+    return page
+
+@router.get("/memories/graph/timeline", response_model=EntityPage)
+async def memory_timeline(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    tenant_id: str = Depends(get_current_tenant_id),
+):
+    return await _graph_query(MEMORY_GRAPH.timeline(
+        tenant_id, from_=from_.isoformat() if from_ else None, to=to.isoformat() if to else None, limit=limit, cursor=cursor
+    ))
+
+@router.get("/memories/graph/labels/{label}", response_model=EntityPage)
+async def list_entities(
+    label: str,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    tenant_id: str = Depends(get_current_tenant_id),
+):
+    return await _graph_query(MEMORY_GRAPH.list_entities(tenant_id, label, limit=limit, cursor=cursor))
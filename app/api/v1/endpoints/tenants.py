@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from app.models.schemas import TenantCreate, TenantInfo
+from app.models.schemas import TenantCreate, TenantInfo, TenantStatus
 from app.services.tenant_manager import TENANTS
 
 router = APIRouter()
@@ -9,3 +9,10 @@ def register_tenant(payload: TenantCreate):
     if not payload.tenant_id:
         raise HTTPException(status_code=400, detail="user_id is required")
     return TENANTS.register(payload)
+
+@router.get("/users/{tenant_id}/status", response_model=TenantStatus)
+def tenant_status(tenant_id: str):
+    status = TENANTS.status(tenant_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return status
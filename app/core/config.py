@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -16,13 +16,15 @@ class Settings(BaseSettings):
 
     OPENAI_API_KEY: str | None = None
     OLLAMA_HOST: str | None = None
+    OPENAI_MAX_CONNECTIONS: int = 200
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
 
     # Logging
     LOG_LEVEL: str = "INFO"
     
     #Persistence
     PROJECT_ROOT: Path = Path(__file__).resolve().parents[2]
-    # DB_DIR: Path = PROJECT_ROOT / "data"
+    DB_DIR: Path = PROJECT_ROOT / "data"
     # TENANT_DB_FILE: Path = DB_DIR / "engrammer_tenants.db"
 
     DATABASE_URL: str = f"sqlite:///{(PROJECT_ROOT / 'data' / 'engrammer.db').as_posix()}"
@@ -32,6 +34,37 @@ class Settings(BaseSettings):
     NEO4J_IMAGE: str = "neo4j"   
     DOCKER_NETWORK: str = "engrammer_net"     
     NEO4J_WITH_APOC: bool = True
+
+    # Auto-provisioned tenant graphs: "container" (one Neo4j container each) or "database" (one database
+    # each in the shared NEO4J_SHARED_URI server, served by a single driver; needs Neo4j Enterprise)
+    NEO4J_PROVISIONING_MODE: str = "container"
+    NEO4J_SHARED_URI: str = "bolt://localhost:7687"
+    NEO4J_SHARED_USER: str = "neo4j"
+    NEO4J_SHARED_PASSWORD: str = ""
+    NEO4J_SHARED_MAX_CONNECTION_POOL_SIZE: int = 100
+
+    # Container mode lifecycle: stop containers idle this long (0 = never) and restart them on the next
+    # request; keep NEO4J_WARM_POOL_SIZE booted spare containers for new tenants
+    NEO4J_HIBERNATE_AFTER: float = 86400.0
+    NEO4J_LIFECYCLE_INTERVAL: float = 300.0
+    NEO4J_WAKE_TIMEOUT: float = 120.0
+    # Last access is shared between workers through SQLite, written at most this often per tenant and worker
+    NEO4J_ACCESS_WRITE_INTERVAL: float = 60.0
+    NEO4J_WARM_POOL_SIZE: int = 2
+    # Concurrent background provisionings (container starts / CREATE DATABASE)
+    PROVISIONING_WORKERS: int = 8
+
+    # Tenant Neo4j drivers: LRU-bounded pool, idle close, liveness checks
+    NEO4J_MAX_DRIVERS: int = 200
+    NEO4J_DRIVER_IDLE_TTL: float = 1800.0
+    # Evicted drivers stay open this long so queries already running on them can finish
+    NEO4J_DRIVER_CLOSE_GRACE: float = 60.0
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 10
+    NEO4J_HEALTH_CHECK_INTERVAL: float = 60.0
+
+    # Pipeline instance cache (per pipeline_id + tenant_id)
+    PIPELINE_CACHE_MAX_SIZE: int = 256
+    PIPELINE_CACHE_IDLE_TTL: float = 1800.0
     
     #Keycloack
     KEYCLOAK_SERVER_URL: str | None = None
@@ -39,6 +72,113 @@ class Settings(BaseSettings):
     KEYCLOAK_CLIENT_ID: str | None = None
     KEYCLOAK_AUDIENCE: str | None = None
     KEYCLOAK_CLIENT_SECRET: str | None = None      
+
+    # In-memory session stores (conversations and per-session memories)
+    SESSION_MAX_TOTAL: int = 10000
+    SESSION_MAX_PER_TENANT: int = 50
+    SESSION_IDLE_TTL: float = 21600.0
+    # Turns kept per conversation and given to the model (0 = unlimited)
+    CONVERSATION_MAX_MESSAGES: int = 200
+
+    # Structured memory graph queries (/memories/graph): page size cap and response cache (entries, seconds)
+    MEMORY_QUERY_MAX_LIMIT: int = 100
+    MEMORY_QUERY_CACHE_SIZE: int = 5000
+    MEMORY_QUERY_CACHE_TTL: float = 30.0
+
+    # Conversation backend: memory | sqlite | redis
+    CONVERSATION_BACKEND: str = "memory"
+    CONVERSATION_SQLITE_PATH: Path = PROJECT_ROOT / "data" / "conversations.db"
+    # SQLite backend: seconds between purges of the sessions idle for SESSION_IDLE_TTL (done on write)
+    CONVERSATION_SQLITE_PURGE_INTERVAL: float = 300.0
+    REDIS_URL: str | None = None
+    CONVERSATION_REDIS_PREFIX: str = "engrammer:conv"
+
+    # Messages that end a memory conversation without asking the classifier (case/accent/punctuation-insensitive)
+    END_CONVERSATION_PHRASES: List[str] = [
+        "finalizar conversación",
+        "guardar recuerdo",
+        "guarda el recuerdo",
+        "eso es todo",
+        "no tengo nada más que añadir",
+        "ya está",
+    ]
+
+    # Activities catalog snapshot: seconds between checks of the catalog version (0 = never)
+    ACTIVITY_CACHE_TTL: float = 30.0
+
+    # Activities knowledge base (Milvus) and precomputed per-question context
+    MILVUS_URI: str = (PROJECT_ROOT / "data" / "milvus.db").as_posix()
+    KNOWLEDGE_BASE_COLLECTION: str = "knowledge_base_collection"
+    # Knowledge base engine: "milvus" or "numpy" (in-process index under KNOWLEDGE_BASE_NUMPY_DIR/<activity_id>)
+    KNOWLEDGE_BASE_BACKEND: str = "milvus"
+    # Per-activity override, e.g. {"mupac_guerras_cantabras": "numpy"}
+    KNOWLEDGE_BASE_BACKENDS: Dict[str, str] = {}
+    KNOWLEDGE_BASE_NUMPY_DIR: Path = PROJECT_ROOT / "data" / "knowledge_bases"
+    # Knowledge base seeding (app/scripts/milvus.py): PDFs, chunk size limits, chunks per embed/upsert batch
+    KNOWLEDGE_BASE_DOCS: str = (PROJECT_ROOT / "app" / "docs" / "guerras_cantabras" / "*.pdf").as_posix()
+    KB_CHUNK_MAX_CHARS: int = 2000
+    KB_CHUNK_MIN_CHARS: int = 20
+    KB_SEED_BATCH_SIZE: int = 128
+    KB_SEED_WORKERS: int = 4
+    # How often the Milvus corpus version is re-read (question contexts of an older seed are recomputed)
+    KB_VERSION_CHECK_INTERVAL: float = 30.0
+    QUESTION_CONTEXT_TOP_K: int = 3
+    # Below this cosine similarity between the last exchange and the question, topics are extracted live
+    QUESTION_CONTEXT_MIN_SIMILARITY: float = 0.3
+
+    # Threads for the concurrent graph/vector/full-text searches of a turn
+    RETRIEVAL_WORKERS: int = 16
+    # "hybrid": vector + full-text (Chunk.text and entity names) fused by reciprocal rank; "vector": embeddings only
+    RETRIEVAL_MODE: str = "hybrid"
+    RETRIEVAL_RRF_K: int = 60
+    # Graph expansion around the retrieved chunks: entities expanded, relations kept per node and hop (least
+    # connected neighbours first), nodes with more relations than EXPANSION_MAX_DEGREE are not expanded (hubs),
+    # relevance lost per extra hop, and the facts returned with their token budget
+    EXPANSION_MAX_HOPS: int = 2
+    EXPANSION_MAX_ENTITIES: int = 20
+    EXPANSION_MAX_FANOUT: int = 10
+    EXPANSION_MAX_DEGREE: int = 200
+    EXPANSION_HOP_DECAY: float = 0.5
+    EXPANSION_MAX_FACTS: int = 60
+    EXPANSION_TOKEN_BUDGET: int = 1500
+
+    # Embedding cache (memory LRU + optional SQLite store shared by workers)
+    EMBEDDING_CACHE_SIZE: int = 20000
+    EMBEDDING_CACHE_DISK: bool = True
+    EMBEDDING_CACHE_PATH: Path = PROJECT_ROOT / "data" / "embeddings.db"
+    EMBEDDING_BATCH_SIZE: int = 256
+
+    # Prompt history budget (tokens) per pipeline id; older turns are folded into a rolling summary
+    HISTORY_TOKEN_BUDGETS: Dict[str, int] = {
+        "pipeline_guardar": 4000,
+        "pipeline_historia": 3000,
+        "pipeline_preguntas": 2000,
+    }
+    HISTORY_TOKEN_BUDGET_DEFAULT: int = 4000
+    HISTORY_KEEP_RECENT: int = 6
+    HISTORY_SUMMARY_TOKENS: int = 400
+
+    # Background ingestion queue (KG build off the request path)
+    INGESTION_WORKERS: int = 2
+    INGESTION_MAX_ATTEMPTS: int = 5
+    INGESTION_RETRY_BACKOFF: float = 5.0
+    INGESTION_POLL_INTERVAL: float = 1.0
+    INGESTION_JOB_LEASE: float = 900.0
+    # A running job renews its lease this often; every worker requeues expired leases this often
+    INGESTION_HEARTBEAT_INTERVAL: float = 60.0
+    INGESTION_RECOVER_INTERVAL: float = 60.0
+    # Bulk memory import (POST /memories/import, app/scripts/import_memories.py): memories per import, memories
+    # per window (their chunk embeddings go out together, progress is saved after each) and concurrent extractions
+    BULK_IMPORT_MAX_ITEMS: int = 5000
+    BULK_IMPORT_WINDOW: int = 16
+    BULK_IMPORT_CONCURRENCY: int = 4
+
+    # JWKS / token validation caches
+    KEYCLOAK_JWKS_TTL: float = 3600.0
+    KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL: float = 30.0
+    # Keycloak unreachable after the TTL: keep the cached keys and retry after this many seconds
+    KEYCLOAK_JWKS_RETRY_DELAY: float = 30.0
+    JWT_CLAIMS_CACHE_SIZE: int = 1024
     
     @property
     def KEYCLOAK_ISSUER(self) -> str | None:
@@ -1,7 +1,22 @@
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine
 from app.core.config import settings
 
 engine = create_engine(settings.DATABASE_URL, echo=settings.SQLALCHEMY_ECHO)
 
+def ensure_columns(engine=engine) -> None:
+    """create_all does not alter existing tables: add the nullable columns introduced since they were created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
 def create_db_and_tables() -> None:
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    ensure_columns(engine)
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from neo4j_graphrag.embeddings.base import Embedder
+from neo4j_graphrag.exceptions import EmbeddingsGenerationError
+from neo4j_graphrag.utils.rate_limit import rate_limit_handler, async_rate_limit_handler
+
+from app.core.config import settings
+from app.core.llm import openai_client, async_openai_client
+
+Key = Tuple[str, str]  # (model, sha256(text))
+
+# neo4j-graphrag's OpenAIEmbeddings default, used by the Chunk vector index in every tenant graph
+GRAPH_EMBEDDING_MODEL = "text-embedding-ada-002"
+# Activities knowledge base (Milvus)
+KB_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _key(model: str, text: str) -> Key:
+    return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskStore:
+    """Embeddings persisted in SQLite (float32 blobs), shared by every worker process and restart."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Opened lazily (per thread) so importing the module does not touch the disk
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Sequence[Key]) -> Dict[Key, List[float]]:
+        found = {}
+        conn = self._conn()
+        for key in keys:
+            row = conn.execute("SELECT vector FROM embedding WHERE model = ? AND text_hash = ?", key).fetchone()
+            if row is not None:
+                found[key] = array("f", row[0]).tolist()
+        return found
+
+    def put_many(self, items: Dict[Key, List[float]]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, array("f", vector).tobytes()) for (model, text_hash), vector in items.items()],
+            )
+
+
+class EmbeddingCache:
+    """In-memory LRU of embeddings keyed by (model, text hash), in front of an optional disk store."""
+
+    def __init__(self, max_size: int, disk: Optional[EmbeddingDiskStore] = None):
+        self.max_size = max_size
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Key, List[float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Sequence[Key]) -> Dict[Key, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+
+        missing = [k for k in keys if k not in found]
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            self._remember(from_disk)
+            found.update(from_disk)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len([k for k in keys if k not in found])
+        return found
+
+    def put_many(self, items: Dict[Key, List[float]]) -> None:
+        self._remember(items)
+        if self.disk is not None and items:
+            self.disk.put_many(items)
+
+    def _remember(self, items: Dict[Key, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "disk": self.disk is not None}
+
+
+class CachedEmbedder(Embedder):
+    """
+    OpenAI embedder backed by EMBEDDINGS: only texts never seen before reach the API, and the
+    misses of a batch go out in a single request.
+    """
+
+    def __init__(self, model: str, cache: "EmbeddingCache" = None, batch_size: int = None):
+        super().__init__()
+        self.model = model
+        self.cache = EMBEDDINGS if cache is None else cache
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE if batch_size is None else batch_size
+
+    # ---------- Embedder ----------
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def async_embed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    # ---------- Batches ----------
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        for batch in self._batches(missing):
+            self._store(batch, self._create([texts[i] for i in batch]), keys, found)
+        return [found[k] for k in keys]
+
+    async def aembed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        # The cache may read and commit to SQLite (EmbeddingDiskStore): never on the event loop
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        for batch in self._batches(missing):
+            vectors = await self._acreate([texts[i] for i in batch])
+            await asyncio.to_thread(self._store, batch, vectors, keys, found)
+        return [found[k] for k in keys]
+
+    # ---------- Internos ----------
+    def _lookup(self, texts: Sequence[str]):
+        keys = [_key(self.model, t) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        # One index per distinct missing text
+        missing, seen = [], set()
+        for i, key in enumerate(keys):
+            if key not in found and key not in seen:
+                seen.add(key)
+                missing.append(i)
+        return keys, found, missing
+
+    def _batches(self, indexes: List[int]):
+        for start in range(0, len(indexes), self.batch_size):
+            yield indexes[start:start + self.batch_size]
+
+    def _store(self, batch: List[int], vectors: List[List[float]], keys: List[Key], found: Dict[Key, List[float]]) -> None:
+        new = {keys[i]: vector for i, vector in zip(batch, vectors)}
+        self.cache.put_many(new)
+        found.update(new)
+
+    @rate_limit_handler
+    def _create(self, texts: List[str]) -> List[List[float]]:
+        try:
+            response = openai_client.embeddings.create(input=texts, model=self.model)
+        except Exception as e:
+            raise EmbeddingsGenerationError(f"Failed to generate embedding with OpenAI: {e}") from e
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    @async_rate_limit_handler
+    async def _acreate(self, texts: List[str]) -> List[List[float]]:
+        try:
+            response = await async_openai_client.embeddings.create(input=texts, model=self.model)
+        except Exception as e:
+            raise EmbeddingsGenerationError(f"Failed to generate embedding with OpenAI: {e}") from e
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+EMBEDDINGS = EmbeddingCache(
+    max_size=settings.EMBEDDING_CACHE_SIZE,
+    disk=EmbeddingDiskStore(settings.EMBEDDING_CACHE_PATH) if settings.EMBEDDING_CACHE_DISK else None,
+)
+
+_embedders: Dict[str, CachedEmbedder] = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(model: str = GRAPH_EMBEDDING_MODEL) -> CachedEmbedder:
+    """Shared cached embedder per model"""
+    with _embedders_lock:
+        embedder = _embedders.get(model)
+        if embedder is None:
+            embedder = _embedders[model] = CachedEmbedder(model)
+        return embedder
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from jwt import PyJWK, PyJWKSet, PyJWKClientError, InvalidTokenError
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """Process-wide cache of the realm signing keys, indexed by `kid`."""
+
+    def __init__(
+        self,
+        jwks_url: str,
+        ttl: float = 3600.0,
+        min_refresh_interval: float = 30.0,
+        timeout: float = 5.0,
+        retry_delay: float = 30.0,
+    ):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetched_at: float = 0.0
+        self._retry_at: float = 0.0
+
+    def _fetch(self) -> Dict[str, PyJWK]:
+        try:
+            with urllib.request.urlopen(self.jwks_url, timeout=self.timeout) as resp:
+                data = json.load(resp)
+        except Exception as e:
+            raise PyJWKClientError(f'Fail to fetch data from the url, err: "{e}"')
+        jwk_set = PyJWKSet.from_dict(data)
+        return {k.key_id: k for k in jwk_set.keys if k.key_id}
+
+    def _refresh_locked(self) -> None:
+        now = time.monotonic()
+        try:
+            keys = self._fetch()
+        except PyJWKClientError as e:
+            if not self._keys:
+                raise
+            # IdP unreachable: keep serving the cached keys and try again in retry_delay
+            logger.warning("JWKS refresh failed, using cached keys: %s", e)
+            self._fetched_at = now - self.ttl + self.retry_delay
+            self._retry_at = now + self.retry_delay
+            return
+        self._keys = keys
+        self._fetched_at = now
+
+    def get_signing_key(self, kid: Optional[str]) -> PyJWK:
+        if not kid:
+            raise InvalidTokenError("Token header has no 'kid'")
+
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if not self._keys or age > self.ttl:
+                self._refresh_locked()
+                age = 0.0
+
+            key = self._keys.get(kid)
+            # Unknown kid: the realm may have rotated keys, refetch (rate limited; not while the IdP is failing)
+            if key is None and age > self.min_refresh_interval and time.monotonic() >= self._retry_at:
+                self._refresh_locked()
+                key = self._keys.get(kid)
+
+        if key is None:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = 0.0
+            self._retry_at = 0.0
+
+
+class ClaimsCache:
+    """Small LRU of already validated tokens (by hash), valid until the token's `exp`."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if self.max_size <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            exp, claims = entry
+            if time.time() >= exp:
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return dict(claims)
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._data[key] = (float(exp), dict(claims))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
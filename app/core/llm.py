@@ -1,8 +1,20 @@
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
 from app.core.config import settings
 import os
 
 if settings.OPENAI_API_KEY:
     os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
 
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
\ No newline at end of file
+openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+# Shared async client: one pooled connection set for every request handled by the event loop
+async_openai_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    ),
+)
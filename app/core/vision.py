@@ -1,4 +1,5 @@
-from ollama import Client as OllamaClient
+from ollama import Client as OllamaClient, AsyncClient as AsyncOllamaClient
 from app.core.config import settings
 
 ollama_client = OllamaClient(host=settings.OLLAMA_HOST) if settings.OLLAMA_HOST else None
+async_ollama_client = AsyncOllamaClient(host=settings.OLLAMA_HOST) if settings.OLLAMA_HOST else None
@@ -0,0 +1,25 @@
+from __future__ import annotations
+import hashlib
+import re
+
+import neo4j
+from neo4j.exceptions import Neo4jError
+
+
+def database_name(tenant_id: str) -> str:
+    """Valid Neo4j database name (lowercase ASCII, digits, dashes, <= 63 chars), unique per tenant id"""
+    slug = re.sub(r"[^a-z0-9]+", "-", tenant_id.lower()).strip("-")[:40]
+    digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:8]
+    return f"t-{slug}-{digest}" if slug else f"t-{digest}"
+
+
+def ensure_database_for_tenant(driver: neo4j.Driver, tenant_id: str) -> str:
+    """Creates the tenant database in the shared server (idempotent) and returns its name"""
+    name = database_name(tenant_id)
+    try:
+        driver.execute_query("CREATE DATABASE $name IF NOT EXISTS WAIT", name=name, database_="system")
+    except Neo4jError as e:
+        raise RuntimeError(
+            f"No se puede crear la base de datos {name} (NEO4J_PROVISIONING_MODE=database requiere Neo4j Enterprise): {e}"
+        ) from e
+    return name
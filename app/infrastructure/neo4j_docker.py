@@ -1,14 +1,21 @@
 from __future__ import annotations
 import os
+import time
 from pathlib import Path
-from secrets import token_urlsafe
-from typing import Optional, Tuple, Dict
+from secrets import token_hex, token_urlsafe
+from typing import Optional, Tuple, Dict, Set
 
 import docker
+import neo4j
 from docker.errors import NotFound, APIError, DockerException
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 
 from app.core.config import settings
 
+CONTAINER_PREFIX = "engrammer-neo4j-"
+# Booted spare containers, renamed to a tenant's container name when claimed
+WARM_PREFIX = f"{CONTAINER_PREFIX}warm-"
+
 def _client() -> docker.DockerClient:
     try:
         client = docker.from_env()
@@ -23,8 +30,11 @@ def _ensure_network(client: docker.DockerClient, name: str) -> None:
     except NotFound:
         client.networks.create(name, driver="bridge")
 
+def _tenant_base(tenant_id: str) -> Path:
+    return settings.DB_DIR / "neo4j" / tenant_id
+
 def _tenant_dirs(tenant_id: str) -> Dict[str, Path]:
-    base = settings.DB_DIR / "neo4j" / tenant_id
+    base = _tenant_base(tenant_id)
     data = base / "data"
     logs = base / "logs"
     plugins = base / "plugins"
@@ -33,7 +43,7 @@ def _tenant_dirs(tenant_id: str) -> Dict[str, Path]:
     return {"base": base, "data": data, "logs": logs, "plugins": plugins}
 
 def _container_name(tenant_id: str) -> str:
-    return f"engrammer-neo4j-{tenant_id}".replace("_", "-").lower()
+    return f"{CONTAINER_PREFIX}{tenant_id}".replace("_", "-").lower()
 
 def _port_mapping_for(container) -> Tuple[int, int]:
     container.reload()
@@ -60,12 +70,121 @@ def _volume_binds(dirs: Dict[str, Path]) -> Dict[str, dict]:
         dirs["plugins"].as_posix(): {"bind": "/plugins", "mode": "rw"},
     }
 
+def _bolt_uri(container) -> str:
+    bolt_port, _ = _port_mapping_for(container)
+    return f"bolt://localhost:{bolt_port}"
+
+def _container_password(container) -> Optional[str]:
+    for var in container.attrs.get("Config", {}).get("Env") or []:
+        if var.startswith("NEO4J_AUTH=neo4j/"):
+            return var.split("/", 1)[1]
+    return None
+
+def _run_container(client: docker.DockerClient, name: str, password: str, dirs: Dict[str, Path]):
+    return client.containers.run(
+        image=settings.NEO4J_IMAGE,
+        name=name,
+        detach=True,
+        environment=_env_vars(password),
+        ports={"7687/tcp": None, "7474/tcp": None},
+        volumes=_volume_binds(dirs),
+        network=settings.DOCKER_NETWORK,
+        restart_policy={"Name": "unless-stopped"},
+    )
+
+def wait_for_bolt(bolt_uri: str, auth: Tuple[str, str], timeout: Optional[float] = None) -> None:
+    """Blocks until the server accepts Bolt sessions (JVM boot after a start)"""
+    timeout = settings.NEO4J_WAKE_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
+        try:
+            with neo4j.GraphDatabase.driver(bolt_uri, auth=auth) as driver:
+                driver.verify_connectivity()
+            return
+        except (ServiceUnavailable, SessionExpired, TransientError) as e:
+            if time.monotonic() + delay > deadline:
+                raise RuntimeError(f"Neo4j en {bolt_uri} no responde tras {timeout:.0f}s") from e
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+def start_neo4j_container(tenant_id: str) -> Optional[Tuple[str, bool]]:
+    """
+    Starts the tenant container if it is stopped. Returns (bolt_uri, was_running), or None if the
+    tenant has no container. The host port can change on every start.
+    """
+    client = _client()
+    try:
+        container = client.containers.get(_container_name(tenant_id))
+    except NotFound:
+        return None
+    was_running = container.status == "running"
+    if not was_running:
+        container.start()
+    return _bolt_uri(container), was_running
+
+def stop_neo4j_container(tenant_id: str, timeout: int = 30) -> bool:
+    client = _client()
+    try:
+        container = client.containers.get(_container_name(tenant_id))
+    except NotFound:
+        return False
+    container.stop(timeout=timeout)
+    return True
+
+def running_tenant_containers() -> Set[str]:
+    """Names of the running tenant containers (warm spares excluded)"""
+    client = _client()
+    names = {c.name for c in client.containers.list(filters={"name": CONTAINER_PREFIX})}
+    return {n for n in names if not n.startswith(WARM_PREFIX)}
+
+def container_name(tenant_id: str) -> str:
+    return _container_name(tenant_id)
+
+def warm_container_count() -> int:
+    """Running spares: only those can be claimed"""
+    client = _client()
+    return len(client.containers.list(filters={"name": WARM_PREFIX, "status": "running"}))
+
+def start_warm_container() -> str:
+    """Restarts a stopped spare (host reboot, Docker restart) or boots a new one"""
+    client = _client()
+    _ensure_network(client, settings.DOCKER_NETWORK)
+    for container in client.containers.list(all=True, filters={"name": WARM_PREFIX, "status": "exited"}):
+        container.start()
+        return container.name
+    name = f"{WARM_PREFIX}{token_hex(4)}"
+    _run_container(client, name, token_urlsafe(16), _tenant_dirs(name))
+    return name
+
+def claim_warm_container(tenant_id: str) -> Optional[Tuple[str, str]]:
+    """
+    Renames a running spare to the tenant's container name; (bolt_uri, password) or None if there is
+    none. The tenant directory becomes a link to the spare's one, so a container recreated later by
+    ensure_neo4j_for_tenant mounts the same data.
+    """
+    client = _client()
+    for container in client.containers.list(filters={"name": WARM_PREFIX, "status": "running"}):
+        spare = container.name
+        try:
+            container.rename(_container_name(tenant_id))
+        except APIError:
+            continue  # claimed by another worker
+        # Relative link: valid wherever DB_DIR is mounted
+        _tenant_base(tenant_id).symlink_to(spare, target_is_directory=True)
+        return _bolt_uri(container), _container_password(container)
+    return None
+
+def _change_password(bolt_uri: str, old: str, new: str) -> None:
+    wait_for_bolt(bolt_uri, ("neo4j", old))
+    with neo4j.GraphDatabase.driver(bolt_uri, auth=("neo4j", old)) as driver:
+        driver.execute_query("ALTER CURRENT USER SET PASSWORD FROM $old TO $new", old=old, new=new, database_="system")
+
 def ensure_neo4j_for_tenant(tenant_id: str, existing_password: Optional[str]) -> Tuple[str, str, str]:
 
     client = _client()
     _ensure_network(client, settings.DOCKER_NETWORK)
 
-    dirs = _tenant_dirs(tenant_id)
     name = _container_name(tenant_id)
 
 
@@ -77,22 +196,22 @@ def ensure_neo4j_for_tenant(tenant_id: str, existing_password: Optional[str]) ->
     except NotFound:
         pass
 
+    # A tenant whose container was removed keeps its data directory: recreate over it, never claim a spare
+    if container is None and settings.NEO4J_WARM_POOL_SIZE and not _tenant_base(tenant_id).exists():
+        # Already booted: registration does not wait for a JVM start
+        claimed = claim_warm_container(tenant_id)
+        if claimed:
+            bolt_uri, password = claimed
+            if existing_password and existing_password != password:
+                _change_password(bolt_uri, password, existing_password)
+                password = existing_password
+            return bolt_uri, "neo4j", password
+
     if container is None:
 
         password = existing_password or "123456789"
 
-        ports = {"7687/tcp": None, "7474/tcp": None}
-
-        container = client.containers.run(
-            image=settings.NEO4J_IMAGE,
-            name=name,
-            detach=True,
-            environment=_env_vars(password),
-            ports=ports,
-            volumes=_volume_binds(dirs),
-            network=settings.DOCKER_NETWORK,
-            restart_policy={"Name": "unless-stopped"},
-        )
+        container = _run_container(client, name, password, _tenant_dirs(tenant_id))
     else:
         password = existing_password or "unknown"
 
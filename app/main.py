@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
@@ -7,6 +9,14 @@ from app.api.v1.endpoints.recuerdos import router as recuerdos_router
 from app.api.v1.endpoints.activities import router as activities_router
 from app.utils.logging import configure_logging
 from app.core.db import create_db_and_tables
+from app.services.ingestion_queue import INGESTION
+from app.services.tenant_manager import TENANTS
+from app.services.conversation_store import CONVERSATIONS
+from app.services.memory_store import MEMORIES
+from app.core.embeddings import EMBEDDINGS
+from app.services.retrieval import GRAPH_EXPANSION
+from app.services.memory_graph import MEMORY_GRAPH
+from app.services.bulk_import import IMPORTS
 
 configure_logging()
 create_db_and_tables()
@@ -14,10 +24,21 @@ create_db_and_tables()
 import sys
 print(sys.path)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await INGESTION.start()
+    await TENANTS.start()
+    yield
+    await TENANTS.stop()
+    await INGESTION.stop()
+    await TENANTS.aclose_all()
+    await asyncio.to_thread(TENANTS.close_all)
+
 app = FastAPI(
     title="ENGRAMMER API",
     version="1.0.0",
-    description="Multi-tenant FastAPI service exposing GraphRAG pipelines as models"
+    description="Multi-tenant FastAPI service exposing GraphRAG pipelines as models",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -37,3 +58,14 @@ app.include_router(activities_router, prefix="/v1", tags=["activities"])
 def health(): 
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["health"])
+def metrics():
+    return {
+        "conversations": CONVERSATIONS.stats(),
+        "memories": MEMORIES.stats(),
+        "embeddings": EMBEDDINGS.stats(),
+        "neo4j": TENANTS.stats(),
+        "graph_expansion": GRAPH_EXPANSION.stats(),
+        "memory_graph": MEMORY_GRAPH.stats(),
+        "imports": IMPORTS.stats(),
+    }
@@ -1,9 +1,12 @@
 from __future__ import annotations
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 class TenantRow(SQLModel, table=True):
     tenant_id: str = Field(primary_key=True, index=True)
     name: Optional[str] = None
@@ -12,9 +15,18 @@ class TenantRow(SQLModel, table=True):
     neo4j_uri: str
     neo4j_user: str
     neo4j_password: str
+    # Database inside the Neo4j server (None: the server's default database)
+    neo4j_database: Optional[str] = None
+    # Background provisioning: pending, starting, ready or failed (None: provisioned before it existed)
+    provisioning_status: Optional[str] = None
+    provisioning_error: Optional[str] = None
+    # Graph indexes/constraints version applied by TenantSchema (None: none yet)
+    schema_version: Optional[int] = None
+    # Last driver access by any worker (written at most every NEO4J_ACCESS_WRITE_INTERVAL); drives hibernation
+    last_access_at: Optional[datetime] = None
 
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class Activity(SQLModel, table=True):
@@ -33,3 +45,47 @@ class ActivityQuestion(SQLModel, table=True):
     contexto: Optional[str] = None
     pregunta: str
     respuesta_correcta: str
+
+
+
+class ActivityCatalogVersion(SQLModel, table=True):
+    """Single row (id=1) bumped on every catalog write, so cached snapshots in other processes notice"""
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+    updated_at: datetime = Field(default_factory=_utcnow)
+
+
+class QuestionContext(SQLModel, table=True):
+    """Precomputed RAG context of an ActivityQuestion (question embedding + top-k knowledge base passages)"""
+
+    activity_id: str = Field(primary_key=True)
+    question_id: str = Field(primary_key=True)
+
+    question_hash: str  # sha256 of contexto/pregunta/respuesta: stale rows are recomputed
+    embedding_model: str
+    embedding: str  # JSON list[float]
+    passages: str  # JSON list[str]
+    kb_version: Optional[str] = None  # KnowledgeBase.version() the passages were searched in
+
+    created_at: datetime = Field(default_factory=_utcnow)
+
+
+class IngestionJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tenant_id: str = Field(index=True)
+    kind: str
+    payload: str  # JSON
+
+    status: str = Field(default="pending", index=True)  # pending | running | done | failed
+    attempts: int = 0
+    error: Optional[str] = None
+    # Jobs with several items (bulk imports): items done and failed out of total, since started_at (first claim)
+    progress_total: Optional[int] = None
+    progress_done: Optional[int] = None
+    progress_failed: Optional[int] = None
+    started_at: Optional[datetime] = None
+
+    available_at: datetime = Field(default_factory=_utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
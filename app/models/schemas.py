@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, HttpUrl
 from typing import Any, Dict, List, Optional
+from datetime import datetime
 from app.models.db_models import ActivityQuestion
 
 # --- Tenant models ---
@@ -10,9 +11,16 @@ class TenantCreate(BaseModel):
     neo4j_uri: Optional[str] = Field(None, example="bolt://localhost:7687")
     neo4j_user: Optional[str] = Field(None)
     neo4j_password: Optional[str] = Field(None)
+    neo4j_database: Optional[str] = Field(None, description="Database in the Neo4j server (default database if empty)")
 
 class TenantInfo(BaseModel):
     tenant_id: str
+    status: Optional[str] = None
+
+class TenantStatus(BaseModel):
+    tenant_id: str
+    status: str = Field(..., description="pending | starting | ready | failed")
+    error: Optional[str] = None
 
 # --- Pipeline invocation ---
 class ChatMessage(BaseModel):
@@ -24,13 +32,17 @@ class InvokeRequest(BaseModel):
     user_message: str
     messages: List[ChatMessage] = Field(default_factory=list)
     session_id: Optional[str] = Field(default="default", description="Conversation id within tenant")
+    stream: bool = Field(default=False, description="Stream the answer as Server-Sent Events")
+    debug: bool = Field(default=False, description="Return the retrieval stats of each query in `metadata` (non-streamed answers)")
     
 class ActivityInvokeRequest(BaseModel):
     user_message: str
     messages: List[ChatMessage] = Field(default_factory=list)
+    stream: bool = Field(default=False, description="Stream the answer as Server-Sent Events")
 
 class InvokeResponse(BaseModel):
     output: str
+    metadata: Optional[Dict[str, Any]] = Field(default=None, description="Only with debug: {'retrieval': [per-query stats]}")
 
 class PipelineInfo(BaseModel):
     id: str
@@ -47,6 +59,44 @@ class EndConversationRequest(BaseModel):
 
 class EndConversationResponse(BaseModel):
     message: str
+    summary: Optional[str] = None
+    job_id: Optional[int] = Field(None, description="Background job that stores the memory in the graph")
+
+# --- Background jobs ---
+class JobInfo(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    total: Optional[int] = Field(None, description="Items of a bulk job")
+    done: Optional[int] = None
+    failed: Optional[int] = None
+    throughput: Optional[float] = Field(None, description="Items per second since the job started")
+    
+# --- Memory graph queries ---
+class GraphEntity(BaseModel):
+    id: str = Field(..., description="Neo4j elementId")
+    label: str
+    properties: Dict[str, Any]
+    score: Optional[float] = None
+
+class GraphRelation(BaseModel):
+    id: str
+    type: str
+    direction: str = Field(..., description="out | in, seen from the queried entity")
+    properties: Dict[str, Any]
+    node: GraphEntity
+
+class EntityPage(BaseModel):
+    items: List[GraphEntity]
+    next_cursor: Optional[str] = None
+
+class RelationPage(BaseModel):
+    items: List[GraphRelation]
+    next_cursor: Optional[str] = None
     
 # --- Activities and Questions ---
 class ActivityInfo(BaseModel):
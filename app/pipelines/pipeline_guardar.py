@@ -1,20 +1,45 @@
-from typing import List, Union, Generator, Iterator, Dict, Any
+from typing import List, Union, Generator, Iterator, AsyncIterator, Dict, Any
 import os
+import re
 import asyncio
+import logging
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
 import neo4j
-from app.core.llm import openai_client
-from app.core.vision import ollama_client
+from app.core.llm import openai_client, async_openai_client
+from app.core.embeddings import get_embedder
+from app.core.vision import ollama_client, async_ollama_client
 
 # neo4j-graphrag imports
-from neo4j_graphrag.indexes import create_vector_index
 from neo4j_graphrag.generation import RagTemplate, GraphRAG
 from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.embeddings.openai import OpenAIEmbeddings
 from neo4j_graphrag.experimental.components.text_splitters.fixed_size_splitter import FixedSizeSplitter
 from neo4j_graphrag.experimental.pipeline.kg_builder import SimpleKGPipeline
 
 from app.services.tenant_manager import TENANTS
+from app.services.tenant_schema import TENANT_SCHEMA
 from app.services.conversation_store import CONVERSATIONS
+from app.services.history_compactor import HistoryCompactor
+from app.services.ingestion_queue import INGESTION, current_job
+from app.services.bulk_import import IMPORTS, memory_text
+from app.services.memory_graph import MEMORY_GRAPH
+from app.services.pipeline_registry import PIPELINES
+from app.models.schemas import EndConversationResponse
+from app.utils.streaming import stream_chat_completion, astream_chat_completion, aiter_text
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+_END_PHRASES = {_normalize(p) for p in ["END_MEMORY", *settings.END_CONVERSATION_PHRASES]}
+
+# Runs the end-of-conversation classifier next to the chat completion in the sync path
+_CLASSIFIER_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fin-conversacion")
 
 class PipelineGuardar:
 
@@ -22,6 +47,68 @@ class PipelineGuardar:
     name = "Engrammer TEST PIPELINE"
     description = "Extracts memory entities/relations into Neo4j and chats to enrich details."
 
+    # Graph schema (also the source of the tenant graph indexes, see TenantSchema)
+    NODES = [
+        {"label": "Person", "properties": [
+            {"name": "uuid", "type": "STRING"},
+            {"name": "name", "type": "STRING"},
+            {"name": "birthDate", "type": "DATE"},
+            {"name": "gender", "type": "STRING"},
+            {"name": "description", "type": "STRING"},
+        ]},
+        {"label": "Event", "properties": [
+            {"name": "name", "type": "STRING"},
+            {"name": "type", "type": "STRING"},
+            {"name": "generalEvent", "type": "BOOLEAN"},
+            {"name": "description", "type": "STRING"},
+            {"name": "fromDate", "type": "DATE"},
+            {"name": "toDate", "type": "DATE"},
+        ]},
+        {"label": "Place", "properties": [
+            {"name": "name", "type": "STRING"},
+            {"name": "location", "type": "STRING"},
+            {"name": "description", "type": "STRING"},
+        ]},
+        {"label": "Object", "properties": [
+            {"name": "name", "type": "STRING"},
+            {"name": "type", "type": "STRING"},
+            {"name": "brand", "type": "STRING"},
+            {"name": "description", "type": "STRING"},
+            {"name": "acquisitionDate", "type": "DATE"},
+        ]},
+        {"label": "Emotion", "properties": [{"name": "name", "type": "STRING"}]},
+        {"label": "Smell", "properties": [{"name": "name", "type": "STRING"}]},
+        {"label": "Taste", "properties": [{"name": "name", "type": "STRING"}]},
+        {"label": "File", "properties": [
+            {"name": "name", "type": "STRING"},
+            {"name": "type", "type": "STRING"},
+            {"name": "url", "type": "STRING"},
+        ]},
+    ]
+
+    RELATIONS = [
+        {"label": "KNOWS", "properties": [
+            {"name": "relationship", "type": "STRING"},
+            {"name": "fromDate", "type": "DATE"},
+            {"name": "toDate", "type": "DATE"},
+        ]},
+        {"label": "LIVES_IN", "properties": [
+            {"name": "fromDate", "type": "DATE"},
+            {"name": "toDate", "type": "DATE"},
+        ]},
+        {"label": "OWNS", "properties": [
+            {"name": "fromDate", "type": "DATE"},
+            {"name": "toDate", "type": "DATE"},
+        ]},
+        {"label": "FEATURES_IN", "properties": [
+            {"name": "role", "type": "STRING"},
+        ]},
+        {"label": "TAKES_PLACE_IN", "properties": []},
+        {"label": "FEELS", "properties": []},
+        {"label": "ASSOCIATED_WITH", "properties": []},
+        {"label": "RELATED_TO", "properties": []},
+    ]
+
     def __init__(self, tenant_id: str):
         self.tenant_id = tenant_id
         tenant = TENANTS.get(tenant_id)
@@ -30,6 +117,9 @@ class PipelineGuardar:
 
         # Connect per-tenant
         self.neo4j_driver = TENANTS.get_driver(tenant_id)
+        self.neo4j_database = tenant.neo4j_database
+        # Entity lookup indexes before the KG builder MERGEs into the graph
+        TENANT_SCHEMA.try_ensure(tenant_id, self.neo4j_driver, self.neo4j_database)
 
         # LLMs / Embeddings
         self.llm = OpenAILLM(
@@ -40,70 +130,11 @@ class PipelineGuardar:
             },
         )
         self.clientOpenAI = openai_client
+        self.async_clientOpenAI = async_openai_client
         self.vision_llm = ollama_client
-        self.embedder = OpenAIEmbeddings()
-
-        # Graph schema 
-        self.NODES = [
-            {"label": "Person", "properties": [
-                {"name": "uuid", "type": "STRING"},
-                {"name": "name", "type": "STRING"},
-                {"name": "birthDate", "type": "DATE"},
-                {"name": "gender", "type": "STRING"},
-                {"name": "description", "type": "STRING"},
-            ]},
-            {"label": "Event", "properties": [
-                {"name": "name", "type": "STRING"},
-                {"name": "type", "type": "STRING"},
-                {"name": "generalEvent", "type": "BOOLEAN"},
-                {"name": "description", "type": "STRING"},
-                {"name": "fromDate", "type": "DATE"},
-                {"name": "toDate", "type": "DATE"},
-            ]},
-            {"label": "Place", "properties": [
-                {"name": "name", "type": "STRING"},
-                {"name": "location", "type": "STRING"},
-                {"name": "description", "type": "STRING"},
-            ]},
-            {"label": "Object", "properties": [
-                {"name": "name", "type": "STRING"},
-                {"name": "type", "type": "STRING"},
-                {"name": "brand", "type": "STRING"},
-                {"name": "description", "type": "STRING"},
-                {"name": "acquisitionDate", "type": "DATE"},
-            ]},
-            {"label": "Emotion", "properties": [{"name": "name", "type": "STRING"}]},
-            {"label": "Smell", "properties": [{"name": "name", "type": "STRING"}]},
-            {"label": "Taste", "properties": [{"name": "name", "type": "STRING"}]},
-            {"label": "File", "properties": [
-                {"name": "name", "type": "STRING"},
-                {"name": "type", "type": "STRING"},
-                {"name": "url", "type": "STRING"},
-            ]},
-        ]
-
-        self.RELATIONS = [
-            {"label": "KNOWS", "properties": [
-                {"name": "relationship", "type": "STRING"},
-                {"name": "fromDate", "type": "DATE"},
-                {"name": "toDate", "type": "DATE"},
-            ]},
-            {"label": "LIVES_IN", "properties": [
-                {"name": "fromDate", "type": "DATE"},
-                {"name": "toDate", "type": "DATE"},
-            ]},
-            {"label": "OWNS", "properties": [
-                {"name": "fromDate", "type": "DATE"},
-                {"name": "toDate", "type": "DATE"},
-            ]},
-            {"label": "FEATURES_IN", "properties": [
-                {"name": "role", "type": "STRING"},
-            ]},
-            {"label": "TAKES_PLACE_IN", "properties": []},
-            {"label": "FEELS", "properties": []},
-            {"label": "ASSOCIATED_WITH", "properties": []},
-            {"label": "RELATED_TO", "properties": []},
-        ]
+        self.async_vision_llm = async_ollama_client
+        self.embedder = get_embedder()
+        self.compactor = HistoryCompactor(self.id)
 
         self.prompt_template = '''
         You are an assistant that has to extract the elements of a memory and structure them correctly in a property graph to enable users to query past memories.
@@ -136,15 +167,17 @@ class PipelineGuardar:
         {text}
         '''
 
+        self.text_splitter = FixedSizeSplitter(chunk_size=5000, chunk_overlap=1000)
         self.kg_builder = SimpleKGPipeline(
             llm=self.llm,
             driver=self.neo4j_driver,
-            text_splitter=FixedSizeSplitter(chunk_size=5000, chunk_overlap=1000),
+            text_splitter=self.text_splitter,
             embedder=self.embedder,
             entities=self.NODES,
             relations=self.RELATIONS,
             prompt_template=self.prompt_template,
             from_pdf=False,
+            neo4j_database=self.neo4j_database,
         )
 
     def _system_preamble(self) -> dict:
@@ -169,10 +202,7 @@ class PipelineGuardar:
         if not history or history[0].get("role") != "system":
             CONVERSATIONS.append(tenant_id, session_id, **self._system_preamble())
 
-    def comprobar_fin_conversacion(self, text: str) -> bool:
-        resp = self.clientOpenAI.responses.create(
-            model="gpt-4o-mini",
-            instructions='''
+    FIN_CONVERSACION_INSTRUCTIONS = '''
                 Eres un asistente que esta escuchando una conversación con un usuario en el que el usuario está describiendo un recuerdo suyo. T
                 Tu tarea es identificar si el usuario quiere finalizar la conversación y guardar el recuerdo. El usuario tiene que expresar de forma explicita que quiere finalizar la conversación y guardar el recuerdo, por ejemplo, diciendo "finalizar conversación" o "guardar recuerdo".
                 El usuario también puede exxpresarlo diciendo que el recuerdo ya está completo o que no quiere añadir más información.
@@ -182,84 +212,304 @@ class PipelineGuardar:
                 Ejemplo de mensaje del usuario: "Eso es todo". Respuesta: True
                 Ejemplo de mensaje del usuario: "No tengo nada más que añadir". Respuesta: True
                 Ejemplo de mensaje del usuario: "Estuve con mis familiares en un concierto y lo pasamos genial". Respuesta: False
-            ''',
-            input=text,
-        ).output_text.strip().upper()
-        return resp == "TRUE" or text.strip().upper() == "END_MEMORY"
+            '''
 
-    def finalizar_conversacion(self, tenant_id: str, session_id: str) -> str:
-        history = CONVERSATIONS.get(tenant_id, session_id)
-        full_conversation = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history if m["role"] != "system")
-        resumen = self.clientOpenAI.responses.create(
-            model="gpt-4o-mini",
-            instructions='''
+    RESUMEN_INSTRUCTIONS = '''
                 Eres un asistente que tiene que resumir una conversación con un usuario.
                 En la conversación verás que el usuario ha ido describiendo un recuerdo suyo mientras que un asistente le ha ido preguntando por detalles relevantes.
                 Tu tarea es resumir el recuerdo de forma clara. Describe el recuerdo, no la interacción con el asistente. (Por ejemplo, no digas "el asistente le preguntó al usuario por el nombre del artista", sino "el usuario fue a un concierto de [nombre del artista]").
                 No añadas información que no haya sido proporcionada por el usuario. No inventes información que no haya sido proporcionada por el usuario.
                 El resumen tiene que contener todos los detalles del recuerdo que se describen en la conversación.
                 Además es posible que el recuerdo incluya descripciones de imágenes, si es así, debes incluir la información relevante de las imágenes en el resumen.
-                ''',
-            input=full_conversation,
-        ).output_text
+                '''
+
+    IMAGE_PROMPT = "Describe la imagen de forma detallada, incluyendo los objetos, personas, lugares y cualquier otro elemento relevante que aparezca en la imagen. Si aparecen personas no asumas las relaciones entre ellas. Responde solo con la descripción de la imagen."
+
+    @staticmethod
+    def _fin_conversacion_local(text: str) -> bool:
+        """Zero-cost check for the obvious cases: END_MEMORY and END_CONVERSATION_PHRASES"""
+        return _normalize(text) in _END_PHRASES
+
+    def comprobar_fin_conversacion(self, text: str) -> bool:
+        if self._fin_conversacion_local(text):
+            return True
+        resp = self.clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            instructions=self.FIN_CONVERSACION_INSTRUCTIONS,
+            input=text,
+        ).output_text.strip().upper()
+        return resp == "TRUE"
+
+    async def acomprobar_fin_conversacion(self, text: str) -> bool:
+        if self._fin_conversacion_local(text):
+            return True
+        resp = (await self.async_clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            instructions=self.FIN_CONVERSACION_INSTRUCTIONS,
+            input=text,
+        )).output_text.strip().upper()
+        return resp == "TRUE"
+
+    def _full_conversation(self, tenant_id: str, session_id: str) -> str:
+        history = CONVERSATIONS.get(tenant_id, session_id)
+        conversation = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history if m["role"] != "system")
 
-        # Persist into Neo4j
-        asyncio.run(self.kg_builder.run_async(text=resumen))
+        # Turns already trimmed by the store only survive in the rolling summary
+        if self.compactor.folded_out(tenant_id, session_id, history):
+            summary = self.compactor.summary(tenant_id, session_id)
+            conversation = f"Resumen de la conversación anterior: {summary}\n{conversation}"
+        return conversation
+
+    def _guardar_resumen(self, tenant_id: str, session_id: str, resumen: str) -> EndConversationResponse:
+        # Persist into Neo4j in the background: the KG build takes far longer than the request
+        job_id = INGESTION.enqueue(tenant_id, KG_BUILD_JOB, {"text": resumen, "session_id": session_id})
 
         # Reset conversation to fresh preamble
         CONVERSATIONS.clear(tenant_id, session_id)
+        self.compactor.reset(tenant_id, session_id)
         CONVERSATIONS.append(tenant_id, session_id, **self._system_preamble())
-        return f"Conversación finalizada. Resumen guardado: {resumen}"
+        return EndConversationResponse(
+            message=f"Conversación finalizada. Resumen guardado: {resumen}",
+            summary=resumen,
+            job_id=job_id,
+        )
 
-    def invoke(self, tenant_id: str, session_id: str, user_message: str, messages: List[dict]) -> str:
-        self._ensure_preamble(tenant_id, session_id)
+    def finalizar_conversacion(self, tenant_id: str, session_id: str) -> EndConversationResponse:
+        resumen = self.clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            instructions=self.RESUMEN_INSTRUCTIONS,
+            input=self._full_conversation(tenant_id, session_id),
+        ).output_text
+
+        return self._guardar_resumen(tenant_id, session_id, resumen)
+
+    async def afinalizar_conversacion(self, tenant_id: str, session_id: str) -> EndConversationResponse:
+        resumen = (await self.async_clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            instructions=self.RESUMEN_INSTRUCTIONS,
+            input=self._full_conversation(tenant_id, session_id),
+        )).output_text
 
+        return self._guardar_resumen(tenant_id, session_id, resumen)
+
+    def _extract_images(self, messages: List[dict]) -> List[str]:
         last_user_message = None
         for m in reversed(messages):
             if m.get("role") == "user":
                 last_user_message = m
                 break
 
-        has_image = False
         image_list = []
         if last_user_message:
             content = last_user_message.get("content")
             if isinstance(content, list):
                 for part in content:
                     if part.get("type") == "image_url":
-                        has_image = True
                         img_data = part["image_url"]["url"]
                         if img_data.startswith("data:image"):
                             img_data = img_data.split(",", 1)[1]
                         image_list.append(img_data)
+        return image_list
+
+    def _with_image_description(self, user_message: str, image_description: str) -> str:
+        return f"{user_message}. Además de este recuerdo, el usuario ha adjuntado una imagen. Esta es su descripción: {image_description}".strip()
 
-        if has_image and self.vision_llm:
-            image_messages = [{
-                "role": "user",
-                "content": "Describe la imagen de forma detallada, incluyendo los objetos, personas, lugares y cualquier otro elemento relevante que aparezca en la imagen. Si aparecen personas no asumas las relaciones entre ellas. Responde solo con la descripción de la imagen.",
-                "images": image_list,
-            }]
+    def _describe_images(self, user_message: str, messages: List[dict]) -> str:
+        image_list = self._extract_images(messages)
+        if image_list and self.vision_llm:
+            image_messages = [{"role": "user", "content": self.IMAGE_PROMPT, "images": image_list}]
             try:
                 image_description = self.vision_llm.chat(model="gemma3:4b", messages=image_messages).message.content
-                user_message = f"{user_message}. Además de este recuerdo, el usuario ha adjuntado una imagen. Esta es su descripción: {image_description}".strip()
+                user_message = self._with_image_description(user_message, image_description)
+            except Exception:
+                pass
+        return user_message
+
+    async def _adescribe_images(self, user_message: str, messages: List[dict]) -> str:
+        image_list = self._extract_images(messages)
+        if image_list and self.async_vision_llm:
+            image_messages = [{"role": "user", "content": self.IMAGE_PROMPT, "images": image_list}]
+            try:
+                image_description = (await self.async_vision_llm.chat(model="gemma3:4b", messages=image_messages)).message.content
+                user_message = self._with_image_description(user_message, image_description)
             except Exception:
                 pass
-        
-        if self.comprobar_fin_conversacion(user_message):
-            return self.finalizar_conversacion(tenant_id, session_id)
-        
-        # Store and chat
+        return user_message
+
+    def _store_response(self, tenant_id: str, session_id: str, response: str):
+        CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=response)
+
+    def _chat_history(self, tenant_id: str, session_id: str, user_message: str) -> List[dict]:
+        # The user turn is only stored once the classifier confirms the conversation goes on
+        return CONVERSATIONS.get(tenant_id, session_id) + [{"role": "user", "content": user_message}]
+
+    def _stream_unless_ending(self, tenant_id: str, session_id: str, user_message: str, history: List[dict], fin: Future) -> Iterator[str]:
+        chat = stream_chat_completion(
+            self.clientOpenAI,
+            on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+            model="gpt-4o-mini",
+            messages=history,
+        )
+        # Wait for the first token, then for the classifier, before emitting anything
+        first = next(chat, None)
+        if fin.result():
+            chat.close()
+            yield self.finalizar_conversacion(tenant_id, session_id).message
+            return
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+        if first is not None:
+            yield first
+        yield from chat
+
+    async def _astream_unless_ending(self, tenant_id: str, session_id: str, user_message: str, history: List[dict], fin: asyncio.Task) -> AsyncIterator[str]:
+        chat = astream_chat_completion(
+            self.async_clientOpenAI,
+            on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+            model="gpt-4o-mini",
+            messages=history,
+        )
+        try:
+            first = await anext(chat, None)
+            if await fin:
+                await chat.aclose()
+                yield (await self.afinalizar_conversacion(tenant_id, session_id)).message
+                return
+        finally:
+            if not fin.done():
+                fin.cancel()
         CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+        if first is not None:
+            yield first
+        async for delta in chat:
+            yield delta
+
+    def invoke(self, tenant_id: str, session_id: str, user_message: str, messages: List[dict], stream: bool = False) -> Union[str, Generator, Iterator]:
+        self._ensure_preamble(tenant_id, session_id)
+
+        if self._fin_conversacion_local(user_message):
+            message = self.finalizar_conversacion(tenant_id, session_id).message
+            return iter([message]) if stream else message
+
+        user_message = self._describe_images(user_message, messages)
+        history = self.compactor.compact(tenant_id, session_id, self._chat_history(tenant_id, session_id, user_message))
 
-        response = openai_client.chat.completions.create(
+        # Classifier and chat run concurrently; the answer is discarded if the conversation is ending
+        fin = _CLASSIFIER_POOL.submit(self.comprobar_fin_conversacion, user_message)
+
+        if stream:
+            return self._stream_unless_ending(tenant_id, session_id, user_message, history, fin)
+
+        response = self.clientOpenAI.chat.completions.create(
             model="gpt-4o-mini",
-            messages=CONVERSATIONS.get(tenant_id, session_id),
+            messages=history,
         ).choices[0].message.content
 
-        CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=response)
+        if fin.result():
+            return self.finalizar_conversacion(tenant_id, session_id).message
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+        self._store_response(tenant_id, session_id, response)
+
+        return response
+
+    async def ainvoke(self, tenant_id: str, session_id: str, user_message: str, messages: List[dict], stream: bool = False) -> Union[str, AsyncIterator]:
+        self._ensure_preamble(tenant_id, session_id)
+
+        if self._fin_conversacion_local(user_message):
+            message = (await self.afinalizar_conversacion(tenant_id, session_id)).message
+            return aiter_text(message) if stream else message
+
+        user_message = await self._adescribe_images(user_message, messages)
+        history = await self.compactor.acompact(tenant_id, session_id, self._chat_history(tenant_id, session_id, user_message))
+
+        # Classifier and chat run concurrently; the answer is discarded if the conversation is ending
+        fin = asyncio.create_task(self.acomprobar_fin_conversacion(user_message))
+
+        if stream:
+            return self._astream_unless_ending(tenant_id, session_id, user_message, history, fin)
+
+        try:
+            response = (await self.async_clientOpenAI.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=history,
+            )).choices[0].message.content
+        except BaseException:
+            fin.cancel()
+            raise
+
+        if await fin:
+            return (await self.afinalizar_conversacion(tenant_id, session_id)).message
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+        self._store_response(tenant_id, session_id, response)
 
         return response
 
+    async def aprecalcular_embeddings(self, texts: List[str]) -> int:
+        """Embeds the chunks of several texts in batched calls; the KG builder then finds them in the cache"""
+        chunks = []
+        for text in texts:
+            chunks += [chunk.text for chunk in (await self.text_splitter.run(text)).chunks]
+        await self.embedder.aembed_documents(chunks)
+        return len(chunks)
+
+async def _build_graph(pipeline: PipelineGuardar, text: str) -> None:
+    # The Neo4j writer and the entity resolver are sync: each build gets its own loop in a thread so
+    # the Neo4j round-trips never block the HTTP/SSE traffic of the app loop
+    await asyncio.to_thread(asyncio.run, pipeline.kg_builder.run_async(text=text))
+
+async def _kg_build_job(tenant_id: str, payload: Dict[str, Any]) -> None:
+    pipeline = await asyncio.to_thread(PIPELINES.get_instance, PipelineGuardar.id, tenant_id)
+    await _build_graph(pipeline, payload["text"])
+    MEMORY_GRAPH.invalidate(tenant_id)
+
+KG_BUILD_JOB = "kg_build"
+INGESTION.register_handler(KG_BUILD_JOB, _kg_build_job)
+
+async def _kg_bulk_import_job(tenant_id: str, payload: Dict[str, Any]) -> None:
+    """
+    Bulk import: windows of BULK_IMPORT_WINDOW memories, their chunk embeddings in batched calls and
+    up to BULK_IMPORT_CONCURRENCY extractions at a time. Progress is saved after every window, so a
+    retried job resumes where it stopped; a memory whose extraction fails is counted, not retried.
+    A window where every memory fails (Neo4j or OpenAI down) fails the job, which the queue retries
+    from that window.
+    """
+    job_id = current_job.get()
+    pipeline = await asyncio.to_thread(PIPELINES.get_instance, PipelineGuardar.id, tenant_id)
+    texts = [memory_text(m) for m in payload["memories"]]
+    job = await asyncio.to_thread(INGESTION.get, job_id) if job_id is not None else None
+    done, failed = (job.done or 0, job.failed or 0) if job else (0, 0)
+    sem = asyncio.Semaphore(settings.BULK_IMPORT_CONCURRENCY)
+
+    async def _extract(text: str) -> None:
+        async with sem:
+            await _build_graph(pipeline, text)
+
+    while done < len(texts):
+        started = time.monotonic()
+        window = texts[done:done + settings.BULK_IMPORT_WINDOW]
+        try:
+            await pipeline.aprecalcular_embeddings(window)
+        except Exception as e:
+            logger.warning("Batched chunk embeddings of tenant %s failed, embedding per chunk: %r", tenant_id, e)
+
+        results = await asyncio.gather(*(_extract(text) for text in window), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if len(errors) == len(window):
+            raise errors[0]
+        for error in errors:
+            logger.warning("Bulk import of a memory of tenant %s failed: %r", tenant_id, error)
+        done += len(window)
+        failed += len(errors)
+
+        IMPORTS.record(tenant_id, len(window) - len(errors), len(errors), time.monotonic() - started)
+        MEMORY_GRAPH.invalidate(tenant_id)
+        if job_id is not None:
+            await asyncio.to_thread(INGESTION.progress, job_id, done, len(texts), failed)
+
+KG_BULK_IMPORT_JOB = "kg_bulk_import"
+INGESTION.register_handler(KG_BULK_IMPORT_JOB, _kg_bulk_import_job)
+
 def pipeline_guardar_factory():
     def _builder(tenant_id: str) -> PipelineGuardar:
         return PipelineGuardar(tenant_id)
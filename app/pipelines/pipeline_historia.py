@@ -1,11 +1,20 @@
-from typing import List, Union, Generator, Iterator
+from typing import List, Union, Generator, Iterator, AsyncIterator
+import asyncio
+import logging
 
-from pymilvus import MilvusClient
+from app.core.config import settings
 from app.services.activity_manager import ACTIVITIES
+from app.services.knowledge_base import get_knowledge_base
+from app.services.question_context import QUESTION_CONTEXTS, QuestionContextInfo, cosine
 from app.services.tenant_manager import TENANTS
 from app.services.conversation_store import CONVERSATIONS
-from app.core.llm import openai_client
-from app.models.schemas import ActivityQuestion
+from app.services.history_compactor import HistoryCompactor
+from app.core.llm import openai_client, async_openai_client
+from app.core.embeddings import get_embedder, KB_EMBEDDING_MODEL
+from app.models.schemas import QuestionDetail
+from app.utils.streaming import stream_chat_completion, astream_chat_completion
+
+logger = logging.getLogger(__name__)
 
 
 class PipelineHistoria:
@@ -20,10 +29,9 @@ class PipelineHistoria:
         if not tenant:
             raise ValueError(f"Unknown tenant {tenant_id}")
         
-        self.milvus_client = MilvusClient(uri="/home/ubuntu/engrammer-api/data/milvus.db")
-        self.collection_name="knowledge_base_collection"
+        self.compactor = HistoryCompactor(self.id)
         
-    def _system_preamble(self, question: ActivityQuestion) -> dict:
+    def _system_preamble(self, question: QuestionDetail) -> dict:
         return {
             "role": "system",
             "content": f"""
@@ -38,49 +46,78 @@ class PipelineHistoria:
             """
         }
 
-    def _ensure_preamble(self, tenant_id: str, session_id: str):
+    def _question(self, session_id: str) -> QuestionDetail:
+        #Obtain question and activity key
+        activity_id, question_id = session_id.split("__")
+        question = ACTIVITIES.get_question(activity_id, question_id)
+
+        #check not None
+        if not question:
+            raise ValueError(f"Unknown question {question_id} for activity {activity_id}")
+        return question
+
+    def _ensure_preamble(self, tenant_id: str, session_id: str, question: QuestionDetail):
         history = CONVERSATIONS.get(tenant_id, session_id)
         if not history or history[0].get("role") != "system":
-            
-            #Obtain question and activity key
-            activity_id, question_id = session_id.split("__")
-            question = ACTIVITIES.get_question(activity_id, question_id)
-            
-            #check not None
-            if not question:
-                raise ValueError(f"Unknown question {question_id} for activity {activity_id}")
-            
             CONVERSATIONS.append(tenant_id, session_id, **self._system_preamble(question))
             
     def emb_text(self, text):
-        return (
-            openai_client.embeddings.create(input=text, model="text-embedding-3-small")
-            .data[0]
-            .embedding
-        )
-        
-    def get_rag_context(self, rag_topic: str) -> str:
-        search_res = self.milvus_client.search(
-            collection_name= self.collection_name,
-            data=[
-                self.emb_text(rag_topic)
-            ],  # Use the `emb_text` function to convert the question to an embedding vector
-            limit=3,  # Return top 3 results
-            search_params={"metric_type": "IP", "params": {}},  # Inner product distance
-            output_fields=["text"],  # Return the text field
-        )
+        return get_embedder(KB_EMBEDDING_MODEL).embed_query(text)
         
-        retrieved_lines_with_distances = [
-            (res["entity"]["text"], res["distance"]) for res in search_res[0]
-        ]
-        # print(json.dumps(retrieved_lines_with_distances, indent=4))
-        
-        context = "\n".join(
-            [line_with_distance[0] for line_with_distance in retrieved_lines_with_distances]
-        )
-        
-        return context
-            
+    def get_rag_context(self, rag_topic: str, activity_id: str = None) -> str:
+        return "\n".join(get_knowledge_base(activity_id).search(self.emb_text(rag_topic), limit=3))
+
+    def _probe_text(self, history: List[dict]) -> str:
+        # Last exchange: a bare "sí" says nothing about the topic, the assistant turn before it does
+        turns = [str(m["content"]) for m in history[1:] if m["role"] in ("user", "assistant")]
+        return "\n".join(turns[-2:])
+
+    def _on_topic(self, probe: List[float], precomputed: QuestionContextInfo) -> bool:
+        return cosine(probe, precomputed.embedding) >= settings.QUESTION_CONTEXT_MIN_SIMILARITY
+
+    def _rag_context(self, question: QuestionDetail, history: List[dict]) -> str:
+        """Precomputed passages of the question, or a live topic search if the conversation drifted away"""
+        try:
+            precomputed = QUESTION_CONTEXTS.get_or_compute(question)
+            if self._on_topic(self.emb_text(self._probe_text(history)), precomputed):
+                return precomputed.text()
+
+            rag_topic = openai_client.responses.create(
+                model="gpt-4o-mini",
+                input=self._topic_prompt(self._full_conversation(history)),
+                temperature=0,
+            ).output_text.strip()
+            return self.get_rag_context(rag_topic, question.activity_id)
+        except Exception:
+            logger.exception("Knowledge base context unavailable for %s/%s", question.activity_id, question.id)
+            return ""
+
+    async def _arag_context(self, question: QuestionDetail, history: List[dict]) -> str:
+        try:
+            # DB / Milvus are sync: keep them off the event loop
+            precomputed = await asyncio.to_thread(QUESTION_CONTEXTS.get_or_compute, question)
+            probe = await get_embedder(KB_EMBEDDING_MODEL).async_embed_query(self._probe_text(history))
+            if self._on_topic(probe, precomputed):
+                return precomputed.text()
+
+            rag_topic = (await async_openai_client.responses.create(
+                model="gpt-4o-mini",
+                input=self._topic_prompt(self._full_conversation(history)),
+                temperature=0,
+            )).output_text.strip()
+            return await asyncio.to_thread(self.get_rag_context, rag_topic, question.activity_id)
+        except Exception:
+            logger.exception("Knowledge base context unavailable for %s/%s", question.activity_id, question.id)
+            return ""
+
+    def _with_context(self, history: List[dict], rag_context: str) -> List[dict]:
+        # Sent with this turn only, never stored in the conversation
+        if not rag_context:
+            return history
+        return history[:1] + [{
+            "role": "system",
+            "content": f"Usa el siguiente contexto para responder a la pregunta del alumno. Si el contexto no es relevante, simplemente ignóralo y responde a la pregunta. <contexto> {rag_context} </contexto>",
+        }] + history[1:]
 
     def invoke(
         self,
@@ -88,42 +125,80 @@ class PipelineHistoria:
         session_id: str,
         user_message: str,
         messages: List[dict],
+        stream: bool = False,
     ) -> Union[str, Generator, Iterator]:
  
-        self._ensure_preamble(tenant_id, session_id)
+        question = self._question(session_id)
+        self._ensure_preamble(tenant_id, session_id, question)
 
         CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
         
-        history = CONVERSATIONS.get(tenant_id, session_id)
-        full_conversation = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history if m["role"] != "system")
+        history = self.compactor.compact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+        chat_messages = self._with_context(history, self._rag_context(question, history))
 
-        rag_topic = openai_client.responses.create(
+        if stream:
+            return stream_chat_completion(
+                openai_client,
+                on_complete=lambda text: self._store_response(tenant_id, session_id, text),
                 model="gpt-4o-mini",
-                input=f"Identifica la temática de los ultimos mensajes de la conversación encapsulada en <conversacion> para realizar una búsqueda en una base de datos vectorial. Se bastante se preciso al detallar la ultima tematica tratada. Devuelve unicamente el string de búsqueda.  <conversacion>{full_conversation}.</conversacion>",
-                temperature=0,
-            ).output_text.strip()
-        
-        rag_context = self.get_rag_context(rag_topic)
+                messages=chat_messages,
+            )
 
-        # CONVERSATIONS.append(tenant_id, session_id, role="system", content=f"Usa el siguiente contexto para responder a la pregunta del alumno. Si el contexto no es relevante, simplemente ignóralo y responde a la pregunta. <contexto> {rag_context} </contexto>")
-        
         response = openai_client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=CONVERSATIONS.get(tenant_id, session_id),
+            messages=chat_messages,
         ).choices[0].message.content
         
-        # response = openai_client.responses.create(
-        #         model="gpt-4o-mini",
-        #         input=f"Usa el siguiente contexto para responder a la pregunta del alumno. Si el contexto no es relevante, simplemente ignóralo y responde a la pregunta. <conversacion> {full_conversation} </conversacion> <contexto> {rag_context} </contexto>",
-        #         temperature=0,
-        #     ).output_text.strip()
+        self._store_response(tenant_id, session_id, response)
         
+        return response
+
+    async def ainvoke(
+        self,
+        tenant_id: str,
+        session_id: str,
+        user_message: str,
+        messages: List[dict],
+        stream: bool = False,
+    ) -> Union[str, AsyncIterator]:
+
+        question = await asyncio.to_thread(self._question, session_id)
+        self._ensure_preamble(tenant_id, session_id, question)
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+
+        history = await self.compactor.acompact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+        chat_messages = self._with_context(history, await self._arag_context(question, history))
+
+        if stream:
+            return astream_chat_completion(
+                async_openai_client,
+                on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+                model="gpt-4o-mini",
+                messages=chat_messages,
+            )
+
+        response = (await async_openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=chat_messages,
+        )).choices[0].message.content
+
+        self._store_response(tenant_id, session_id, response)
+
+        return response
+
+    def _full_conversation(self, history: List[dict]) -> str:
+        # Skips the question preamble but keeps the rolling summary of older turns (a system message)
+        return "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history[1:])
+
+    def _topic_prompt(self, full_conversation: str) -> str:
+        return f"Identifica la temática de los ultimos mensajes de la conversación encapsulada en <conversacion> para realizar una búsqueda en una base de datos vectorial. Se bastante se preciso al detallar la ultima tematica tratada. Devuelve unicamente el string de búsqueda.  <conversacion>{full_conversation}.</conversacion>"
+
+    def _store_response(self, tenant_id: str, session_id: str, response: str):
         if not response:
             raise ValueError("No response from LLM")
 
         CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=response)
-        
-        return response
 
 def pipeline_historia_factory():
     def _builder(tenant_id: str) -> PipelineHistoria:
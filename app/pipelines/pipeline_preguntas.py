@@ -1,15 +1,21 @@
-from typing import List, Union, Generator, Iterator
-from app.core.llm import openai_client
+from typing import List, Tuple, Union, Generator, Iterator, AsyncIterator
+import json
+import logging
+from app.core.llm import openai_client, async_openai_client
+from app.core.embeddings import get_embedder
+from app.core.config import settings
 from app.services.tenant_manager import TENANTS
+from app.services.tenant_schema import TENANT_SCHEMA, VECTOR_INDEX
 from app.services.conversation_store import CONVERSATIONS
 from app.services.memory_store import MEMORIES
+from app.services.history_compactor import HistoryCompactor
+from app.services.retrieval import GRAPH_EXPANSION, FulltextRetriever, FusedRetriever, text_record_formatter
+from app.utils.streaming import stream_response_text, astream_response_text, aiter_text
 
 # neo4j / graphrag
-from neo4j_graphrag.embeddings.openai import OpenAIEmbeddings
-from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.indexes import create_vector_index
 from neo4j_graphrag.retrievers import VectorRetriever, VectorCypherRetriever
-from neo4j_graphrag.generation import RagTemplate, GraphRAG
+
+logger = logging.getLogger(__name__)
 
 
 class PipelinePreguntas:
@@ -26,81 +32,46 @@ class PipelinePreguntas:
 
         # Connect per-tenant
         self.neo4j_driver = TENANTS.get_driver(tenant_id)
+        self.neo4j_database = tenant.neo4j_database
 
         # LLMs / Embeddings
-        self.embedder = OpenAIEmbeddings()
-        self.llm = OpenAILLM(
-            model_name="gpt-4o-mini",
-            model_params={"temperature": 0.0},
-        )
+        self.embedder = get_embedder()
 
-        try:
-            create_vector_index(
-                self.neo4j_driver,
-                name="text_embeddings",
-                label="Chunk",
-                embedding_property="embedding",
-                dimensions=1536,
-                similarity_fn="cosine",
-            )
-        except Exception:
-            pass
+        # Vector/full-text indexes once per tenant graph (no-op once applied)
+        TENANT_SCHEMA.try_ensure(tenant_id, self.neo4j_driver, self.neo4j_database)
 
         # --- Retrievers ---
         self.vector_retriever = VectorRetriever(
             self.neo4j_driver,
-            index_name="text_embeddings",
+            index_name=VECTOR_INDEX,
             embedder=self.embedder,
             return_properties=["text"],
+            result_formatter=text_record_formatter,
+            neo4j_database=self.neo4j_database,
         )
 
         self.graph_retriever = VectorCypherRetriever(
             self.neo4j_driver,
-            index_name="text_embeddings",
+            index_name=VECTOR_INDEX,
             embedder=self.embedder,
-            retrieval_query="""
-                //1) Go out 2-3 hops in the entity graph and get relationships
-                WITH node AS chunk
-                MATCH (chunk)<-[:FROM_CHUNK]-(entity)-[relList:!FROM_CHUNK]-{1,2}(nb)
-                UNWIND relList AS rel
-
-                //2) collect relationships and text chunks
-                WITH collect(DISTINCT chunk) AS chunks, collect(DISTINCT rel) AS rels
-
-                //3) format and return context
-                RETURN apoc.text.join([c in chunks | c.text], '\n') +
-                apoc.text.join([r in rels |
-                startNode(r).name+' - '+type(r)+' '+coalesce(r.details, '')+' -> '+endNode(r).name],
-                '\n') AS info
-             """
-        )
-
-        # --- Prompt template para RAG ---
-        self.rag_template = RagTemplate(
-            template="""
-            You are a memory assistant, you have to help people to remember their memories.
-            Answer the Question using the following Context. Only respond with information mentioned in the Context.
-            Do not inject any speculative information not mentioned. Give detailed answers.
-
-            # Question:
-            {query_text}
-
-            # Context:
-            {context}
-
-            # Answer:
-            """,
-            expected_inputs=["query_text", "context"],
+            retrieval_query=GRAPH_EXPANSION.QUERY,
+            result_formatter=GRAPH_EXPANSION.format,
+            neo4j_database=self.neo4j_database,
         )
 
-        self.vector_rag = GraphRAG(
-            llm=self.llm, retriever=self.vector_retriever, prompt_template=self.rag_template
+        # Graph + vector (+ full-text in hybrid mode) search with one embedding, straight into the quiz prompt
+        self.fulltext_retriever = (
+            FulltextRetriever(self.neo4j_driver, neo4j_database=self.neo4j_database)
+            if settings.RETRIEVAL_MODE.lower() == "hybrid" else None
         )
-        self.graph_rag = GraphRAG(
-            llm=self.llm, retriever=self.graph_retriever, prompt_template=self.rag_template
+        self.retriever = FusedRetriever(
+            self.embedder, self.graph_retriever, self.vector_retriever, top_k=5,
+            fulltext_retriever=self.fulltext_retriever, graph_params=GRAPH_EXPANSION.params,
         )
 
         self.clientOpenAI = openai_client
+        self.async_clientOpenAI = async_openai_client
+        self.compactor = HistoryCompactor(self.id)
 
     def _get_recuerdo(self, session_id: str) -> str:
         return MEMORIES.get(self.tenant_id, session_id)
@@ -109,85 +80,69 @@ class PipelinePreguntas:
         MEMORIES.set(self.tenant_id, session_id, value)
 
 
-    def invoke(
-        self,
-        tenant_id: str,
-        session_id: str,
-        user_message: str,
-        messages: List[dict],
-    ) -> Union[str, Generator, Iterator]:
-
-        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
-
-        current_recuerdo = self._get_recuerdo(session_id)
-
-        prompt_gate = f"""
+    RESOLVER_SCHEMA = {
+        "type": "json_schema",
+        "name": "resolucion_turno",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "same_memory": {"type": "boolean"},
+                "topic": {"type": "string"},
+            },
+            "required": ["same_memory", "topic"],
+            "additionalProperties": False,
+        },
+    }
+
+    def _resolver_prompt(self, history: List[dict], current_recuerdo: str) -> str:
+        return f"""
         Eres un asistente que está manteniendo una conversación con un usuario sobre sus propios recuerdos.
 
         Este es el contexto, la conversación y el recuerdo.
 
-        Conversación: {CONVERSATIONS.get(tenant_id, session_id)}
+        Conversación: {history}
         
         Recuerdo: {current_recuerdo}
         
-        Tu tarea es identificar si el usuario quiere seguir hablando del mismo recuerdo o si quiere hablar de un recuerdo diferente.
+        Tienes dos tareas:
         
-        También tienes que identificar si en el recuerdo se encuentra el contenido del que quiere hablar el usuario. 
+        1. same_memory: identifica si el usuario quiere seguir hablando del mismo recuerdo o si quiere hablar de un recuerdo diferente, y si en el recuerdo se encuentra el contenido del que quiere hablar el usuario.
+        Si el usuario quiere cambiar de recuerdo, o el tema del que quiere hablar no se encuentra en el recuerdo, devuelve false.
+        Devuelve true solo si claramente el usuario quiere hablar del mismo recuerdo y la conversación esta relacionada con el recuerdo; si el usuario da cualquier señal de querer hablar de otra cosa devuelve false.
         
-        Si el usuario quiere cambiar de recuerdo, o el tema del que quiere hablar no se encuentra en el recuerdo, devuelve False.
-        
-        Si el usuario quiere continuar hablando del mismo recuerdo y la conversación esta relacionada con el recuerdo, devuelve True.
-        
-        Responde True solo si claramente el usuario quiere hablar del mismo recuerdo, si el usuario da cualquier señal de querer hablar de otra cosa responde False.
-        
-        Devuelve exclusivamente True o False.
+        2. topic: identifica la temática del recuerdo del que quiere hablar el usuario ahora. Únicamente la temática, ningún texto adicional. Por ejemplo si el usuario dice 'Preguntame sobre mi viaje a Paris' la temática es 'viaje a Paris'.
         """
-        gate = self.clientOpenAI.responses.create(
+
+    def _parse_resolucion(self, output: str, user_message: str) -> Tuple[bool, str]:
+        try:
+            data = json.loads(output)
+            return bool(data["same_memory"]), str(data["topic"]).strip() or user_message
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Unparseable gate/topic output: %r", output)
+            return False, user_message
+
+    def _resolver_turno(self, history: List[dict], current_recuerdo: str, user_message: str) -> Tuple[bool, str]:
+        """Gate (same memory?) and topic extraction in a single structured call"""
+        output = self.clientOpenAI.responses.create(
             model="gpt-4o-mini",
-            input=prompt_gate,
+            input=self._resolver_prompt(history, current_recuerdo),
+            text={"format": self.RESOLVER_SCHEMA},
             temperature=0,
-        ).output_text.strip()
-
-        if gate != "True" or not current_recuerdo:
-            topic = self.clientOpenAI.responses.create(
-                model="gpt-4o-mini",
-                input=f"Estas manteniendo una conversación con un usuario sobre sus recuerdos, esta ha sido la conversación {CONVERSATIONS.get(tenant_id, session_id)}. Identifica la temática del recuerdo del que quiere hablar el usuario ahora. Únicamente responde con la temática, ningún texto adicional. Por ejemplo si el usuario dice 'Preguntame sobre mi viaje a Paris' responde con 'viaje a Paris'",
-                temperature=0,
-            ).output_text.strip()
-
-            try:
-                result = self.graph_rag.search(
-                    f"Hablame sobre {topic}", retriever_config={"top_k": 5}
-                )
-                nuevo_recuerdo = (result.answer or "").strip()
-            except Exception:
-                nuevo_recuerdo = ""
-
-            if not nuevo_recuerdo:
-                try:
-                    result = self.vector_rag.search(
-                        f"Hablame sobre {topic}", retriever_config={"top_k": 5}
-                    )
-                    nuevo_recuerdo = (result.answer or "").strip()
-                except Exception:
-                    nuevo_recuerdo = ""
-
-            if not nuevo_recuerdo:
-                assistant_msg = (
-                    "No he podido encontrar detalles de ese recuerdo aún. "
-                )
-                CONVERSATIONS.append(
-                    tenant_id, session_id, role="assistant", content=assistant_msg
-                )
-                return assistant_msg
-
-            self._set_recuerdo(session_id, nuevo_recuerdo)
-            current_recuerdo = nuevo_recuerdo
-            
-            CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+        ).output_text
+        return self._parse_resolucion(output, user_message)
 
+    async def _aresolver_turno(self, history: List[dict], current_recuerdo: str, user_message: str) -> Tuple[bool, str]:
+        output = (await self.async_clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            input=self._resolver_prompt(history, current_recuerdo),
+            text={"format": self.RESOLVER_SCHEMA},
+            temperature=0,
+        )).output_text
+        return self._parse_resolucion(output, user_message)
 
-        prompt_quiz = f"""
+    def _quiz_prompt(self, history: List[dict], current_recuerdo: str) -> str:
+        return f"""
         
         Eres un asistente que tiene que jugar a un juego con un usuario. 
         
@@ -213,10 +168,69 @@ class PipelinePreguntas:
         
         Este es el recuerdo sobre el que tienes que preguntar: {current_recuerdo}
         
-        Esta es la conversación con el usuario: {CONVERSATIONS.get(tenant_id, session_id)}
+        Esta es la conversación con el usuario: {history}
         
         """
 
+    def _buscar_recuerdo(self, topic: str) -> str:
+        return self.retriever.search(f"Hablame sobre {topic}").text()
+
+    async def _abuscar_recuerdo(self, topic: str) -> str:
+        return (await self.retriever.asearch(f"Hablame sobre {topic}")).text()
+
+    def _sin_recuerdo(self, tenant_id: str, session_id: str) -> str:
+        assistant_msg = (
+            "No he podido encontrar detalles de ese recuerdo aún. "
+        )
+        CONVERSATIONS.append(
+            tenant_id, session_id, role="assistant", content=assistant_msg
+        )
+        return assistant_msg
+
+    def _store_response(self, tenant_id: str, session_id: str, response: str):
+        CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=response)
+
+    def invoke(
+        self,
+        tenant_id: str,
+        session_id: str,
+        user_message: str,
+        messages: List[dict],
+        stream: bool = False,
+    ) -> Union[str, Generator, Iterator]:
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+
+        current_recuerdo = self._get_recuerdo(session_id)
+        history = self.compactor.compact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+
+        same_memory, topic = self._resolver_turno(history, current_recuerdo, user_message)
+
+        if not same_memory or not current_recuerdo:
+            nuevo_recuerdo = self._buscar_recuerdo(topic)
+
+            if not nuevo_recuerdo:
+                assistant_msg = self._sin_recuerdo(tenant_id, session_id)
+                return iter([assistant_msg]) if stream else assistant_msg
+
+            self._set_recuerdo(session_id, nuevo_recuerdo)
+            current_recuerdo = nuevo_recuerdo
+            
+            CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+            history = self.compactor.compact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+
+        prompt_quiz = self._quiz_prompt(history, current_recuerdo)
+
+        if stream:
+            return stream_response_text(
+                self.clientOpenAI,
+                on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+                model="gpt-4o-mini",
+                instructions=prompt_quiz,
+                input=user_message,
+                temperature=0,
+            )
+
         response = self.clientOpenAI.responses.create(
             model="gpt-4o-mini",
             instructions=prompt_quiz,
@@ -224,7 +238,58 @@ class PipelinePreguntas:
             temperature=0,
         ).output_text
 
-        CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=response)
+        self._store_response(tenant_id, session_id, response)
+        return response
+
+    async def ainvoke(
+        self,
+        tenant_id: str,
+        session_id: str,
+        user_message: str,
+        messages: List[dict],
+        stream: bool = False,
+    ) -> Union[str, AsyncIterator]:
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+
+        current_recuerdo = self._get_recuerdo(session_id)
+        history = await self.compactor.acompact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+
+        same_memory, topic = await self._aresolver_turno(history, current_recuerdo, user_message)
+
+        if not same_memory or not current_recuerdo:
+            nuevo_recuerdo = await self._abuscar_recuerdo(topic)
+
+            if not nuevo_recuerdo:
+                assistant_msg = self._sin_recuerdo(tenant_id, session_id)
+                return aiter_text(assistant_msg) if stream else assistant_msg
+
+            self._set_recuerdo(session_id, nuevo_recuerdo)
+            current_recuerdo = nuevo_recuerdo
+
+            CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+            history = await self.compactor.acompact(tenant_id, session_id, CONVERSATIONS.get(tenant_id, session_id))
+
+        prompt_quiz = self._quiz_prompt(history, current_recuerdo)
+
+        if stream:
+            return astream_response_text(
+                self.async_clientOpenAI,
+                on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+                model="gpt-4o-mini",
+                instructions=prompt_quiz,
+                input=user_message,
+                temperature=0,
+            )
+
+        response = (await self.async_clientOpenAI.responses.create(
+            model="gpt-4o-mini",
+            instructions=prompt_quiz,
+            input=user_message,
+            temperature=0,
+        )).output_text
+
+        self._store_response(tenant_id, session_id, response)
         return response
 
 
@@ -1,12 +1,15 @@
-from typing import List, Union, Generator, Iterator
+from typing import List, Union, Generator, Iterator, AsyncIterator
+from app.core.llm import openai_client, async_openai_client
+from app.core.embeddings import get_embedder
+from app.core.config import settings
 from app.services.tenant_manager import TENANTS
+from app.services.tenant_schema import TENANT_SCHEMA, VECTOR_INDEX
 from app.services.conversation_store import CONVERSATIONS
+from app.services.retrieval import GRAPH_EXPANSION, FulltextRetriever, FusedRetriever, text_record_formatter
+from app.utils.streaming import stream_chat_completion, astream_chat_completion, aiter_text
 
-from neo4j_graphrag.embeddings.openai import OpenAIEmbeddings
-from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.indexes import create_vector_index
 from neo4j_graphrag.retrievers import VectorRetriever, VectorCypherRetriever
-from neo4j_graphrag.generation import RagTemplate, GraphRAG
+from neo4j_graphrag.generation import RagTemplate
 
 
 class PipelineRecuperar:
@@ -22,51 +25,29 @@ class PipelineRecuperar:
             raise ValueError(f"Unknown tenant {tenant_id}")
 
         self.neo4j_driver = TENANTS.get_driver(tenant_id)
+        self.neo4j_database = tenant.neo4j_database
 
-        self.embedder = OpenAIEmbeddings()
-        self.llm = OpenAILLM(
-            model_name="gpt-4o-mini",
-            model_params={"temperature": 0.0},
-        )
+        self.embedder = get_embedder()
 
-        try:
-            create_vector_index(
-                self.neo4j_driver,
-                name="text_embeddings",
-                label="Chunk",
-                embedding_property="embedding",
-                dimensions=1536,
-                similarity_fn="cosine",
-            )
-        except Exception:
-            pass
+        # Vector/full-text indexes once per tenant graph (no-op once applied)
+        TENANT_SCHEMA.try_ensure(tenant_id, self.neo4j_driver, self.neo4j_database)
 
         self.vector_retriever = VectorRetriever(
             self.neo4j_driver,
-            index_name="text_embeddings",
+            index_name=VECTOR_INDEX,
             embedder=self.embedder,
             return_properties=["text"],
+            result_formatter=text_record_formatter,
+            neo4j_database=self.neo4j_database,
         )
 
         self.graph_retriever = VectorCypherRetriever(
             self.neo4j_driver,
-            index_name="text_embeddings",
+            index_name=VECTOR_INDEX,
             embedder=self.embedder,
-            retrieval_query="""
-            // 1) Go out 1-2 hops in the entity graph and get relationships
-            WITH node AS chunk
-            MATCH (chunk)<-[:FROM_CHUNK]-(entity)-[relList:!FROM_CHUNK]-{1,2}(nb)
-            UNWIND relList AS rel
-
-            // 2) collect relationships and text chunks
-            WITH collect(DISTINCT chunk) AS chunks, collect(DISTINCT rel) AS rels
-
-            // 3) format and return context
-            RETURN apoc.text.join([c in chunks | c.text], '\n') +
-                   apoc.text.join([r in rels |
-                     startNode(r).name+' - '+type(r)+' '+coalesce(r.details, '')+' -> '+endNode(r).name],
-                     '\n') AS info
-            """,
+            retrieval_query=GRAPH_EXPANSION.QUERY,
+            result_formatter=GRAPH_EXPANSION.format,
+            neo4j_database=self.neo4j_database,
         )
 
         self.rag_template = RagTemplate(
@@ -87,11 +68,14 @@ class PipelineRecuperar:
             expected_inputs=["query_text", "context"],
         )
 
-        self.vector_rag = GraphRAG(
-            llm=self.llm, retriever=self.vector_retriever, prompt_template=self.rag_template
+        # All searches at once with one query embedding, then a single generation
+        self.fulltext_retriever = (
+            FulltextRetriever(self.neo4j_driver, neo4j_database=self.neo4j_database)
+            if settings.RETRIEVAL_MODE.lower() == "hybrid" else None
         )
-        self.graph_rag = GraphRAG(
-            llm=self.llm, retriever=self.graph_retriever, prompt_template=self.rag_template
+        self.retriever = FusedRetriever(
+            self.embedder, self.graph_retriever, self.vector_retriever, top_k=5,
+            fulltext_retriever=self.fulltext_retriever, graph_params=GRAPH_EXPANSION.params,
         )
 
     def invoke(
@@ -100,31 +84,100 @@ class PipelineRecuperar:
         session_id: str,
         user_message: str,
         messages: List[dict],
+        stream: bool = False,
     ) -> Union[str, Generator, Iterator]:
 
         CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
 
-        answer = ""
-        try:
-            res = self.graph_rag.search(user_message, retriever_config={"top_k": 5})
-            answer = (res.answer or "").strip()
-        except Exception:
-            answer = ""
+        if stream:
+            return self._stream_answer(tenant_id, session_id, user_message)
 
-        if not answer:
-            try:
-                res = self.vector_rag.search(user_message, retriever_config={"top_k": 5})
-                answer = (res.answer or "").strip()
-            except Exception:
-                answer = ""
+        context = self._retrieve_context(user_message)
+        if not context:
+            return self._sin_contexto(tenant_id, session_id)
 
+        answer = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            temperature=0.0,
+            messages=self._generation_messages(user_message, context),
+        ).choices[0].message.content
+        answer = (answer or "").strip()
         if not answer:
-            answer = (
-                "No he encontrado suficiente contexto aún. "
-                "¿Puedes darme algún detalle más (personas, lugar, fecha aproximada) para afinar la búsqueda?"
-            )
+            return self._sin_contexto(tenant_id, session_id)
+
+        self._store_response(tenant_id, session_id, answer)
+        return answer
 
+    def _retrieve_context(self, user_message: str) -> str:
+        return self.retriever.search(user_message).text()
+
+    def _generation_messages(self, user_message: str, context: str) -> List[dict]:
+        prompt = self.rag_template.format(query_text=user_message, context=context, examples="")
+        return [
+            {"role": "system", "content": self.rag_template.system_instructions},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _store_response(self, tenant_id: str, session_id: str, answer: str):
         CONVERSATIONS.append(tenant_id, session_id, role="assistant", content=answer)
+
+    def _sin_contexto(self, tenant_id: str, session_id: str) -> str:
+        answer = (
+            "No he encontrado suficiente contexto aún. "
+            "¿Puedes darme algún detalle más (personas, lugar, fecha aproximada) para afinar la búsqueda?"
+        )
+        self._store_response(tenant_id, session_id, answer)
+        return answer
+
+    def _stream_answer(self, tenant_id: str, session_id: str, user_message: str) -> Iterator[str]:
+        context = self._retrieve_context(user_message)
+        if not context:
+            yield self._sin_contexto(tenant_id, session_id)
+            return
+
+        yield from stream_chat_completion(
+            openai_client,
+            on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+            model="gpt-4o-mini",
+            temperature=0.0,
+            messages=self._generation_messages(user_message, context),
+        )
+
+    async def ainvoke(
+        self,
+        tenant_id: str,
+        session_id: str,
+        user_message: str,
+        messages: List[dict],
+        stream: bool = False,
+    ) -> Union[str, AsyncIterator]:
+
+        CONVERSATIONS.append(tenant_id, session_id, role="user", content=user_message)
+
+        context = (await self.retriever.asearch(user_message)).text()
+        if not context:
+            answer = self._sin_contexto(tenant_id, session_id)
+            return aiter_text(answer) if stream else answer
+
+        if stream:
+            return astream_chat_completion(
+                async_openai_client,
+                on_complete=lambda text: self._store_response(tenant_id, session_id, text),
+                model="gpt-4o-mini",
+                temperature=0.0,
+                messages=self._generation_messages(user_message, context),
+            )
+
+        answer = (await async_openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            temperature=0.0,
+            messages=self._generation_messages(user_message, context),
+        )).choices[0].message.content
+        answer = (answer or "").strip()
+        if not answer:
+            return self._sin_contexto(tenant_id, session_id)
+
+        self._store_response(tenant_id, session_id, answer)
         return answer
 
 def pipeline_recuperar_factory():
@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+
+from app.core.db import create_db_and_tables
+from app.pipelines.pipeline_guardar import KG_BULK_IMPORT_JOB
+from app.services.bulk_import import parse_ndjson
+from app.services.ingestion_queue import INGESTION
+
+
+def enqueue(tenant_id: str, path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        memories = parse_ndjson(f)
+    return INGESTION.enqueue(tenant_id, KG_BULK_IMPORT_JOB, {"memories": memories})
+
+
+async def run_until_finished(job_id: int) -> None:
+    """Works the queue in this process until the job is done or failed (API workers may take it too)"""
+    while True:
+        job = INGESTION.get(job_id)
+        if job.status in ("done", "failed"):
+            return
+        if job.total:
+            print(f"{job.done}/{job.total} recuerdos, {job.failed} fallidos, {job.throughput or 0:.2f}/s")
+        if not await INGESTION.run_once():
+            await asyncio.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import of written memories into a tenant graph")
+    parser.add_argument("tenant_id")
+    parser.add_argument("path", help="NDJSON file, one {\"text\": ..., \"images\": [...]} per line")
+    parser.add_argument("--run", action="store_true", help="process the import here instead of leaving it to the API workers")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    job_id = enqueue(args.tenant_id, args.path)
+    print(f"Importación encolada: trabajo {job_id}")
+    if args.run:
+        asyncio.run(run_until_finished(job_id))
+        job = INGESTION.get(job_id)
+        print(f"{job.status}: {job.done}/{job.total} recuerdos, {job.failed} fallidos" + (f" ({job.error})" if job.error else ""))
+
+
+if __name__ == "__main__":
+    main()
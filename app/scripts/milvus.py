@@ -1,83 +1,296 @@
-from glob import glob
-from app.core.llm import openai_client
-from pymilvus import MilvusClient
-from tqdm import tqdm
+import argparse
+import hashlib
 import json
-from pypdf import PdfReader 
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from glob import glob
+from pathlib import Path
+from typing import Iterable, Iterator, List, Set, Tuple
+
+from pymilvus import DataType
+from pypdf import PdfReader
+
+from app.core.config import settings
+from app.core.embeddings import get_embedder, KB_EMBEDDING_MODEL
+from app.services.knowledge_base import KNOWLEDGE_BASE, NumpyIndexWriter, numpy_index_dir
 
-milvus_client = MilvusClient(uri="/home/ubuntu/engrammer-api/data/milvus.db")
+logger = logging.getLogger(__name__)
+
+collection_name = settings.KNOWLEDGE_BASE_COLLECTION
+DIMENSION = 1536
+
+
+@dataclass
+class SeedStats:
+    chunks: int = 0     # chunks read from the documents
+    skipped: int = 0    # already stored with the same content hash
+    embedded: int = 0   # new or changed, embedded and upserted
+    deleted: int = 0    # stored chunks no longer produced (by their source or a removed one)
 
-collection_name="knowledge_base_collection"
 
 def emb_text(text):
-    return (
-        openai_client.embeddings.create(input=text, model="text-embedding-3-small")
-        .data[0]
-        .embedding
-    )
-    
-def seed():
-    
-    text_lines = []
-
-    for file_path in glob("/home/ubuntu/engrammer-api/app/docs/guerras_cantabras/*.pdf", recursive=True):
-        reader = PdfReader(file_path)
-        file_text = ""
-        for page in reader.pages:
-            file_text += page.extract_text() or "" 
-        text_lines += file_text.split("\n\n")
-    
-    if milvus_client.has_collection(collection_name):
-        milvus_client.drop_collection(collection_name)
-        
-    milvus_client.create_collection(
+    return get_embedder(KB_EMBEDDING_MODEL).embed_query(text)
+
+
+# ---------- Lectura ----------
+def iter_pages(file_path: str) -> Iterator[str]:
+    """Page texts, extracted one at a time"""
+    for page in PdfReader(file_path).pages:
+        yield page.extract_text() or ""
+
+
+def iter_paragraphs(pages: Iterable[str]) -> Iterator[str]:
+    """Paragraphs ("\\n\\n"-separated) across page boundaries, keeping only the unfinished one buffered"""
+    buffer = ""
+    for page in pages:
+        buffer += page
+        *complete, buffer = buffer.split("\n\n")
+        yield from complete
+    yield buffer
+
+
+def iter_chunks(paragraphs: Iterable[str], max_chars: int = None, min_chars: int = None) -> Iterator[str]:
+    """Paragraphs longer than max_chars are cut at the last space; shorter than min_chars are dropped"""
+    max_chars = settings.KB_CHUNK_MAX_CHARS if max_chars is None else max_chars
+    min_chars = settings.KB_CHUNK_MIN_CHARS if min_chars is None else min_chars
+    for paragraph in paragraphs:
+        text = paragraph.strip()
+        while len(text) > max_chars:
+            cut = text.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            piece, text = text[:cut].strip(), text[cut:].strip()
+            if len(piece) >= min_chars:
+                yield piece
+        if len(text) >= min_chars:
+            yield text
+
+
+def chunk_id(source: str, text: str) -> str:
+    return hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------- Colección ----------
+def ensure_collection(client, rebuild: bool = False) -> bool:
+    """
+    Collection keyed by the chunk content hash. Older collections (int ids, no source) cannot be
+    updated incrementally and are rebuilt. Returns True if the collection was (re)created.
+    """
+    if client.has_collection(collection_name):
+        fields = {f["name"]: f for f in client.describe_collection(collection_name).get("fields", [])}
+        outdated = fields.get("id", {}).get("type") != DataType.VARCHAR or "source" not in fields
+        if not (rebuild or outdated):
+            return False
+        logger.info("Dropping collection %s (rebuild=%s, outdated=%s)", collection_name, rebuild, outdated)
+        client.drop_collection(collection_name)
+
+    schema = client.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field("id", DataType.VARCHAR, max_length=64, is_primary=True)
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=DIMENSION)
+    schema.add_field("text", DataType.VARCHAR, max_length=65535)
+    schema.add_field("source", DataType.VARCHAR, max_length=1024)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="vector", index_type="AUTOINDEX", metric_type="IP")
+
+    client.create_collection(
         collection_name=collection_name,
-        dimension=1536,
-        metric_type="IP",  
-        consistency_level="Bounded"
+        schema=schema,
+        index_params=index_params,
+        consistency_level="Bounded",
+    )
+
+
+# ---------- Ingesta ----------
+def _unique_chunks(source: str, pages: Iterable[str], seen: Set[str]) -> Iterator[Tuple[str, str]]:
+    for text in iter_chunks(iter_paragraphs(pages)):
+        cid = chunk_id(source, text)
+        if cid not in seen:
+            seen.add(cid)
+            yield cid, text
+
+
+def _seed_batch(client, embedder, source: str, batch: List[Tuple[str, str]]) -> Tuple[int, int]:
+    """Embeds and upserts the chunks of the batch not stored yet; returns (skipped, embedded)"""
+    stored = {row["id"] for row in client.get(collection_name, ids=[cid for cid, _ in batch], output_fields=["id"])}
+    new = [(cid, text) for cid, text in batch if cid not in stored]
+    if new:
+        vectors = embedder.embed_documents([text for _, text in new])
+        client.upsert(
+            collection_name=collection_name,
+            data=[{"id": cid, "vector": vector, "text": text, "source": source} for (cid, text), vector in zip(new, vectors)],
+        )
+    return len(batch) - len(new), len(new)
+
+
+def _stored_ids(client, source: str, batch_size: int) -> Iterator[str]:
+    iterator = client.query_iterator(
+        collection_name, batch_size=batch_size, filter=f"source == {json.dumps(source)}", output_fields=["id"]
     )
-    
-    data = []
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                return
+            yield from (row["id"] for row in rows)
+    finally:
+        iterator.close()
+
+
+def _delete_stale(client, source: str, seen: Set[str], batch_size: int) -> int:
+    """
+    Deletes the stored chunks of `source` that were not produced this time, by primary key and in
+    batches (an `id not in [...]` filter over a large PDF would exceed Milvus's expression limits)
+    """
+    stale = [cid for cid in _stored_ids(client, source, batch_size) if cid not in seen]
+    for batch in iter_batches(stale, batch_size):
+        client.delete(collection_name=collection_name, ids=batch)
+    return len(stale)
+
+
+def seed_documents(
+    client,
+    embedder,
+    documents: Iterable[Tuple[str, Iterable[str]]],
+    batch_size: int = None,
+    workers: int = None,
+) -> SeedStats:
+    """
+    Streams (source, pages) into the collection. Batches are embedded and upserted by `workers`
+    threads with at most `workers` batches in flight, so memory stays flat whatever the corpus size.
+    Chunks of a source that are no longer produced are deleted once the source is done.
+    """
+    batch_size = settings.KB_SEED_BATCH_SIZE if batch_size is None else batch_size
+    workers = settings.KB_SEED_WORKERS if workers is None else workers
+    stats = SeedStats()
+    sources: List[str] = []
+
+    def collect(future) -> None:
+        skipped, embedded = future.result()
+        stats.skipped += skipped
+        stats.embedded += embedded
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-seed") as pool:
+        for source, pages in documents:
+            sources.append(source)
+            seen: Set[str] = set()
+            in_flight = deque()
+            for batch in iter_batches(_unique_chunks(source, pages, seen), batch_size):
+                stats.chunks += len(batch)
+                if len(in_flight) >= workers:
+                    collect(in_flight.popleft())
+                in_flight.append(pool.submit(_seed_batch, client, embedder, source, batch))
+            while in_flight:
+                collect(in_flight.popleft())
+
+            stats.deleted += _delete_stale(client, source, seen, batch_size)
+
+    # Documents removed from the corpus (an empty glob must not wipe the collection)
+    if sources:
+        result = client.delete(collection_name=collection_name, filter=f"source not in {json.dumps(sources)}")
+        stats.deleted += _delete_count(result)
+    return stats
+
+
+def _delete_count(result) -> int:
+    # MilvusClient.delete returns the deleted primary keys or {"delete_count": n} (zero omitted)
+    if isinstance(result, list):
+        return len(result)
+    return int((result or {}).get("delete_count") or 0)
+
+
+def seed(pattern: str = None, rebuild: bool = False, batch_size: int = None, workers: int = None) -> SeedStats:
+    pattern = settings.KNOWLEDGE_BASE_DOCS if pattern is None else pattern
+    client = KNOWLEDGE_BASE.client
+    created = ensure_collection(client, rebuild=rebuild)
+
+    paths = sorted(glob(pattern, recursive=True))
+    documents = ((Path(path).name, iter_pages(path)) for path in paths)
+    stats = seed_documents(client, get_embedder(KB_EMBEDDING_MODEL), documents, batch_size=batch_size, workers=workers)
+    # New corpus version only if it changed: question contexts searched in the previous one are recomputed on next use
+    if created or stats.embedded or stats.deleted:
+        KNOWLEDGE_BASE.set_version()
+    return stats
+
+
+def _embed_batch(embedder, batch: List[str]) -> Tuple[List[str], List[List[float]]]:
+    return batch, embedder.embed_documents(batch)
+
+
+def seed_numpy(out_dir, pattern: str = None, batch_size: int = None, workers: int = None, dtype: str = "float32") -> SeedStats:
+    """
+    Writes the corpus as a NumpyKnowledgeBase index. The index is rewritten as a whole, but unchanged
+    chunks come from the embedding cache, so only new text reaches the API. The new meta.json carries
+    a new version, so question contexts of the previous index are recomputed.
+    """
+    pattern = settings.KNOWLEDGE_BASE_DOCS if pattern is None else pattern
+    batch_size = settings.KB_SEED_BATCH_SIZE if batch_size is None else batch_size
+    workers = settings.KB_SEED_WORKERS if workers is None else workers
+    embedder = get_embedder(KB_EMBEDDING_MODEL)
+    stats = SeedStats()
+
+    def chunks() -> Iterator[str]:
+        seen: Set[str] = set()
+        for path in sorted(glob(pattern, recursive=True)):
+            for _, text in _unique_chunks(Path(path).name, iter_pages(path), seen):
+                yield text
+
+    with NumpyIndexWriter(out_dir, DIMENSION, dtype) as writer, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-seed") as pool:
+        in_flight = deque()
+        for batch in iter_batches(chunks(), batch_size):
+            stats.chunks += len(batch)
+            if len(in_flight) >= workers:
+                writer.add(*in_flight.popleft().result())
+            in_flight.append(pool.submit(_embed_batch, embedder, batch))
+        while in_flight:
+            writer.add(*in_flight.popleft().result())
+    return stats
 
-    for i, line in enumerate(tqdm(text_lines, desc="Creating embeddings")):
-        data.append({"id": i, "vector": emb_text(line), "text": line})
 
-    milvus_client.insert(collection_name=collection_name, data=data)
-        
 def test():
-    
+
     question = "How is data stored in milvus?"
-    
-    search_res = milvus_client.search(
-        collection_name= collection_name,
-        data=[
-            emb_text(question)
-        ],  # Use the `emb_text` function to convert the question to an embedding vector
-        limit=3,  # Return top 3 results
-        search_params={"metric_type": "IP", "params": {}},  # Inner product distance
-        output_fields=["text"],  # Return the text field
-    )
-    
-    retrieved_lines_with_distances = [
-        (res["entity"]["text"], res["distance"]) for res in search_res[0]
-    ]
-    # print(json.dumps(retrieved_lines_with_distances, indent=4))
-    
-    context = "\n".join(
-        [line_with_distance[0] for line_with_distance in retrieved_lines_with_distances]
-    )
-    
+
+    context = "\n".join(KNOWLEDGE_BASE.search(emb_text(question), limit=3))
+
     print("Context for the question:")
     print(context)
 
-       
+
 def main():
-        
+    parser = argparse.ArgumentParser(description="Seed the activities knowledge base in Milvus")
+    parser.add_argument("--docs", default=settings.KNOWLEDGE_BASE_DOCS, help="glob of the PDFs to ingest")
+    parser.add_argument("--rebuild", action="store_true", help="drop the collection and embed everything again")
+    parser.add_argument("--batch-size", type=int, default=settings.KB_SEED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.KB_SEED_WORKERS)
+    parser.add_argument("--numpy", metavar="ACTIVITY_ID", help="build the in-process index of this activity instead of Milvus")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32", help="numpy index precision")
+    args = parser.parse_args()
+
+    if args.numpy:
+        print(f"Building numpy knowledge base for {args.numpy}...")
+        stats = seed_numpy(numpy_index_dir(args.numpy), args.docs, batch_size=args.batch_size, workers=args.workers, dtype=args.dtype)
+        print(f"{stats.chunks} chunks")
+        return
+
     print("Seeding Milvus with data...")
-    seed()
+    stats = seed(args.docs, rebuild=args.rebuild, batch_size=args.batch_size, workers=args.workers)
+    print(f"{stats.chunks} chunks: {stats.embedded} embedded, {stats.skipped} unchanged, {stats.deleted} deleted")
     # test()
-    
 
-    
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,41 @@
-from sqlmodel import Session, select
-from typing import Optional, List
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, List, Tuple
+from sqlmodel import Session, select, delete
+from app.core.config import settings
 from app.core.db import engine as default_engine
-from app.models.db_models import Activity, ActivityQuestion
+from app.models.db_models import Activity, ActivityQuestion, ActivityCatalogVersion, _utcnow
 from app.models.schemas import ActivityDetail, QuestionDetail, ActivityInfo
 
 
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of every activity and question, loaded in a single DB round-trip"""
+    version: int
+    etag: str
+    activities: Tuple[ActivityInfo, ...]
+    details: Mapping[str, ActivityDetail]
+    questions: Mapping[Tuple[str, str], QuestionDetail]
+
+
 class ActivityManager:
-    
-    def __init__(self, engine=default_engine):
+    """
+    Read-through cache of the activities catalog. Reads are served from an immutable snapshot;
+    writes go through this class, bump the catalog version and drop the snapshot. Other processes
+    (e.g. the seed script) are picked up by re-checking the version every ACTIVITY_CACHE_TTL seconds.
+    """
+
+    def __init__(self, engine=default_engine, ttl: float = None):
         self.engine = engine
-    
+        self.ttl = settings.ACTIVITY_CACHE_TTL if ttl is None else ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
     # ---------- Conversores  ----------
     def _row_to_activityInfo(self, row: Activity) -> ActivityInfo:
         return ActivityInfo(
@@ -17,7 +43,7 @@ class ActivityManager:
             name=row.name,
             description=row.description,
         )
-    
+
     def _row_to_activityDetail(self, row: Activity, questions: List[ActivityQuestion] = None) -> ActivityDetail:
         return ActivityDetail(
             id=row.activity_id,
@@ -25,7 +51,7 @@ class ActivityManager:
             description=row.description,
             questions=[self._row_to_questionDetail(q) for q in (questions or [])],
         )
-        
+
     def _row_to_questionDetail(self, row: ActivityQuestion) -> QuestionDetail:
         return QuestionDetail(
             id=row.question_id,
@@ -35,35 +61,97 @@ class ActivityManager:
             respuesta_correcta=row.respuesta_correcta,
         )
 
+    # ---------- Snapshot ----------
+    def _db_version(self, session: Session) -> int:
+        row = session.get(ActivityCatalogVersion, 1)
+        return row.version if row else 0
+
+    def _load(self) -> CatalogSnapshot:
+        with Session(self.engine) as session:
+            version = self._db_version(session)
+            activities = session.exec(select(Activity)).all()
+            questions = session.exec(select(ActivityQuestion)).all()
+
+            by_activity = {}
+            for q in questions:
+                by_activity.setdefault(q.activity_id, []).append(q)
+
+            details = {a.activity_id: self._row_to_activityDetail(a, by_activity.get(a.activity_id)) for a in activities}
+            infos = tuple(self._row_to_activityInfo(a) for a in activities)
+
+        # Content hash: also changes if the tables were edited without bumping the version
+        digest = hashlib.sha1(json.dumps([d.model_dump() for d in details.values()], sort_keys=True).encode("utf-8")).hexdigest()
+        return CatalogSnapshot(
+            version=version,
+            etag=f'"{digest}"',
+            activities=infos,
+            details=MappingProxyType(details),
+            questions=MappingProxyType({(q.activity_id, q.id): q for d in details.values() for q in d.questions}),
+        )
+
+    def snapshot(self) -> CatalogSnapshot:
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None:
+                self._snapshot, self._checked_at = self._load(), now
+            elif self.ttl and now - self._checked_at > self.ttl:
+                self._checked_at = now
+                with Session(self.engine) as session:
+                    stale = self._db_version(session) != self._snapshot.version
+                if stale:
+                    self._snapshot = self._load()
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
     # ---------- Métodos públicos ----------
+    def etag(self) -> str:
+        return self.snapshot().etag
+
     def list_activities(self) -> List[ActivityInfo]:
         """Devuelve solo info básica de todas las actividades"""
-        with Session(self.engine) as session:
-            rows = session.exec(select(Activity)).all()
-            return [self._row_to_activityInfo(r) for r in rows]
+        return list(self.snapshot().activities)
 
     def get_activity(self, activity_id: str) -> Optional[ActivityDetail]:
         """Devuelve la actividad con todas sus preguntas"""
-        with Session(self.engine) as session:
-            activity = session.get(Activity, activity_id)
-            if not activity:
-                return None
-            questions = session.exec(
-                select(ActivityQuestion).where(ActivityQuestion.activity_id == activity_id)
-            ).all()
-            return self._row_to_activityDetail(activity, questions)
+        return self.snapshot().details.get(activity_id)
 
     def get_questions_for_activity(self, activity_id: str) -> List[QuestionDetail]:
-        with Session(self.engine) as session:
-            rows = session.exec(
-                select(ActivityQuestion).where(ActivityQuestion.activity_id == activity_id)
-            ).all()
-            return [self._row_to_questionDetail(r) for r in rows]
+        activity = self.snapshot().details.get(activity_id)
+        return list(activity.questions) if activity else []
 
     def get_question(self, activity_id: str, question_id: str) -> Optional[QuestionDetail]:
+        return self.snapshot().questions.get((activity_id, question_id))
+
+    # ---------- Escritura ----------
+    def replace_activity(self, activity: Activity, questions: List[ActivityQuestion]) -> None:
+        """Replaces an activity and all its questions in one transaction"""
         with Session(self.engine) as session:
-            row = session.get(ActivityQuestion, (activity_id, question_id))
-            return self._row_to_questionDetail(row) if row else None
+            session.exec(delete(ActivityQuestion).where(ActivityQuestion.activity_id == activity.activity_id))
+            session.exec(delete(Activity).where(Activity.activity_id == activity.activity_id))
+            session.flush()
+            session.add(activity)
+            session.flush()
+            session.add_all(questions)
+            self._bump_version(session)
+            session.commit()
+        self.invalidate()
+
+    def delete_activity(self, activity_id: str) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(ActivityQuestion).where(ActivityQuestion.activity_id == activity_id))
+            session.exec(delete(Activity).where(Activity.activity_id == activity_id))
+            self._bump_version(session)
+            session.commit()
+        self.invalidate()
+
+    def _bump_version(self, session: Session) -> None:
+        row = session.get(ActivityCatalogVersion, 1) or ActivityCatalogVersion(id=1, version=0)
+        row.version += 1
+        row.updated_at = _utcnow()
+        session.add(row)
 
 
 ACTIVITIES = ActivityManager()
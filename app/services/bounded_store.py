@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Key = Tuple[str, str]  # (tenant_id, session_id)
+
+
+class BoundedSessionMap:
+    """
+    LRU map of per-session values with idle TTL, a global session cap and a per-tenant session cap.
+    Entries are kept in last-access order, so expired or least recently used ones are always at the
+    front and every eviction is O(1).
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_sessions_per_tenant: int,
+        idle_ttl: float,
+        sizeof: Callable[[Any], int],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.max_sessions_per_tenant = max_sessions_per_tenant
+        self.idle_ttl = idle_ttl
+        self._sizeof = sizeof
+        self._clock = clock
+
+        self.lock = threading.RLock()
+        # key -> [value, last_access, size_bytes]
+        self._entries: "OrderedDict[Key, list]" = OrderedDict()
+        self._by_tenant: Dict[str, "OrderedDict[str, None]"] = {}
+        self._resident_bytes = 0
+        self._evictions: Dict[str, int] = defaultdict(int)
+
+    # ---------- Métodos públicos ----------
+    def get(self, key: Key) -> Optional[Any]:
+        with self.lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._touch(key, entry, now)
+            return entry[0]
+
+    def put(self, key: Key, value: Any) -> None:
+        with self.lock:
+            now = self._clock()
+            self._expire(now)
+            size = self._sizeof(value)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [value, now, size]
+                self._by_tenant.setdefault(key[0], OrderedDict())[key[1]] = None
+                self._resident_bytes += size
+            else:
+                self._resident_bytes += size - entry[2]
+                entry[0], entry[2] = value, size
+                self._touch(key, entry, now)
+            self._enforce_limits(key[0])
+
+    def resize(self, key: Key, delta: int) -> None:
+        """Adjusts the accounted size of a value mutated in place"""
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] += delta
+                self._resident_bytes += delta
+
+    def pop(self, key: Key) -> Optional[Any]:
+        with self.lock:
+            entry = self._remove(key)
+            return entry[0] if entry else None
+
+    def record_eviction(self, reason: str, count: int = 1) -> None:
+        with self.lock:
+            self._evictions[reason] += count
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._expire(self._clock())
+            return {
+                "sessions": len(self._entries),
+                "tenants": len(self._by_tenant),
+                "resident_bytes": self._resident_bytes,
+                "evictions": dict(self._evictions),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- Internos ----------
+    def _touch(self, key: Key, entry: list, now: float) -> None:
+        entry[1] = now
+        self._entries.move_to_end(key)
+        self._by_tenant[key[0]].move_to_end(key[1])
+
+    def _remove(self, key: Key) -> Optional[list]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._resident_bytes -= entry[2]
+        sessions = self._by_tenant.get(key[0])
+        if sessions is not None:
+            sessions.pop(key[1], None)
+            if not sessions:
+                del self._by_tenant[key[0]]
+        return entry
+
+    def _expire(self, now: float) -> None:
+        if not self.idle_ttl:
+            return
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            self._remove(key)
+            self._evictions["ttl"] += 1
+
+    def _enforce_limits(self, tenant_id: str) -> None:
+        sessions = self._by_tenant.get(tenant_id)
+        while sessions and self.max_sessions_per_tenant and len(sessions) > self.max_sessions_per_tenant:
+            oldest = next(iter(sessions))
+            self._remove((tenant_id, oldest))
+            self._evictions["tenant_limit"] += 1
+            sessions = self._by_tenant.get(tenant_id)
+
+        while self.max_sessions and len(self._entries) > self.max_sessions:
+            self._remove(next(iter(self._entries)))
+            self._evictions["global_limit"] += 1
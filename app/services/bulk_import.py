@@ -0,0 +1,78 @@
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Union
+
+from app.core.config import settings
+
+
+def parse_ndjson(lines: Iterable[Union[str, bytes]]) -> List[Dict[str, Any]]:
+    """
+    Memories of a bulk import, one JSON object per line:
+      {"text": "...", "images": ["description of a photo", ...]}
+    `images` is optional. Blank lines are skipped; any other malformed line raises ValueError.
+    """
+    memories = []
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Línea {number}: JSON inválido")
+        text = item.get("text") if isinstance(item, dict) else None
+        images = item.get("images", []) if isinstance(item, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Línea {number}: falta el campo 'text'")
+        if not isinstance(images, list) or not all(isinstance(i, str) for i in images):
+            raise ValueError(f"Línea {number}: 'images' debe ser una lista de descripciones")
+        memories.append({"text": text.strip(), "images": [i.strip() for i in images if i.strip()]})
+        if len(memories) > settings.BULK_IMPORT_MAX_ITEMS:
+            raise ValueError(f"Como mucho {settings.BULK_IMPORT_MAX_ITEMS} recuerdos por importación")
+    if not memories:
+        raise ValueError("No hay recuerdos que importar")
+    return memories
+
+
+def memory_text(memory: Dict[str, Any]) -> str:
+    """Text handed to the KG builder; image descriptions are marked as such, like in the conversations"""
+    if not memory.get("images"):
+        return memory["text"]
+    images = "\n".join(f"- {description}" for description in memory["images"])
+    return f"{memory['text']}\n\nDescripción de las imágenes (extraída de las imágenes, puede contener errores):\n{images}"
+
+
+class ImportStats:
+    """Per-tenant totals of the bulk imports run by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, Dict[str, float]] = {}
+
+    def record(self, tenant_id: str, done: int, failed: int, seconds: float) -> None:
+        with self._lock:
+            stats = self._tenants.setdefault(tenant_id, {"memories": 0, "failed": 0, "seconds": 0.0})
+            stats["memories"] += done
+            stats["failed"] += failed
+            stats["seconds"] += seconds
+
+    def tenant(self, tenant_id: str) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._tenants.get(tenant_id) or {"memories": 0, "failed": 0, "seconds": 0.0})
+        stats["throughput"] = round(stats["memories"] / stats["seconds"], 3) if stats["seconds"] else 0.0
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = list(self._tenants)
+        totals = [self.tenant(t) for t in tenants]
+        return {
+            "tenants": len(tenants),
+            "memories": sum(t["memories"] for t in totals),
+            "failed": sum(t["failed"] for t in totals),
+        }
+
+
+IMPORTS = ImportStats()
+
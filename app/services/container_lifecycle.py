@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.infrastructure import neo4j_docker
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerLifecycle:
+    """
+    Hibernation of per-tenant Neo4j containers. Containers idle for NEO4J_HIBERNATE_AFTER seconds
+    (by last driver access in any worker, or since this process started) are stopped; `wake` starts
+    them again on the next driver creation and waits for Bolt. A few booted spare containers are
+    kept for new tenants (NEO4J_WARM_POOL_SIZE).
+    Every worker runs this loop, so accesses are shared through `save_access` / `load_access`
+    (epoch seconds, throttled to NEO4J_ACCESS_WRITE_INTERVAL per tenant).
+    """
+
+    def __init__(
+        self,
+        tenant_ids: Callable[[], Iterable[str]],
+        on_hibernate: Callable[[str], None],
+        load_access: Callable[[], Dict[str, float]] = dict,
+        save_access: Callable[[str, float], None] = lambda tenant_id, at: None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._tenant_ids = tenant_ids
+        self._on_hibernate = on_hibernate
+        self._load_access = load_access
+        self._save_access = save_access
+        self._clock = clock
+        self._started_at = clock()
+        self._last_access: Dict[str, float] = {}
+        self._saved_access: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hibernated = 0
+        self.woken = 0
+
+    # ---------- Métodos públicos ----------
+    def touch(self, tenant_id: str) -> None:
+        now = self._clock()
+        self._last_access[tenant_id] = now
+        if now - self._saved_access.get(tenant_id, float("-inf")) < settings.NEO4J_ACCESS_WRITE_INTERVAL:
+            return
+        self._saved_access[tenant_id] = now
+        try:
+            self._save_access(tenant_id, now)
+        except Exception as e:
+            logger.warning("Could not save last access of tenant %s: %r", tenant_id, e)
+
+    def wake(self, tenant_id: str, auth: Tuple[str, str]) -> Optional[str]:
+        """Starts the tenant container if it is stopped and waits for Bolt; its current URI, None if it has no container"""
+        with self._tenant_lock(tenant_id):
+            try:
+                started = neo4j_docker.start_neo4j_container(tenant_id)
+            except RuntimeError:
+                return None  # no Docker here: tenants bring their own server
+            if started is None:
+                return None
+            bolt_uri, was_running = started
+            if not was_running:
+                logger.info("Waking Neo4j container of tenant %s", tenant_id)
+                neo4j_docker.wait_for_bolt(bolt_uri, auth)
+                self.woken += 1
+            self.touch(tenant_id)
+            return bolt_uri
+
+    def hibernate_idle(self) -> List[str]:
+        if not settings.NEO4J_HIBERNATE_AFTER:
+            return []
+        running = neo4j_docker.running_tenant_containers()
+        shared = self._load_access()
+        stopped = []
+        for tenant_id in self._tenant_ids():
+            if neo4j_docker.container_name(tenant_id) not in running or not self._idle(tenant_id, shared):
+                continue
+            with self._tenant_lock(tenant_id):
+                if not self._idle(tenant_id, shared):
+                    continue  # used while we were stopping others
+                # Drivers and pipelines first, so no request keeps using the stopped server
+                self._on_hibernate(tenant_id)
+                neo4j_docker.stop_neo4j_container(tenant_id)
+                self.hibernated += 1
+                stopped.append(tenant_id)
+        if stopped:
+            logger.info("Hibernated Neo4j containers of %d idle tenants", len(stopped))
+        return stopped
+
+    def fill_warm_pool(self) -> int:
+        missing = settings.NEO4J_WARM_POOL_SIZE - neo4j_docker.warm_container_count()
+        for _ in range(max(missing, 0)):
+            neo4j_docker.start_warm_container()
+        return max(missing, 0)
+
+    def run_once(self) -> None:
+        self.hibernate_idle()
+        if settings.NEO4J_PROVISIONING_MODE.lower() == "container":
+            self.fill_warm_pool()
+
+    def stats(self) -> Dict[str, object]:
+        return {"hibernated": self.hibernated, "woken": self.woken}
+
+    async def start(self) -> None:
+        if settings.NEO4J_LIFECYCLE_INTERVAL and self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="neo4j-container-lifecycle")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------- Internos ----------
+    def _idle(self, tenant_id: str, shared: Dict[str, float]) -> bool:
+        # Latest access seen by this worker or saved by any other
+        last = max(self._last_access.get(tenant_id, self._started_at), shared.get(tenant_id, float("-inf")))
+        return self._clock() - last > settings.NEO4J_HIBERNATE_AFTER
+
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(tenant_id, threading.Lock())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Neo4j container lifecycle pass failed: %r", e)
+            await asyncio.sleep(settings.NEO4J_LIFECYCLE_INTERVAL)
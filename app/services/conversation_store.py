@@ -1,21 +1,397 @@
-from collections import defaultdict
-from typing import Dict, List
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
 
-class ConversationStore:
+from app.core.config import settings
+from app.services.bounded_store import BoundedSessionMap
 
-    def __init__(self):
-        self._data: Dict[str, Dict[str, List[dict]]] = defaultdict(lambda: defaultdict(list))
+
+def _message_size(message: dict) -> int:
+    return len(message["role"]) + len(str(message["content"]).encode("utf-8"))
+
+
+class ConversationStore(ABC):
+    """
+    Conversation history per (tenant_id, session_id).
+    `get` returns the leading system preamble (if any) plus the most recent `last_n` turns;
+    by default the window is CONVERSATION_MAX_MESSAGES. 0 means unlimited, both for the window
+    and for how many turns are kept.
+    Next to the messages each conversation keeps small named state (e.g. the rolling summary of
+    HistoryCompactor), so every worker sharing the store sees it; `clear` drops it too.
+    """
+
+    def __init__(self, max_messages: int = None):
+        self.max_messages = settings.CONVERSATION_MAX_MESSAGES if max_messages is None else max_messages
+
+    @abstractmethod
+    def append(self, tenant_id: str, session_id: str, role: str, content: str): ...
+
+    @abstractmethod
+    def get(self, tenant_id: str, session_id: str, last_n: Optional[int] = None) -> List[dict]: ...
+
+    @abstractmethod
+    def set(self, tenant_id: str, session_id: str, history: List[dict]): ...
+
+    @abstractmethod
+    def clear(self, tenant_id: str, session_id: str): ...
+
+    @abstractmethod
+    def get_state(self, tenant_id: str, session_id: str, name: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def set_state(self, tenant_id: str, session_id: str, name: str, value: Optional[dict]): ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, object]: ...
+
+    def _window(self, last_n: Optional[int]) -> Optional[int]:
+        """Turns `get` returns; None for the whole history"""
+        window = self.max_messages if last_n is None else last_n
+        return window or None
+
+
+class InMemoryConversationStore(ConversationStore):
+
+    def __init__(self, max_sessions: int = None, max_sessions_per_tenant: int = None, max_messages: int = None, idle_ttl: float = None):
+        super().__init__(max_messages)
+        self._data = BoundedSessionMap(
+            max_sessions=settings.SESSION_MAX_TOTAL if max_sessions is None else max_sessions,
+            max_sessions_per_tenant=settings.SESSION_MAX_PER_TENANT if max_sessions_per_tenant is None else max_sessions_per_tenant,
+            idle_ttl=settings.SESSION_IDLE_TTL if idle_ttl is None else idle_ttl,
+            sizeof=lambda history: sum(_message_size(m) for m in history),
+        )
+        self._state = BoundedSessionMap(
+            max_sessions=settings.SESSION_MAX_TOTAL if max_sessions is None else max_sessions,
+            max_sessions_per_tenant=0,
+            idle_ttl=settings.SESSION_IDLE_TTL if idle_ttl is None else idle_ttl,
+            sizeof=lambda state: len(json.dumps(state, ensure_ascii=False).encode("utf-8")),
+        )
 
     def append(self, tenant_id: str, session_id: str, role: str, content: str):
-        self._data[tenant_id][session_id].append({"role": role, "content": content})
+        key = (tenant_id, session_id)
+        message = {"role": role, "content": content}
+        with self._data.lock:
+            history = self._data.get(key)
+            if history is None:
+                self._data.put(key, [message])
+                return
+            history.append(message)
+            self._data.resize(key, _message_size(message))
+            self._trim(key, history)
 
-    def get(self, tenant_id: str, session_id: str) -> List[dict]:
-        return list(self._data[tenant_id][session_id])
+    def get(self, tenant_id: str, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        with self._data.lock:
+            history = self._data.get((tenant_id, session_id))
+            if not history:
+                return []
+            head = 1 if history[0].get("role") == "system" else 0
+            window = self._window(last_n)
+            if window is None or len(history) - head <= window:
+                return list(history)
+            return history[:head] + history[-window:]
 
     def set(self, tenant_id: str, session_id: str, history: List[dict]):
-        self._data[tenant_id][session_id] = list(history)
+        key = (tenant_id, session_id)
+        with self._data.lock:
+            history = list(history)
+            self._data.put(key, history)
+            self._trim(key, history)
 
     def clear(self, tenant_id: str, session_id: str):
-        self._data[tenant_id].pop(session_id, None)
+        self._data.pop((tenant_id, session_id))
+        self._state.pop((tenant_id, session_id))
+
+    def get_state(self, tenant_id: str, session_id: str, name: str) -> Optional[dict]:
+        state = self._state.get((tenant_id, session_id))
+        return state.get(name) if state else None
+
+    def set_state(self, tenant_id: str, session_id: str, name: str, value: Optional[dict]):
+        key = (tenant_id, session_id)
+        with self._state.lock:
+            state = dict(self._state.get(key) or {})
+            if value is None:
+                state.pop(name, None)
+            else:
+                state[name] = value
+            self._state.put(key, state)
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "memory", **self._data.stats()}
+
+    def _trim(self, key, history: List[dict]):
+        # Drop the oldest turns but keep the system preamble
+        start = 1 if history and history[0].get("role") == "system" else 0
+        excess = len(history) - start - self.max_messages
+        if not self.max_messages or excess <= 0:
+            return
+        removed = history[start:start + excess]
+        del history[start:start + excess]
+        self._data.resize(key, -sum(_message_size(m) for m in removed))
+        self._data.record_eviction("message_limit", len(removed))
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Message log in a SQLite database in WAL mode, shareable by several worker processes. Writes trim
+    the session to max_messages turns and, every CONVERSATION_SQLITE_PURGE_INTERVAL seconds, drop
+    the sessions idle for longer than idle_ttl.
+    """
+
+    def __init__(self, path: str, max_messages: int = None, idle_ttl: float = None, purge_interval: float = None):
+        super().__init__(max_messages)
+        self.path = str(path)
+        self.idle_ttl = settings.SESSION_IDLE_TTL if idle_ttl is None else idle_ttl
+        self.purge_interval = settings.CONVERSATION_SQLITE_PURGE_INTERVAL if purge_interval is None else purge_interval
+        self._purged_at = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_message (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tenant_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_message_session "
+                "ON conversation_message (tenant_id, session_id, id)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    tenant_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (tenant_id, session_id, name)
+                )
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(content) -> str:
+        return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+    def append(self, tenant_id: str, session_id: str, role: str, content: str):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO conversation_message (tenant_id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (tenant_id, session_id, role, self._encode(content), time.time()),
+            )
+            self._trim(conn, tenant_id, session_id)
+        self._purge_idle()
+
+    def get(self, tenant_id: str, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        conn = self._conn()
+        first = conn.execute(
+            "SELECT id, role, content FROM conversation_message WHERE tenant_id = ? AND session_id = ? ORDER BY id LIMIT 1",
+            (tenant_id, session_id),
+        ).fetchone()
+        if first is None:
+            return []
+
+        head = [first] if first[1] == "system" else []
+        rows = conn.execute(
+            "SELECT id, role, content FROM conversation_message WHERE tenant_id = ? AND session_id = ? AND id > ? "
+            "ORDER BY id DESC LIMIT ?",
+            # LIMIT -1: no limit
+            (tenant_id, session_id, first[0] if head else first[0] - 1, self._window(last_n) or -1),
+        ).fetchall()
+        return [{"role": role, "content": content} for _, role, content in head + rows[::-1]]
+
+    def set(self, tenant_id: str, session_id: str, history: List[dict]):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM conversation_message WHERE tenant_id = ? AND session_id = ?", (tenant_id, session_id))
+            conn.executemany(
+                "INSERT INTO conversation_message (tenant_id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(tenant_id, session_id, m["role"], self._encode(m["content"]), now) for m in history],
+            )
+            self._trim(conn, tenant_id, session_id)
+        self._purge_idle()
+
+    def clear(self, tenant_id: str, session_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM conversation_message WHERE tenant_id = ? AND session_id = ?", (tenant_id, session_id))
+            conn.execute("DELETE FROM conversation_state WHERE tenant_id = ? AND session_id = ?", (tenant_id, session_id))
+
+    def get_state(self, tenant_id: str, session_id: str, name: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT value FROM conversation_state WHERE tenant_id = ? AND session_id = ? AND name = ?",
+            (tenant_id, session_id, name),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_state(self, tenant_id: str, session_id: str, name: str, value: Optional[dict]):
+        with self._conn() as conn:
+            if value is None:
+                conn.execute(
+                    "DELETE FROM conversation_state WHERE tenant_id = ? AND session_id = ? AND name = ?",
+                    (tenant_id, session_id, name),
+                )
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO conversation_state (tenant_id, session_id, name, value) VALUES (?, ?, ?, ?)",
+                (tenant_id, session_id, name, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "sqlite", "path": self.path}
+
+    def _trim(self, conn: sqlite3.Connection, tenant_id: str, session_id: str):
+        # Drop the turns before the last max_messages but keep the system preamble
+        if not self.max_messages:
+            return
+        first = conn.execute(
+            "SELECT id, role FROM conversation_message WHERE tenant_id = ? AND session_id = ? ORDER BY id LIMIT 1",
+            (tenant_id, session_id),
+        ).fetchone()
+        if first is None:
+            return
+        after = first[0] if first[1] == "system" else first[0] - 1
+        conn.execute(
+            "DELETE FROM conversation_message WHERE tenant_id = ? AND session_id = ? AND id > ? AND id <= ("
+            "SELECT id FROM conversation_message WHERE tenant_id = ? AND session_id = ? AND id > ? "
+            "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (tenant_id, session_id, after, tenant_id, session_id, after, self.max_messages),
+        )
+
+    def _purge_idle(self):
+        """Drops the sessions (messages and state) whose last message is older than idle_ttl"""
+        now = time.time()
+        if not self.idle_ttl or now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM conversation_message WHERE (tenant_id, session_id) IN ("
+                "SELECT tenant_id, session_id FROM conversation_message GROUP BY tenant_id, session_id HAVING MAX(created_at) < ?)",
+                (now - self.idle_ttl,),
+            )
+            conn.execute(
+                "DELETE FROM conversation_state WHERE NOT EXISTS (SELECT 1 FROM conversation_message m "
+                "WHERE m.tenant_id = conversation_state.tenant_id AND m.session_id = conversation_state.session_id)"
+            )
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    One Redis list per session (turns) plus a key for the system preamble, so the list can be
+    trimmed with LTRIM without losing it, and a hash with the conversation state. Works with any
+    client exposing the redis-py API.
+    """
+
+    def __init__(self, client, prefix: str = "engrammer:conv", max_messages: int = None, idle_ttl: float = None):
+        super().__init__(max_messages)
+        self.client = client
+        self.prefix = prefix
+        self.idle_ttl = settings.SESSION_IDLE_TTL if idle_ttl is None else idle_ttl
+
+    def _keys(self, tenant_id: str, session_id: str):
+        base = f"{self.prefix}:{tenant_id}:{session_id}"
+        return f"{base}:system", f"{base}:turns"
+
+    def _state_key(self, tenant_id: str, session_id: str) -> str:
+        return f"{self.prefix}:{tenant_id}:{session_id}:state"
+
+    def _expire(self, pipe, *keys):
+        if self.idle_ttl:
+            for key in keys:
+                pipe.expire(key, int(self.idle_ttl))
+
+    def append(self, tenant_id: str, session_id: str, role: str, content: str):
+        system_key, turns_key = self._keys(tenant_id, session_id)
+        message = json.dumps({"role": role, "content": content}, ensure_ascii=False)
+
+        if role == "system" and not self.client.exists(system_key) and not self.client.llen(turns_key):
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(system_key, message)
+            self._expire(pipe, system_key, turns_key)
+            pipe.execute()
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.rpush(turns_key, message)
+        if self.max_messages:
+            pipe.ltrim(turns_key, -self.max_messages, -1)
+        self._expire(pipe, system_key, turns_key)
+        pipe.execute()
+
+    def get(self, tenant_id: str, session_id: str, last_n: Optional[int] = None) -> List[dict]:
+        system_key, turns_key = self._keys(tenant_id, session_id)
+        window = self._window(last_n)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(system_key)
+        pipe.lrange(turns_key, 0 if window is None else -window, -1)
+        system, turns = pipe.execute()
+        raw = ([system] if system else []) + list(turns)
+        return [json.loads(m) for m in raw]
+
+    def set(self, tenant_id: str, session_id: str, history: List[dict]):
+        system_key, turns_key = self._keys(tenant_id, session_id)
+        history = list(history)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(system_key, turns_key)
+        if history and history[0].get("role") == "system":
+            pipe.set(system_key, json.dumps(history.pop(0), ensure_ascii=False))
+        if self.max_messages:
+            history = history[-self.max_messages:]
+        if history:
+            pipe.rpush(turns_key, *[json.dumps(m, ensure_ascii=False) for m in history])
+        self._expire(pipe, system_key, turns_key)
+        pipe.execute()
+
+    def clear(self, tenant_id: str, session_id: str):
+        self.client.delete(*self._keys(tenant_id, session_id), self._state_key(tenant_id, session_id))
+
+    def get_state(self, tenant_id: str, session_id: str, name: str) -> Optional[dict]:
+        value = self.client.hget(self._state_key(tenant_id, session_id), name)
+        return json.loads(value) if value else None
+
+    def set_state(self, tenant_id: str, session_id: str, name: str, value: Optional[dict]):
+        key = self._state_key(tenant_id, session_id)
+        pipe = self.client.pipeline(transaction=False)
+        if value is None:
+            pipe.hdel(key, name)
+        else:
+            pipe.hset(key, name, json.dumps(value, ensure_ascii=False))
+        self._expire(pipe, key)
+        pipe.execute()
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+def build_conversation_store() -> ConversationStore:
+    backend = settings.CONVERSATION_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteConversationStore(settings.CONVERSATION_SQLITE_PATH)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CONVERSATION_BACKEND=redis requiere el paquete 'redis'") from e
+        if not settings.REDIS_URL:
+            raise RuntimeError("CONVERSATION_BACKEND=redis requiere REDIS_URL")
+        client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        return RedisConversationStore(client, prefix=settings.CONVERSATION_REDIS_PREFIX)
+    if backend != "memory":
+        raise ValueError(f"Unknown CONVERSATION_BACKEND: {settings.CONVERSATION_BACKEND}")
+    return InMemoryConversationStore()
 
-CONVERSATIONS = ConversationStore()
\ No newline at end of file
+CONVERSATIONS = build_conversation_store()
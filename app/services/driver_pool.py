@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def pool_connections(driver) -> Tuple[int, int]:
+    """(open, in use) Bolt connections of a neo4j driver; (0, 0) if the driver internals change"""
+    try:
+        pool = driver._pool
+        open_ = sum(len(conns) for conns in pool.connections.values())
+        in_use = sum(pool.in_use_connection_count(address) for address in list(pool.connections))
+        return open_, in_use
+    except Exception:
+        return 0, 0
+
+
+class DriverPool:
+    """
+    Bounded LRU of per-tenant drivers with idle TTL. Creation is single-flight per tenant and never
+    holds the pool lock, so a slow connect only blocks requests of that tenant. Evicted drivers are
+    retired rather than closed: queries already running on them get `close_grace` seconds to finish
+    before `reap` hands them out to be closed.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_drivers: int,
+        idle_ttl: float,
+        close_grace: float,
+        on_evict: Optional[Callable[[str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self.max_drivers = max_drivers
+        self.idle_ttl = idle_ttl
+        self.close_grace = close_grace
+        self._on_evict = on_evict
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # tenant_id -> [driver, last_used], ordered by last use
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._generations: Dict[str, int] = {}
+        self._retired: List[Tuple[Any, float]] = []
+        self._created = 0
+        self._evictions: Dict[str, int] = defaultdict(int)
+
+    # ---------- Métodos públicos ----------
+    def get(self, tenant_id: str):
+        driver = self._lookup(tenant_id)
+        if driver is not None:
+            return driver
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(tenant_id, threading.Lock())
+
+        with build_lock:
+            driver = self._lookup(tenant_id)
+            if driver is not None:
+                return driver
+
+            with self._lock:
+                generation = self._generations.get(tenant_id, 0)
+            try:
+                driver = self._factory(tenant_id)
+            except Exception:
+                with self._lock:
+                    self._build_locks.pop(tenant_id, None)
+                raise
+
+            with self._lock:
+                self._created += 1
+                stale = self._generations.get(tenant_id, 0) != generation
+                if stale:
+                    # Discarded while connecting (new credentials): built with the old config
+                    self._retired.append((driver, self._clock()))
+                    evicted = []
+                else:
+                    self._entries[tenant_id] = [driver, self._clock()]
+                    evicted = self._evict_locked()
+        self._notify(evicted)
+        return self.get(tenant_id) if stale else driver
+
+    def touch(self, tenant_id: str) -> None:
+        """Marks the tenant's driver as used (drivers held by cached pipelines are not looked up per request)"""
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                entry[1] = self._clock()
+                self._entries.move_to_end(tenant_id)
+
+    def discard(self, tenant_id: str, reason: str = "discarded") -> bool:
+        with self._lock:
+            self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+            entry = self._entries.pop(tenant_id, None)
+            if entry is None:
+                return False
+            self._retire_locked(entry[0], reason)
+        return True
+
+    def sweep(self) -> List[str]:
+        """Evicts idle drivers; returns their tenants"""
+        with self._lock:
+            evicted = self._evict_locked()
+        self._notify(evicted)
+        return evicted
+
+    def reap(self, force: bool = False) -> List[Any]:
+        """Retired drivers whose grace period is over (all of them if force); the caller closes them"""
+        now = self._clock()
+        with self._lock:
+            due = [d for d, since in self._retired if force or now - since >= self.close_grace]
+            self._retired = [(d, since) for d, since in self._retired if not (force or now - since >= self.close_grace)]
+        return due
+
+    def drain(self) -> List[Any]:
+        """Removes every driver (open and retired); the caller closes them"""
+        with self._lock:
+            drivers = [entry[0] for entry in self._entries.values()] + [d for d, _ in self._retired]
+            self._entries.clear()
+            self._retired = []
+            self._build_locks.clear()
+        return drivers
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return [(tenant_id, entry[0]) for tenant_id, entry in self._entries.items()]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            # Tenants of a shared server hold the same driver: count it once
+            drivers = list({id(entry[0]): entry[0] for entry in self._entries.values()}.values())
+            stats = {
+                "tenants": len(self._entries),
+                "drivers": len(drivers),
+                "retired": len(self._retired),
+                "max_drivers": self.max_drivers,
+                "created": self._created,
+                "evictions": dict(self._evictions),
+            }
+        connections = [pool_connections(d) for d in drivers]
+        stats["connections"] = sum(c[0] for c in connections)
+        stats["connections_in_use"] = sum(c[1] for c in connections)
+        return stats
+
+    # ---------- Internos ----------
+    def _lookup(self, tenant_id: str):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is None:
+                return None
+            if not self.idle_ttl or now - entry[1] <= self.idle_ttl:
+                entry[1] = now
+                self._entries.move_to_end(tenant_id)
+                return entry[0]
+            self._entries.pop(tenant_id)
+            self._retire_locked(entry[0], "idle")
+        self._notify([tenant_id])
+        return None
+
+    def _retire_locked(self, driver, reason: str) -> None:
+        self._retired.append((driver, self._clock()))
+        self._evictions[reason] += 1
+
+    def _evict_locked(self) -> List[str]:
+        # Entries are ordered by last use, so idle ones are always at the front
+        now = self._clock()
+        evicted = []
+        while self._entries:
+            tenant_id, (driver, last_used) = next(iter(self._entries.items()))
+            over_size = len(self._entries) > self.max_drivers
+            idle = bool(self.idle_ttl) and now - last_used > self.idle_ttl
+            if not (over_size or idle):
+                break
+            self._entries.pop(tenant_id)
+            self._build_locks.pop(tenant_id, None)
+            self._retire_locked(driver, "idle" if idle else "lru")
+            evicted.append(tenant_id)
+        return evicted
+
+    def _notify(self, tenant_ids: List[str]) -> None:
+        if self._on_evict is not None:
+            for tenant_id in tenant_ids:
+                self._on_evict(tenant_id)
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.llm import openai_client, async_openai_client
+from app.services.conversation_store import CONVERSATIONS, ConversationStore
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # optional dependency (and the BPE file may not be downloadable)
+    _ENCODING = None
+
+# Per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD = 4
+
+
+def _fingerprint(message: dict) -> str:
+    raw = f"{message.get('role')}\x00{message.get('content')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _anchor(turns: List[dict], i: int) -> str:
+    return (_fingerprint(turns[i - 1]) if i > 0 else "") + _fingerprint(turns[i])
+
+
+class TokenCounter:
+    """Token counts per message, cached by content fingerprint so each turn is only counted once."""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+
+    @staticmethod
+    def _count_text(text: str) -> int:
+        if _ENCODING is not None:
+            return len(_ENCODING.encode(text))
+        return max(1, len(text) // 4)
+
+    def count_text(self, text: str) -> int:
+        return self._count_text(text)
+
+    def count(self, message: dict) -> int:
+        fp = _fingerprint(message)
+        with self._lock:
+            cached = self._cache.get(fp)
+            if cached is not None:
+                self._cache.move_to_end(fp)
+                return cached
+        tokens = self._count_text(str(message.get("content") or "")) + _MESSAGE_OVERHEAD
+        with self._lock:
+            self._cache[fp] = tokens
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+TOKENS = TokenCounter()
+
+class HistoryCompactor:
+    """
+    Keeps prompts within a token budget: the system preamble and the most recent turns are sent
+    verbatim, older turns are folded into an incrementally maintained summary.
+    The summary is kept as conversation state in the store ("summary:<pipeline_id>": summary,
+    anchor of the last folded turn, fingerprint of the first one), so a turn handled by another
+    worker continues it instead of summarising again.
+    """
+
+    SUMMARY_INSTRUCTIONS = '''
+        Eres un asistente que mantiene un resumen de una conversación larga entre un usuario y un asistente.
+        Actualiza el resumen previo incorporando los nuevos mensajes. Conserva todos los datos concretos (personas, lugares, fechas, objetos, respuestas dadas) y omite saludos y repeticiones.
+        Devuelve únicamente el resumen actualizado.
+    '''
+
+    def __init__(self, pipeline_id: str, budget_tokens: int = None, keep_recent: int = None, store: ConversationStore = None):
+        self.pipeline_id = pipeline_id
+        self.store = CONVERSATIONS if store is None else store
+        self.budget_tokens = settings.HISTORY_TOKEN_BUDGETS.get(pipeline_id, settings.HISTORY_TOKEN_BUDGET_DEFAULT) if budget_tokens is None else budget_tokens
+        self.keep_recent = settings.HISTORY_KEEP_RECENT if keep_recent is None else keep_recent
+
+    # ---------- Métodos públicos ----------
+    def compact(self, tenant_id: str, session_id: str, history: List[dict]) -> List[dict]:
+        plan = self._plan(tenant_id, session_id, history)
+        if plan is None:
+            return history
+        head, summary, new_turns, older, recent = plan
+        if new_turns:
+            folded = self._summarize(summary, new_turns)
+            # On failure the anchor stays put: the next turn folds these turns again
+            if folded is not None:
+                summary = folded
+                self._save(tenant_id, session_id, summary, new_turns, older)
+        return self._assemble(head, summary, recent)
+
+    async def acompact(self, tenant_id: str, session_id: str, history: List[dict]) -> List[dict]:
+        plan = self._plan(tenant_id, session_id, history)
+        if plan is None:
+            return history
+        head, summary, new_turns, older, recent = plan
+        if new_turns:
+            folded = await self._asummarize(summary, new_turns)
+            # On failure the anchor stays put: the next turn folds these turns again
+            if folded is not None:
+                summary = folded
+                self._save(tenant_id, session_id, summary, new_turns, older)
+        return self._assemble(head, summary, recent)
+
+    def summary(self, tenant_id: str, session_id: str) -> str:
+        state = self._state(tenant_id, session_id)
+        return state["summary"] if state else ""
+
+    def folded_out(self, tenant_id: str, session_id: str, history: List[dict]) -> bool:
+        """True if the summary covers turns that are no longer in `history` (trimmed by the store)"""
+        state = self._state(tenant_id, session_id)
+        if not state or not state.get("first"):
+            return False
+        return state["first"] not in {_fingerprint(m) for m in history}
+
+    def reset(self, tenant_id: str, session_id: str) -> None:
+        self.store.set_state(tenant_id, session_id, self._name(), None)
+
+    # ---------- Internos ----------
+    def _name(self) -> str:
+        return f"summary:{self.pipeline_id}"
+
+    def _state(self, tenant_id: str, session_id: str) -> Optional[dict]:
+        return self.store.get_state(tenant_id, session_id, self._name())
+
+    def _plan(self, tenant_id: str, session_id: str, history: List[dict]):
+        """Returns None if the history fits, else (head, previous summary, turns to fold, older turns, recent turns)"""
+        if not self.budget_tokens:
+            return None
+        head = history[:1] if history and history[0].get("role") == "system" else []
+        turns = history[len(head):]
+        used = sum(TOKENS.count(m) for m in history)
+        if used <= self.budget_tokens:
+            return None
+
+        # Keep as many recent turns as fit, reserving room for the summary itself
+        available = self.budget_tokens - sum(TOKENS.count(m) for m in head) - settings.HISTORY_SUMMARY_TOKENS
+        split = len(turns)
+        while split > 0:
+            cost = TOKENS.count(turns[split - 1])
+            if len(turns) - split >= self.keep_recent and cost > available:
+                break
+            available -= cost
+            split -= 1
+        older, recent = turns[:split], turns[split:]
+
+        state = self._state(tenant_id, session_id) or {}
+        summary, anchor = state.get("summary", ""), state.get("anchor")
+
+        # Only the turns after the last folded one are new. The anchor also covers the previous
+        # turn so a repeated short answer ("sí") is not mistaken for it; if the store already
+        # trimmed it away, every remaining older turn is new.
+        start = 0
+        if anchor:
+            anchors = [_anchor(turns, i) for i in range(len(turns))]
+            if anchor in anchors:
+                start = min(len(anchors) - anchors[::-1].index(anchor), len(older))
+        return head, summary, older[start:], older, recent
+
+    def _save(self, tenant_id: str, session_id: str, summary: str, new_turns: List[dict], older: List[dict]) -> None:
+        state = self._state(tenant_id, session_id) or {}
+        self.store.set_state(tenant_id, session_id, self._name(), {
+            "summary": summary,
+            "anchor": _anchor(older, len(older) - 1),
+            # First turn ever folded: once the store trims it, the summary is all that is left of it
+            "first": state.get("first") or _fingerprint(new_turns[0]),
+        })
+
+    def _summary_input(self, summary: str, new_turns: List[dict]) -> str:
+        conversation = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in new_turns)
+        return f"Resumen previo: {summary or '(vacío)'}\n\nNuevos mensajes:\n{conversation}"
+
+    def _summarize(self, summary: str, new_turns: List[dict]) -> Optional[str]:
+        try:
+            return openai_client.responses.create(
+                model="gpt-4o-mini",
+                instructions=self.SUMMARY_INSTRUCTIONS,
+                input=self._summary_input(summary, new_turns),
+                temperature=0,
+            ).output_text.strip()
+        except Exception:
+            logger.exception("History summarization failed, keeping previous summary")
+            return None
+
+    async def _asummarize(self, summary: str, new_turns: List[dict]) -> Optional[str]:
+        try:
+            return (await async_openai_client.responses.create(
+                model="gpt-4o-mini",
+                instructions=self.SUMMARY_INSTRUCTIONS,
+                input=self._summary_input(summary, new_turns),
+                temperature=0,
+            )).output_text.strip()
+        except Exception:
+            logger.exception("History summarization failed, keeping previous summary")
+            return None
+
+    def _assemble(self, head: List[dict], summary: str, recent: List[dict]) -> List[dict]:
+        folded = [{"role": "system", "content": f"Resumen de la conversación anterior: {summary}"}] if summary else []
+        return head + folded + recent
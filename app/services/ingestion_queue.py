@@ -0,0 +1,260 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine as default_engine
+from app.models.db_models import IngestionJob
+from app.models.schemas import JobInfo
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Id of the job a handler is running (set per worker task), for handlers that report progress
+current_job: ContextVar[Optional[int]] = ContextVar("ingestion_job", default=None)
+
+
+def _claimable(now: datetime):
+    # Oldest unfinished job of each tenant: a tenant's jobs run one at a time, in order
+    older = aliased(IngestionJob)
+    blocked = exists().where(
+        older.tenant_id == IngestionJob.tenant_id,
+        older.id < IngestionJob.id,
+        older.status.in_(["pending", "running"]),
+    )
+    return (
+        select(IngestionJob.id)
+        .where(IngestionJob.status == "pending", IngestionJob.available_at <= now, ~blocked)
+        .order_by(IngestionJob.id)
+        .limit(20)
+    )
+
+
+class IngestionQueue:
+
+    def __init__(self, engine=default_engine):
+        self.engine = engine
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._recovered_at = 0.0
+
+    # ---------- Conversores  ----------
+    def _row_to_jobInfo(self, row: IngestionJob) -> JobInfo:
+        return JobInfo(
+            id=row.id,
+            kind=row.kind,
+            status=row.status,
+            attempts=row.attempts,
+            error=row.error,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            total=row.progress_total,
+            done=row.progress_done,
+            failed=row.progress_failed,
+            throughput=self._throughput(row),
+        )
+
+    @staticmethod
+    def _throughput(row: IngestionJob) -> Optional[float]:
+        if not row.started_at or not row.progress_done:
+            return None
+        elapsed = (row.updated_at - row.started_at).total_seconds()
+        return round(row.progress_done / elapsed, 3) if elapsed > 0 else None
+
+    # ---------- Métodos públicos ----------
+    def register_handler(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, tenant_id: str, kind: str, payload: Dict[str, Any]) -> int:
+        """Persiste un trabajo pendiente y despierta a los workers"""
+        with Session(self.engine) as session:
+            job = IngestionJob(tenant_id=tenant_id, kind=kind, payload=json.dumps(payload, ensure_ascii=False))
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            job_id = job.id
+
+        if self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def get(self, job_id: int, tenant_id: Optional[str] = None) -> Optional[JobInfo]:
+        with Session(self.engine) as session:
+            row = session.get(IngestionJob, job_id)
+            if not row or (tenant_id is not None and row.tenant_id != tenant_id):
+                return None
+            return self._row_to_jobInfo(row)
+
+    def progress(self, job_id: int, done: int, total: int, failed: int = 0) -> None:
+        """Guarda el avance de un trabajo por lotes; también renueva su lease"""
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as session:
+            job = session.get(IngestionJob, job_id)
+            if job is None:
+                return
+            job.progress_done, job.progress_total, job.progress_failed = done, total, failed
+            job.updated_at = now
+            session.add(job)
+            session.commit()
+
+    async def start(self, workers: int = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self.recover_stale)
+        for i in range(workers if workers is not None else settings.INGESTION_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}"))
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._wakeup = None
+
+    def recover_stale(self) -> int:
+        """Vuelve a poner en cola los trabajos 'running' cuyo lease ha caducado (p.ej. tras un reinicio)"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.INGESTION_JOB_LEASE)
+        with Session(self.engine) as session:
+            result = session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.status == "running", IngestionJob.updated_at < cutoff)
+                .values(status="pending", updated_at=datetime.now(timezone.utc))
+            )
+            session.commit()
+            return result.rowcount
+
+    async def run_once(self) -> bool:
+        """Procesa como mucho un trabajo. Devuelve False si no había nada que hacer"""
+        job = await asyncio.to_thread(self._claim)
+        if job is None:
+            return False
+        await self._run(job)
+        return True
+
+    # ---------- Internos ----------
+    async def _worker(self) -> None:
+        while True:
+            try:
+                # Leases left by a killed process (any worker of any process may requeue them)
+                if time.monotonic() - self._recovered_at >= settings.INGESTION_RECOVER_INTERVAL:
+                    self._recovered_at = time.monotonic()
+                    if await asyncio.to_thread(self.recover_stale):
+                        logger.info("Requeued ingestion jobs with an expired lease")
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingestion worker error")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INGESTION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self) -> Optional[IngestionJob]:
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as session:
+            candidates = session.execute(_claimable(now)).scalars().all()
+            for job_id in candidates:
+                # Conditional update: only one worker (or process) wins the job
+                result = session.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job_id, IngestionJob.status == "pending")
+                    .values(
+                        status="running",
+                        attempts=IngestionJob.attempts + 1,
+                        updated_at=now,
+                        started_at=func.coalesce(IngestionJob.started_at, now),
+                    )
+                )
+                session.commit()
+                if result.rowcount == 1:
+                    job = session.get(IngestionJob, job_id)
+                    session.refresh(job)
+                    session.expunge(job)
+                    return job
+        return None
+
+    async def _run(self, job: IngestionJob) -> None:
+        handler = self._handlers.get(job.kind)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind {job.kind}")
+            token = current_job.set(job.id)
+            try:
+                await handler(job.tenant_id, json.loads(job.payload))
+            finally:
+                current_job.reset(token)
+        except asyncio.CancelledError:
+            # Shutdown: the job goes back to the queue now instead of waiting for its lease
+            self._release(job.id)
+            raise
+        except Exception as e:
+            logger.exception("Ingestion job %s (%s) failed, attempt %s", job.id, job.kind, job.attempts)
+            await asyncio.to_thread(self._finish, job.id, job.attempts, repr(e))
+        else:
+            await asyncio.to_thread(self._finish, job.id, job.attempts, None)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(settings.INGESTION_HEARTBEAT_INTERVAL)
+            try:
+                await asyncio.to_thread(self._renew, job_id)
+            except Exception:
+                logger.exception("Could not renew the lease of ingestion job %s", job_id)
+
+    def _renew(self, job_id: int) -> None:
+        with Session(self.engine) as session:
+            session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "running")
+                .values(updated_at=datetime.now(timezone.utc))
+            )
+            session.commit()
+
+    def _release(self, job_id: int) -> None:
+        """Interrupted job: pending again, without spending an attempt"""
+        with Session(self.engine) as session:
+            session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "running")
+                .values(status="pending", attempts=IngestionJob.attempts - 1, updated_at=datetime.now(timezone.utc))
+            )
+            session.commit()
+
+    def _finish(self, job_id: int, attempts: int, error: Optional[str]) -> None:
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as session:
+            job = session.get(IngestionJob, job_id)
+            job.error = error
+            job.updated_at = now
+            if error is None:
+                job.status = "done"
+            elif attempts < settings.INGESTION_MAX_ATTEMPTS:
+                job.status = "pending"
+                job.available_at = now + timedelta(seconds=settings.INGESTION_RETRY_BACKOFF * 2 ** (attempts - 1))
+            else:
+                job.status = "failed"
+            session.add(job)
+            session.commit()
+
+
+INGESTION = IngestionQueue()
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Milvus collection property with the corpus version, set by each seed (app/scripts/milvus.py)
+VERSION_PROPERTY = "kb.version"
+
+
+class KnowledgeBase(ABC):
+    """Passages of an activity corpus ranked by inner product with a query embedding."""
+
+    def search(self, vector: List[float], limit: int = 3) -> List[str]:
+        return self.search_many([vector], limit=limit)[0]
+
+    @abstractmethod
+    def version(self) -> str:
+        """Engine, corpus and seed fingerprint: results cached under another version are stale"""
+
+    @abstractmethod
+    def search_many(self, vectors: Sequence[List[float]], limit: int = 3) -> List[List[str]]: ...
+
+
+class MilvusKnowledgeBase(KnowledgeBase):
+    """Activities knowledge base in Milvus (inner product over text-embedding-3-small vectors)."""
+
+    def __init__(self, uri: str, collection_name: str):
+        self.uri = uri
+        self.collection_name = collection_name
+        self._client = None
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[str, float]] = None  # (version, checked at)
+
+    @property
+    def client(self):
+        # Connected on first use: importing the app must not open the Milvus file
+        with self._lock:
+            if self._client is None:
+                from pymilvus import MilvusClient
+                self._client = MilvusClient(uri=self.uri)
+            return self._client
+
+    def search_many(self, vectors: Sequence[List[float]], limit: int = 3) -> List[List[str]]:
+        search_res = self.client.search(
+            collection_name=self.collection_name,
+            data=list(vectors),
+            limit=limit,
+            search_params={"metric_type": "IP", "params": {}},  # Inner product distance
+            output_fields=["text"],
+        )
+        return [[res["entity"]["text"] for res in hits] for hits in search_res]
+
+    def version(self) -> str:
+        # Re-read every KB_VERSION_CHECK_INTERVAL seconds; if Milvus does not answer, the last one read
+        cached = self._version
+        if cached is not None and time.monotonic() - cached[1] < settings.KB_VERSION_CHECK_INTERVAL:
+            return cached[0]
+        try:
+            properties = self.client.describe_collection(self.collection_name).get("properties") or {}
+            version = f"milvus:{self.collection_name}:{properties.get(VERSION_PROPERTY, '')}"
+        except Exception as e:
+            if cached is None:
+                raise
+            logger.warning("Could not read the knowledge base version: %r", e)
+            version = cached[0]
+        self._version = (version, time.monotonic())
+        return version
+
+    def set_version(self) -> str:
+        """Marks a new seed of the collection (cached question contexts are recomputed)"""
+        version = uuid.uuid4().hex
+        self.client.alter_collection_properties(self.collection_name, properties={VERSION_PROPERTY: version})
+        self._version = None
+        return version
+
+
+def _index_file(name: str, version: Optional[str]) -> str:
+    return f"{name}.{version}.bin" if version else f"{name}.bin"
+
+
+class NumpyKnowledgeBase(KnowledgeBase):
+    """
+    In-process index for small corpora, stored in a directory:
+      meta.json             {"count", "dim", "dtype", "version"}
+      vectors.<version>.bin (count, dim) row-major float32 or float16
+      texts.<version>.bin   UTF-8 passages, back to back
+      offsets.<version>.bin int64 (count + 1) byte offsets into texts.bin
+    meta.json is the commit point: a write adds the files of a new version and then replaces
+    meta.json atomically, so readers (and crashes) only ever see a complete version. Indexes written
+    before versioned names keep using vectors.bin / texts.bin / offsets.bin.
+    Files are memory-mapped on first search. float32 matrices are used in place; float16 ones halve
+    the file and are upcast once at load so the product still runs in BLAS. A re-seeded index (new
+    meta.json) is mapped again on the next call.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._loaded: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._meta: Optional[dict] = None
+        self._meta_mtime: Optional[int] = None
+
+    def _check_meta(self) -> dict:
+        # Caller holds the lock
+        mtime = (self.path / "meta.json").stat().st_mtime_ns
+        if mtime != self._meta_mtime:
+            self._meta = json.loads((self.path / "meta.json").read_text())
+            self._meta_mtime = mtime
+            self._loaded = None
+        return self._meta
+
+    def version(self) -> str:
+        with self._lock:
+            meta = self._check_meta()
+        return f"numpy:{self.path}:{meta.get('version', self._meta_mtime)}"
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            meta = self._check_meta()
+            if self._loaded is None:
+                count, dim = meta["count"], meta["dim"]
+                files = {name: self.path / _index_file(name, meta.get("version")) for name in ("vectors", "texts", "offsets")}
+                vectors = np.memmap(files["vectors"], dtype=meta["dtype"], mode="r", shape=(count, dim)) if count else np.zeros((0, dim), np.float32)
+                if vectors.dtype != np.float32:
+                    vectors = np.asarray(vectors, dtype=np.float32)
+                offsets = np.fromfile(files["offsets"], dtype=np.int64)
+                texts = np.memmap(files["texts"], dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, np.uint8)
+                self._loaded = (vectors, offsets, texts)
+            return self._loaded
+
+    def __len__(self) -> int:
+        return self._load()[0].shape[0]
+
+    @staticmethod
+    def _text(offsets: np.ndarray, texts: np.ndarray, i: int) -> str:
+        return texts[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def search_many(self, vectors: Sequence[List[float]], limit: int = 3) -> List[List[str]]:
+        # One snapshot per call: a concurrent re-seed never mixes two indexes in one answer
+        matrix, offsets, texts = self._load()
+        k = min(limit, matrix.shape[0])
+        if k <= 0:
+            return [[] for _ in vectors]
+
+        scores = np.asarray(vectors, dtype=np.float32) @ matrix.T          # (queries, passages)
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]                  # unordered top-k
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return [[self._text(offsets, texts, i) for i in row] for row in np.take_along_axis(top, order, axis=1)]
+
+
+class NumpyIndexWriter:
+    """
+    Streams (texts, vectors) batches into a NumpyKnowledgeBase directory as a new version, published
+    by replacing meta.json on close. The previous version is kept for readers that already read the
+    old meta.json; older ones are removed.
+    """
+
+    def __init__(self, path, dim: int, dtype: str = "float32"):
+        self.path = Path(path)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.version = uuid.uuid4().hex
+        self.count = 0
+        self._offsets = [0]
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors = open(self.path / _index_file("vectors", self.version), "wb")
+        self._texts = open(self.path / _index_file("texts", self.version), "wb")
+
+    def add(self, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        matrix = np.asarray(vectors, dtype=self.dtype).reshape(len(texts), self.dim)
+        self._vectors.write(matrix.tobytes())
+        for text in texts:
+            data = text.encode("utf-8")
+            self._texts.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+        self.count += len(texts)
+
+    def close(self) -> None:
+        self._vectors.close()
+        self._texts.close()
+        np.asarray(self._offsets, dtype=np.int64).tofile(self.path / _index_file("offsets", self.version))
+        previous = self._current_version()
+        meta = {"count": self.count, "dim": self.dim, "dtype": self.dtype.name, "version": self.version}
+        (self.path / "meta.json.tmp").write_text(json.dumps(meta))
+        os.replace(self.path / "meta.json.tmp", self.path / "meta.json")
+        self._remove_versions(keep={self.version, previous})
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            return json.loads((self.path / "meta.json").read_text()).get("version")
+        except FileNotFoundError:
+            return None
+
+    def _remove_versions(self, keep: set) -> None:
+        for name in ("vectors", "texts", "offsets"):
+            for file in self.path.glob(f"{name}*.bin"):
+                version = file.name[len(name) + 1:-len(".bin")] or None
+                if version not in keep:
+                    file.unlink(missing_ok=True)
+
+    def __enter__(self) -> "NumpyIndexWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Never published: the current version stays as it was
+            self._vectors.close()
+            self._texts.close()
+            for name in ("vectors", "texts"):
+                (self.path / _index_file(name, self.version)).unlink(missing_ok=True)
+
+
+def numpy_index_dir(activity_id: Optional[str]) -> Path:
+    return Path(settings.KNOWLEDGE_BASE_NUMPY_DIR) / (activity_id or settings.KNOWLEDGE_BASE_COLLECTION)
+
+
+KNOWLEDGE_BASE = MilvusKnowledgeBase(settings.MILVUS_URI, settings.KNOWLEDGE_BASE_COLLECTION)
+
+_knowledge_bases: Dict[Tuple[str, str], KnowledgeBase] = {}
+_knowledge_bases_lock = threading.Lock()
+
+
+def get_knowledge_base(activity_id: Optional[str] = None) -> KnowledgeBase:
+    """Engine configured for the activity (KNOWLEDGE_BASE_BACKENDS, else KNOWLEDGE_BASE_BACKEND), one per process"""
+    backend = settings.KNOWLEDGE_BASE_BACKENDS.get(activity_id or "", settings.KNOWLEDGE_BASE_BACKEND).lower()
+    if backend == "milvus":
+        return KNOWLEDGE_BASE
+    if backend != "numpy":
+        raise ValueError(f"Unknown knowledge base backend for {activity_id}: {backend}")
+
+    path = numpy_index_dir(activity_id)
+    with _knowledge_bases_lock:
+        kb = _knowledge_bases.get((backend, str(path)))
+        if kb is None:
+            kb = _knowledge_bases[(backend, str(path))] = NumpyKnowledgeBase(path)
+        return kb
@@ -0,0 +1,237 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import neo4j
+
+from app.core.config import settings
+from app.models.schemas import EntityPage, GraphEntity, GraphRelation, RelationPage
+from app.services.bounded_store import BoundedSessionMap
+from app.services.retrieval import lucene_query
+from app.services.tenant_manager import TENANTS
+from app.services.tenant_schema import ENTITY_FULLTEXT_INDEX
+
+
+def _guardar_schema() -> Tuple[List[dict], List[dict]]:
+    # Imported here: pipeline_guardar invalidates this cache after its KG jobs
+    from app.pipelines.pipeline_guardar import PipelineGuardar
+    return PipelineGuardar.NODES, PipelineGuardar.RELATIONS
+
+
+def encode_cursor(keys: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(keys).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> List[Any]:
+    """Keys of the last item of the previous page ([None] * size for the first page)"""
+    if not cursor:
+        return [None] * size
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Cursor inválido")
+    if not isinstance(keys, list) or len(keys) != size or not all(isinstance(k, str) for k in keys):
+        raise ValueError("Cursor inválido")
+    return keys
+
+
+def _plain(value: Any) -> Any:
+    """neo4j temporal values as ISO strings, so responses (and cached pages) are plain JSON"""
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    return value
+
+
+class MemoryGraph:
+    """
+    Read-only queries over a tenant memory graph with plain parameterized Cypher, no LLM involved:
+    entity lookup (full-text), neighbours, Event timeline and listing by label. Labels and relation
+    types come from PipelineGuardar.NODES / RELATIONS; only those are accepted and only their
+    properties are returned. Listings use keyset cursors, so a page costs the same at any depth.
+    Pages are cached per tenant for MEMORY_QUERY_CACHE_TTL seconds and dropped when a KG job of the
+    tenant finishes in this process.
+    """
+
+    LIST_QUERY = """
+    MATCH (n:{label})
+    WITH n, coalesce(toString(n.name), '') AS name
+    WHERE $after_name IS NULL OR name > $after_name OR (name = $after_name AND elementId(n) > $after_id)
+    WITH n, name ORDER BY name, elementId(n) LIMIT $limit
+    RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props, [name, elementId(n)] AS keys
+    """
+
+    LOOKUP_QUERY = """
+    CALL db.index.fulltext.queryNodes($index, $query, {limit: $limit * 4}) YIELD node, score
+    WHERE $label IS NULL OR $label IN labels(node)
+    RETURN elementId(node) AS id, labels(node) AS labels, properties(node) AS props, score
+    LIMIT $limit
+    """
+
+    NEIGHBORS_QUERY = """
+    MATCH (n) WHERE elementId(n) = $id
+    OPTIONAL MATCH (n)-[r]-(m)
+    WHERE type(r) IN $types AND ($after_id IS NULL OR elementId(r) > $after_id)
+    WITH n, r, m ORDER BY elementId(r) LIMIT $limit
+    RETURN elementId(r) AS rel_id, type(r) AS type, startNode(r) = n AS outgoing, properties(r) AS rel_props,
+           elementId(m) AS id, labels(m) AS labels, properties(m) AS props, [elementId(r)] AS keys
+    """
+
+    TIMELINE_QUERY = """
+    MATCH (e:Event)
+    WITH e, toString(coalesce(e.fromDate, e.date)) AS day
+    WHERE day IS NOT NULL
+      AND ($from IS NULL OR day >= $from) AND ($to IS NULL OR day <= $to)
+      AND ($after_day IS NULL OR day > $after_day OR (day = $after_day AND elementId(e) > $after_id))
+    WITH e, day ORDER BY day, elementId(e) LIMIT $limit
+    RETURN elementId(e) AS id, labels(e) AS labels, properties(e) AS props, [day, elementId(e)] AS keys
+    """
+
+    def __init__(
+        self,
+        schema: Callable[[], Tuple[List[dict], List[dict]]] = _guardar_schema,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._schema = schema
+        self._clock = clock
+        self._cache = BoundedSessionMap(
+            max_sessions=settings.MEMORY_QUERY_CACHE_SIZE,
+            max_sessions_per_tenant=0,
+            idle_ttl=settings.MEMORY_QUERY_CACHE_TTL,
+            sizeof=lambda entry: len(entry[1].model_dump_json()),
+            clock=clock,
+        )
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- Métodos públicos ----------
+    async def list_entities(self, tenant_id: str, label: str, limit: int = 20, cursor: Optional[str] = None) -> EntityPage:
+        self._check_label(label)
+        after_name, after_id = decode_cursor(cursor, 2)
+        query = self.LIST_QUERY.format(label=f"`{label}`")
+        params = {"after_name": after_name, "after_id": after_id}
+        return await self._page(tenant_id, "list", query, params, self._limit(limit), EntityPage, self._entity)
+
+    async def lookup(self, tenant_id: str, text: str, label: Optional[str] = None, limit: int = 20) -> EntityPage:
+        """Entities whose name/description match the words of `text`, best first (ranked, not paginated)"""
+        if label is not None:
+            self._check_label(label)
+        query_text = lucene_query(text)
+        if not query_text:
+            return EntityPage(items=[])
+        params = {"index": ENTITY_FULLTEXT_INDEX, "query": query_text, "label": label, "limit": self._limit(limit)}
+
+        async def run() -> EntityPage:
+            records = await self._query(tenant_id, self.LOOKUP_QUERY, params)
+            return EntityPage(items=[self._entity(r, score=r["score"]) for r in records])
+
+        return await self._cached(tenant_id, ("lookup", params), run)
+
+    async def neighbors(
+        self, tenant_id: str, entity_id: str, rel_type: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None
+    ) -> Optional[RelationPage]:
+        """Relations of an entity (None if it does not exist)"""
+        types = self._relation_types()
+        if rel_type is not None:
+            if rel_type not in types:
+                raise ValueError(f"Tipo de relación desconocido: {rel_type}")
+            types = [rel_type]
+        (after_id,) = decode_cursor(cursor, 1)
+        params = {"id": entity_id, "types": types, "after_id": after_id}
+        return await self._page(tenant_id, "neighbors", self.NEIGHBORS_QUERY, params, self._limit(limit), RelationPage, self._relation)
+
+    async def timeline(
+        self, tenant_id: str, from_: Optional[str] = None, to: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None
+    ) -> EntityPage:
+        """Events by fromDate (or date), oldest first; `from_`/`to` are inclusive ISO dates"""
+        after_day, after_id = decode_cursor(cursor, 2)
+        params = {"from": from_, "to": to, "after_day": after_day, "after_id": after_id}
+        return await self._page(tenant_id, "timeline", self.TIMELINE_QUERY, params, self._limit(limit), EntityPage, self._entity)
+
+    def invalidate(self, tenant_id: str) -> None:
+        """The tenant graph changed: its cached pages are no longer served (they age out of the LRU)"""
+        with self._lock:
+            self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, **self._cache.stats()}
+
+    # ---------- Internos ----------
+    def _limit(self, limit: int) -> int:
+        return max(1, min(limit, settings.MEMORY_QUERY_MAX_LIMIT))
+
+    def _labels(self) -> Dict[str, List[str]]:
+        nodes, _ = self._schema()
+        return {node["label"]: [p["name"] for p in node.get("properties", [])] for node in nodes}
+
+    def _relation_types(self) -> List[str]:
+        _, relations = self._schema()
+        return [relation["label"] for relation in relations]
+
+    def _check_label(self, label: str) -> None:
+        if label not in self._labels():
+            raise ValueError(f"Etiqueta desconocida: {label}")
+
+    def _entity(self, record, score: Optional[float] = None) -> Optional[GraphEntity]:
+        if record["id"] is None:
+            return None
+        labels = self._labels()
+        label = next((l for l in record["labels"] if l in labels), None)
+        if label is None:
+            label = next((l for l in record["labels"] if not l.startswith("__")), "")
+        allowed = labels.get(label, ["name"])
+        props = {k: _plain(v) for k, v in (record["props"] or {}).items() if k in allowed}
+        return GraphEntity(id=record["id"], label=label, properties=props, score=score)
+
+    def _relation(self, record) -> Optional[GraphRelation]:
+        node = self._entity(record)
+        if record["rel_id"] is None or node is None:
+            return None
+        return GraphRelation(
+            id=record["rel_id"],
+            type=record["type"],
+            direction="out" if record["outgoing"] else "in",
+            properties={k: _plain(v) for k, v in (record["rel_props"] or {}).items() if not k.startswith("__")},
+            node=node,
+        )
+
+    async def _page(self, tenant_id: str, kind: str, query: str, params: dict, limit: int, page_type, build):
+        async def run():
+            # One extra row tells whether there is a next page
+            records = await self._query(tenant_id, query, {**params, "limit": limit + 1})
+            if kind == "neighbors" and not records:
+                return None  # no such entity
+            items = [item for item in (build(r) for r in records[:limit]) if item is not None]
+            next_cursor = encode_cursor(records[limit - 1]["keys"]) if len(records) > limit else None
+            return page_type(items=items, next_cursor=next_cursor)
+
+        return await self._cached(tenant_id, (kind, query, params, limit), run)
+
+    async def _cached(self, tenant_id: str, key, run):
+        with self._lock:
+            generation = self._generations.get(tenant_id, 0)
+        cache_key = (tenant_id, f"{generation}:{json.dumps(key, sort_keys=True, default=str)}")
+        entry = self._cache.get(cache_key)
+        if entry is not None and self._clock() - entry[0] <= settings.MEMORY_QUERY_CACHE_TTL:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        page = await run()
+        if page is not None:
+            self._cache.put(cache_key, (self._clock(), page))
+        return page
+
+    async def _query(self, tenant_id: str, query: str, params: dict) -> List[neo4j.Record]:
+        # Driver creation reads SQLite and may wake a hibernated container: off the event loop
+        driver, database = await asyncio.to_thread(lambda: (TENANTS.get_async_driver(tenant_id), TENANTS.get_database(tenant_id)))
+        records, _, _ = await driver.execute_query(query, params, database_=database, routing_=neo4j.RoutingControl.READ)
+        return records
+
+
+MEMORY_GRAPH = MemoryGraph()
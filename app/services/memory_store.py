@@ -1,18 +1,28 @@
-from collections import defaultdict
 from typing import Dict
 
+from app.core.config import settings
+from app.services.bounded_store import BoundedSessionMap
+
 class MemoryStore:
 
-    def __init__(self):
-        self._data: Dict[str, Dict[str, str]] = defaultdict(lambda: defaultdict(str))
+    def __init__(self, max_sessions: int = None, max_sessions_per_tenant: int = None, idle_ttl: float = None):
+        self._data = BoundedSessionMap(
+            max_sessions=settings.SESSION_MAX_TOTAL if max_sessions is None else max_sessions,
+            max_sessions_per_tenant=settings.SESSION_MAX_PER_TENANT if max_sessions_per_tenant is None else max_sessions_per_tenant,
+            idle_ttl=settings.SESSION_IDLE_TTL if idle_ttl is None else idle_ttl,
+            sizeof=lambda content: len(content.encode("utf-8")),
+        )
 
     def set(self, tenant_id: str, session_id: str, content: str):
-        self._data[tenant_id][session_id] = content
+        self._data.put((tenant_id, session_id), content)
 
     def get(self, tenant_id: str, session_id: str) -> str:
-        return self._data[tenant_id][session_id]
+        return self._data.get((tenant_id, session_id)) or ""
 
     def clear(self, tenant_id: str, session_id: str):
-        self._data[tenant_id].pop(session_id, None)
+        self._data.pop((tenant_id, session_id))
+
+    def stats(self) -> Dict[str, object]:
+        return self._data.stats()
 
-MEMORIES = MemoryStore()
\ No newline at end of file
+MEMORIES = MemoryStore()
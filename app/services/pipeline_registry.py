@@ -1,6 +1,11 @@
-from typing import Dict, Callable, List
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Callable, List, Optional, Tuple
 from dataclasses import dataclass
 
+from app.core.config import settings
+
 @dataclass
 class RegisteredPipeline:
     id: str
@@ -9,9 +14,19 @@ class RegisteredPipeline:
     factory: Callable[[], object]
 
 class PipelineRegistry:
-    def __init__(self):
+    def __init__(self, max_instances: int = None, idle_ttl: float = None):
         self._registry: Dict[str, RegisteredPipeline] = {}
 
+        # Instance cache: (pipeline_id, tenant_id) -> (pipeline, last_used), ordered by recency
+        self._instances: "OrderedDict[Tuple[str, str], Tuple[object, float]]" = OrderedDict()
+        self._instances_lock = threading.Lock()
+        self._build_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._generations: Dict[str, int] = {}
+        self._max_instances = max_instances if max_instances is not None else settings.PIPELINE_CACHE_MAX_SIZE
+        self._idle_ttl = idle_ttl if idle_ttl is not None else settings.PIPELINE_CACHE_IDLE_TTL
+        # Called with the tenant id on every instance lookup (TenantManager keeps its driver LRU fresh)
+        self.on_access: Optional[Callable[[str], None]] = None
+
     def register(self, pipe: RegisteredPipeline):
         if pipe.id in self._registry:
             raise ValueError(f"Pipeline id already registered: {pipe.id}")
@@ -25,4 +40,80 @@ class PipelineRegistry:
     def list(self) -> List[RegisteredPipeline]:
         return list(self._registry.values())
 
+    # ---------- Instance cache ----------
+    def get_instance(self, pipeline_id: str, tenant_id: str) -> object:
+        """Devuelve la instancia cacheada del pipeline para el tenant, construyéndola si no existe"""
+        reg = self.get(pipeline_id)
+        key = (pipeline_id, tenant_id)
+        if self.on_access is not None:
+            self.on_access(tenant_id)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        # Single-flight: only one thread builds a given (pipeline, tenant) instance
+        with self._instances_lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+
+            with self._instances_lock:
+                generation = self._generations.get(tenant_id, 0)
+            pipeline = reg.factory(tenant_id)
+            with self._instances_lock:
+                # The tenant was invalidated while building: hand out the instance but don't cache it
+                if self._generations.get(tenant_id, 0) != generation:
+                    self._build_locks.pop(key, None)
+                    return pipeline
+                self._instances[key] = (pipeline, time.monotonic())
+                self._instances.move_to_end(key)
+                self._evict_locked()
+            return pipeline
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        """Descarta todas las instancias de un tenant (p.ej. al cambiar su configuración de Neo4j)"""
+        with self._instances_lock:
+            self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+            for key in [k for k in self._instances if k[1] == tenant_id]:
+                self._drop_locked(key)
+
+    def clear_instances(self) -> None:
+        with self._instances_lock:
+            self._instances.clear()
+            self._build_locks.clear()
+
+    def _lookup(self, key: Tuple[str, str]):
+        now = time.monotonic()
+        with self._instances_lock:
+            entry = self._instances.get(key)
+            if entry is None:
+                return None
+            pipeline, last_used = entry
+            if self._idle_ttl and now - last_used > self._idle_ttl:
+                self._drop_locked(key)
+                return None
+            self._instances[key] = (pipeline, now)
+            self._instances.move_to_end(key)
+            return pipeline
+
+    def _evict_locked(self) -> None:
+        # Entries are ordered by last use, so idle ones are always at the front
+        now = time.monotonic()
+        while self._instances:
+            key, (_, last_used) = next(iter(self._instances.items()))
+            over_size = len(self._instances) > self._max_instances
+            idle = bool(self._idle_ttl) and now - last_used > self._idle_ttl
+            if not (over_size or idle):
+                break
+            self._drop_locked(key)
+
+    def _drop_locked(self, key: Tuple[str, str]) -> None:
+        # The build lock goes with the instance: with many tenants the lock dict would grow unbounded
+        self._instances.pop(key, None)
+        self._build_locks.pop(key, None)
+
 PIPELINES = PipelineRegistry()
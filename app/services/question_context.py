@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine as default_engine
+from app.core.embeddings import get_embedder, KB_EMBEDDING_MODEL
+from app.models.db_models import QuestionContext
+from app.models.schemas import QuestionDetail
+from app.services.activity_manager import ACTIVITIES
+from app.services.knowledge_base import get_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QuestionContextInfo:
+    question_hash: str
+    embedding: List[float]
+    passages: List[str]
+    kb_version: Optional[str] = None
+
+    def text(self) -> str:
+        return "\n".join(self.passages)
+
+
+def question_text(question: QuestionDetail) -> str:
+    return "\n".join(part for part in (question.contexto, question.pregunta, question.respuesta_correcta) if part).strip()
+
+
+def question_hash(question: QuestionDetail) -> str:
+    return hashlib.sha256(question_text(question).encode("utf-8")).hexdigest()
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class QuestionContextStore:
+    """
+    Question embedding and top-k knowledge base passages per ActivityQuestion, stored in the
+    `questioncontext` table next to the questions. Rows are computed at seed time or lazily on the
+    first turn, and recomputed when the question text (hash), the embedding model or the knowledge
+    base (engine or seed, KnowledgeBase.version) changes.
+    """
+
+    def __init__(self, engine=default_engine, knowledge_base=None, embedder=None, top_k: int = None):
+        self.engine = engine
+        # None: the engine configured for each question's activity
+        self.knowledge_base = knowledge_base
+        self.embedder = get_embedder(KB_EMBEDDING_MODEL) if embedder is None else embedder
+        self.top_k = settings.QUESTION_CONTEXT_TOP_K if top_k is None else top_k
+        # Questions are static: rows are kept in memory after the first read
+        self._cache: Dict[Tuple[str, str], QuestionContextInfo] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Métodos públicos ----------
+    def get(self, question: QuestionDetail) -> Optional[QuestionContextInfo]:
+        key, qhash = (question.activity_id, question.id), question_hash(question)
+        kb_version = self._knowledge_base(question).version()
+        with self._lock:
+            info = self._cache.get(key)
+        if info is not None and info.question_hash == qhash and info.kb_version == kb_version:
+            return info
+
+        with Session(self.engine) as session:
+            row = session.get(QuestionContext, key)
+            if row is None or row.question_hash != qhash or row.embedding_model != self.embedder.model or row.kb_version != kb_version:
+                return None
+            info = QuestionContextInfo(qhash, json.loads(row.embedding), json.loads(row.passages), kb_version)
+        with self._lock:
+            self._cache[key] = info
+        return info
+
+    def compute(self, question: QuestionDetail) -> QuestionContextInfo:
+        qhash = question_hash(question)
+        knowledge_base = self._knowledge_base(question)
+        # Read before searching: a seed finishing meanwhile makes this row stale, not the other way round
+        kb_version = knowledge_base.version()
+        embedding = self.embedder.embed_query(question_text(question))
+        passages = knowledge_base.search(embedding, limit=self.top_k)
+        info = QuestionContextInfo(qhash, embedding, passages, kb_version)
+
+        with Session(self.engine) as session:
+            row = session.get(QuestionContext, (question.activity_id, question.id)) or QuestionContext(
+                activity_id=question.activity_id, question_id=question.id,
+                question_hash=qhash, embedding_model=self.embedder.model, embedding="[]", passages="[]",
+            )
+            row.question_hash = qhash
+            row.embedding_model = self.embedder.model
+            row.embedding = json.dumps(embedding)
+            row.passages = json.dumps(passages, ensure_ascii=False)
+            row.kb_version = kb_version
+            session.add(row)
+            session.commit()
+
+        with self._lock:
+            self._cache[(question.activity_id, question.id)] = info
+        return info
+
+    def get_or_compute(self, question: QuestionDetail) -> QuestionContextInfo:
+        return self.get(question) or self.compute(question)
+
+    def precompute_activity(self, activity_id: str, force: bool = False) -> int:
+        """Seed-time precompute of every question of an activity; returns how many rows were (re)built"""
+        built = 0
+        for question in ACTIVITIES.get_questions_for_activity(activity_id):
+            if force or self.get(question) is None:
+                self.compute(question)
+                built += 1
+        return built
+
+    def invalidate(self, activity_id: str, question_id: str) -> None:
+        with self._lock:
+            self._cache.pop((activity_id, question_id), None)
+
+    # ---------- Internos ----------
+    def _knowledge_base(self, question: QuestionDetail):
+        return get_knowledge_base(question.activity_id) if self.knowledge_base is None else self.knowledge_base
+
+
+QUESTION_CONTEXTS = QuestionContextStore()
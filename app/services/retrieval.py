@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import neo4j
+from neo4j_graphrag.embeddings.base import Embedder
+from neo4j_graphrag.retrievers.base import Retriever
+from neo4j_graphrag.types import RetrieverResult, RetrieverResultItem
+
+from app.core.config import settings
+from app.services.history_compactor import TOKENS
+from app.services.tenant_schema import CHUNK_FULLTEXT_INDEX, ENTITY_FULLTEXT_INDEX
+
+logger = logging.getLogger(__name__)
+
+# Neo4j retrievers are sync: both searches of a turn run side by side here
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+# Set to a list by whoever wants the per-query stats back (the invoke endpoint in debug mode)
+retrieval_stats: ContextVar[Optional[List[dict]]] = ContextVar("retrieval_stats", default=None)
+
+
+def text_record_formatter(record: neo4j.Record) -> RetrieverResultItem:
+    """VectorRetriever formatter returning the chunk text itself instead of the repr of the node"""
+    node = record.get("node") or {}
+    text = node.get("text") if isinstance(node, dict) else str(node)
+    return RetrieverResultItem(content=text or "", metadata={"score": record.get("score"), "id": record.get("id")})
+
+
+# Words too common to help a keyword search (Lucene already ignores case)
+_STOPWORDS = {
+    "que", "con", "los", "las", "del", "por", "para", "una", "uno", "unos", "unas", "como", "cuando",
+    "donde", "quien", "quienes", "cual", "fue", "fui", "era", "estaba", "sobre", "hablame", "mis",
+    "mi", "tu", "su", "sus", "me", "te", "se", "le", "les", "el", "la", "lo", "de", "en", "y", "a",
+}
+
+
+def lucene_query(text: str, max_terms: int = 16) -> str:
+    """Words of a question as a Lucene OR query; no user text reaches the query syntax"""
+    terms = []
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        if len(word) >= 3 and word not in _STOPWORDS and word not in terms:
+            terms.append(word)
+    return " OR ".join(terms[:max_terms])
+
+
+class FulltextRetriever:
+    """
+    Keyword search over a tenant graph: Chunk.text plus entity names/descriptions, the latter mapped
+    to the chunks they were extracted from. Catches names ("Ana", "Santander") that embeddings rank
+    poorly. Indexes are created by TenantSchema.
+    """
+
+    QUERY = """
+    CALL {
+        CALL db.index.fulltext.queryNodes($chunk_index, $query, {limit: $top_k}) YIELD node, score
+        RETURN node AS chunk, score
+        UNION ALL
+        CALL db.index.fulltext.queryNodes($entity_index, $query, {limit: $top_k}) YIELD node, score
+        MATCH (node)-[:FROM_CHUNK]->(chunk:Chunk)
+        RETURN chunk, score
+    }
+    WITH chunk, max(score) AS score
+    RETURN chunk.text AS text, score
+    ORDER BY score DESC
+    LIMIT $top_k
+    """
+
+    def __init__(
+        self,
+        driver: neo4j.Driver,
+        chunk_index: str = CHUNK_FULLTEXT_INDEX,
+        entity_index: str = ENTITY_FULLTEXT_INDEX,
+        neo4j_database: Optional[str] = None,
+    ):
+        self.driver = driver
+        self.chunk_index = chunk_index
+        self.entity_index = entity_index
+        self.neo4j_database = neo4j_database
+
+    def search(self, query_text: str, top_k: int = 5) -> RetrieverResult:
+        query = lucene_query(query_text)
+        if not query:
+            return RetrieverResult(items=[])
+        records, _, _ = self.driver.execute_query(
+            self.QUERY,
+            {"chunk_index": self.chunk_index, "entity_index": self.entity_index, "query": query, "top_k": top_k},
+            database_=self.neo4j_database,
+            routing_=neo4j.RoutingControl.READ,
+        )
+        return RetrieverResult(
+            items=[RetrieverResultItem(content=r["text"] or "", metadata={"score": r["score"]}) for r in records]
+        )
+
+
+class GraphExpansion:
+    """
+    retrieval_query + result_formatter of the VectorCypherRetriever: relations around the entities of
+    the retrieved chunks, bounded at every step so a dense graph cannot blow up the query or the prompt.
+      - at most `max_entities` entities, those of the most similar chunks first
+      - entities/neighbours with more than `max_degree` relations (hubs, e.g. the user's own Person)
+        are listed as endpoints but never expanded
+      - per node and hop, only the `max_fanout` least connected neighbours (specific facts first)
+      - relevance of a relation: vector score of its seed chunk, times `hop_decay` on the second hop
+      - the `max_facts` most relevant facts, then cut to `token_budget` tokens in Python
+    The chunk texts are not repeated: the vector search of the same turn returns them.
+    """
+
+    QUERY = """
+    WITH collect(node) AS chunks, collect(score) AS scores
+    CALL {
+        WITH chunks, scores
+        UNWIND range(0, size(chunks) - 1) AS i
+        WITH chunks[i] AS chunk, scores[i] AS score
+        MATCH (chunk)<-[:FROM_CHUNK]-(entity)
+        WITH entity, max(score) AS score
+        WITH entity, score, COUNT { (entity)--() } AS degree
+        ORDER BY score DESC, degree ASC
+        LIMIT $max_entities
+        RETURN collect({entity: entity, score: score, hub: degree > $max_degree}) AS seeds
+    }
+    CALL {
+        WITH seeds
+        UNWIND seeds AS seed
+        WITH seed WHERE NOT seed.hub
+        WITH seed.entity AS entity, seed.score AS score
+        CALL {
+            WITH entity
+            MATCH (entity)-[r1]-(n1)
+            WHERE type(r1) <> 'FROM_CHUNK'
+            WITH r1, n1, COUNT { (n1)--() } AS d1
+            ORDER BY d1 ASC
+            LIMIT $max_fanout
+            RETURN r1, n1, d1
+        }
+        CALL {
+            WITH r1, n1, d1
+            MATCH (n1)-[r2]-(n2)
+            WHERE $max_hops >= 2 AND d1 <= $max_degree AND r2 <> r1 AND type(r2) <> 'FROM_CHUNK'
+            WITH r2, COUNT { (n2)--() } AS d2
+            ORDER BY d2 ASC
+            LIMIT $max_fanout
+            RETURN collect(r2) AS hop2
+        }
+        UNWIND [{rel: r1, relevance: score}] + [r IN hop2 | {rel: r, relevance: score * $hop_decay}] AS fact
+        WITH fact.rel AS rel, max(fact.relevance) AS relevance, count(*) AS seen
+        ORDER BY relevance DESC
+        RETURN sum(seen) AS expanded,
+               collect(startNode(rel).name + ' - ' + type(rel) + ' ' + coalesce(rel.details, '') + ' -> ' + endNode(rel).name)[..$max_facts] AS facts,
+               collect(relevance)[..$max_facts] AS relevances
+    }
+    RETURN facts, relevances, {expanded: expanded, entities: size(seeds), hubs_skipped: size([s IN seeds WHERE s.hub])} AS stats
+    """
+
+    def __init__(
+        self,
+        max_hops: int = None,
+        max_entities: int = None,
+        max_fanout: int = None,
+        max_degree: int = None,
+        hop_decay: float = None,
+        max_facts: int = None,
+        token_budget: int = None,
+    ):
+        self.params = {
+            "max_hops": settings.EXPANSION_MAX_HOPS if max_hops is None else max_hops,
+            "max_entities": settings.EXPANSION_MAX_ENTITIES if max_entities is None else max_entities,
+            "max_fanout": settings.EXPANSION_MAX_FANOUT if max_fanout is None else max_fanout,
+            "max_degree": settings.EXPANSION_MAX_DEGREE if max_degree is None else max_degree,
+            "hop_decay": settings.EXPANSION_HOP_DECAY if hop_decay is None else hop_decay,
+            "max_facts": settings.EXPANSION_MAX_FACTS if max_facts is None else max_facts,
+        }
+        self.token_budget = settings.EXPANSION_TOKEN_BUDGET if token_budget is None else token_budget
+        self._lock = threading.Lock()
+        self._totals = {"queries": 0, "expanded": 0, "hubs_skipped": 0, "facts": 0, "facts_kept": 0, "tokens": 0, "truncated": 0}
+
+    def format(self, record: neo4j.Record) -> RetrieverResultItem:
+        """Facts in relevance order while they fit in the token budget; per-query stats and relevances in the metadata"""
+        relevances = list(record.get("relevances") or [])
+        facts = [(f, relevances[i] if i < len(relevances) else None) for i, f in enumerate(record.get("facts") or []) if f]
+        kept, relevance, tokens = [], {}, 0
+        for fact, score in facts:
+            cost = TOKENS.count_text(fact) + 1  # + newline
+            if self.token_budget and tokens + cost > self.token_budget:
+                break
+            kept.append(fact)
+            if score is not None:
+                relevance[fact.strip()] = score
+            tokens += cost
+
+        stats = dict(record.get("stats") or {})
+        stats.update(facts=len(facts), facts_kept=len(kept), tokens=tokens)
+        with self._lock:
+            self._totals["queries"] += 1
+            self._totals["truncated"] += len(kept) < len(facts)
+            for key in ("expanded", "hubs_skipped", "facts", "facts_kept", "tokens"):
+                self._totals[key] += stats.get(key) or 0
+        return RetrieverResultItem(content="\n".join(kept), metadata={"expansion": stats, "relevance": relevance})
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._totals)
+
+
+GRAPH_EXPANSION = GraphExpansion()
+
+
+@dataclass
+class RetrievedContext:
+    passages: List[str] = field(default_factory=list)  # chunk texts, best first
+    facts: List[str] = field(default_factory=list)     # graph relations "a - TYPE -> b"
+    stats: Dict[str, int] = field(default_factory=dict)  # graph expansion of this query (GraphExpansion)
+
+    def text(self) -> str:
+        return "\n".join(self.passages + self.facts).strip()
+
+    def __bool__(self) -> bool:
+        return bool(self.passages or self.facts)
+
+
+class FusedRetriever:
+    """
+    Runs the graph (VectorCypherRetriever) and vector (VectorRetriever) searches concurrently with a
+    single query embedding and merges their results into one deduplicated context. With a
+    fulltext_retriever (hybrid mode) the keyword search runs alongside, and vector and keyword
+    passages are fused by reciprocal rank: sum of 1 / (rrf_k + rank) over the lists a passage is in.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        graph_retriever: Retriever,
+        vector_retriever: Retriever,
+        top_k: int = 5,
+        fulltext_retriever: Optional[FulltextRetriever] = None,
+        rrf_k: Optional[int] = None,
+        graph_params: Optional[dict] = None,
+    ):
+        self.embedder = embedder
+        self.graph_retriever = graph_retriever
+        self.vector_retriever = vector_retriever
+        self.fulltext_retriever = fulltext_retriever
+        self.top_k = top_k
+        self.rrf_k = settings.RETRIEVAL_RRF_K if rrf_k is None else rrf_k
+        # query_params of the graph retrieval_query (GraphExpansion.params)
+        self.graph_params = graph_params
+
+    def search(self, query_text: str) -> RetrievedContext:
+        fulltext = _RETRIEVAL_POOL.submit(self._search_text, query_text) if self.fulltext_retriever else None
+        query_vector = self.embedder.embed_query(query_text)
+        graph = _RETRIEVAL_POOL.submit(self._search, self.graph_retriever, query_vector, self.graph_params)
+        vector = _RETRIEVAL_POOL.submit(self._search, self.vector_retriever, query_vector)
+        context = self._merge(graph.result(), self._rank_passages(vector.result(), fulltext.result() if fulltext else None))
+        return self._record(query_text, context)
+
+    async def asearch(self, query_text: str) -> RetrievedContext:
+        # The keyword search needs no embedding: it starts while the query is being embedded
+        fulltext = asyncio.ensure_future(asyncio.to_thread(self._search_text, query_text)) if self.fulltext_retriever else None
+        query_vector = await self.embedder.async_embed_query(query_text)
+        graph, vector = await asyncio.gather(
+            asyncio.to_thread(self._search, self.graph_retriever, query_vector, self.graph_params),
+            asyncio.to_thread(self._search, self.vector_retriever, query_vector),
+        )
+        context = self._merge(graph, self._rank_passages(vector, await fulltext if fulltext else None))
+        return self._record(query_text, context)
+
+    # ---------- Internos ----------
+    @staticmethod
+    def _record(query_text: str, context: RetrievedContext) -> RetrievedContext:
+        collected = retrieval_stats.get()
+        if collected is not None:
+            collected.append({"query": query_text, "passages": len(context.passages), "facts": len(context.facts), **context.stats})
+        return context
+
+    def _search(self, retriever: Retriever, query_vector: List[float], query_params: Optional[dict] = None) -> List[RetrieverResultItem]:
+        try:
+            if query_params:
+                return retriever.search(query_vector=query_vector, top_k=self.top_k, query_params=query_params).items
+            return retriever.search(query_vector=query_vector, top_k=self.top_k).items
+        except Exception:
+            logger.exception("%s search failed", type(retriever).__name__)
+            return []
+
+    def _search_text(self, query_text: str) -> List[RetrieverResultItem]:
+        try:
+            return self.fulltext_retriever.search(query_text, top_k=self.top_k).items
+        except Exception:
+            logger.exception("Full-text search failed")
+            return []
+
+    def _rank_passages(
+        self, vector_items: List[RetrieverResultItem], fulltext_items: Optional[List[RetrieverResultItem]] = None
+    ) -> List[str]:
+        """Passage texts, best first: by similarity, or by reciprocal rank fusion with the keyword hits"""
+        ranked_lists = [sorted(vector_items, key=lambda item: -((item.metadata or {}).get("score") or 0.0))]
+        if fulltext_items is not None:
+            ranked_lists.append(fulltext_items)  # already ordered by Lucene score
+
+        scores: Dict[str, float] = {}
+        for items in ranked_lists:
+            seen = set()
+            for item in items:
+                text = str(item.content or "").strip()
+                if not text or text in seen:
+                    continue
+                seen.add(text)
+                scores[text] = scores.get(text, 0.0) + 1.0 / (self.rrf_k + len(seen))
+        # sorted() is stable: ties keep the vector order
+        return sorted(scores, key=lambda text: -scores[text])
+
+    @staticmethod
+    def _merge(graph_items: List[RetrieverResultItem], passages: List[str]) -> RetrievedContext:
+        context = RetrievedContext(passages=list(passages))
+
+        # The graph query returns the same chunks joined with the relations around them: keep only
+        # the lines not already covered by a ranked passage
+        seen, relevance = set(), {}
+        for item in graph_items:
+            context.stats.update((item.metadata or {}).get("expansion") or {})
+            relevance.update((item.metadata or {}).get("relevance") or {})
+            for line in str(item.content or "").split("\n"):
+                line = line.strip()
+                if not line or line in seen or any(line in passage for passage in context.passages):
+                    continue
+                seen.add(line)
+                if " -> " in line:
+                    context.facts.append(line)
+                else:
+                    context.passages.append(line)
+
+        context.facts = FusedRetriever._rank_facts(context.facts, context.passages, relevance)
+        if context.stats:
+            logger.debug("Graph expansion: %s", context.stats)
+        return context
+
+    @staticmethod
+    def _rank_facts(facts: List[str], passages: List[str], relevance: Optional[Dict[str, float]] = None) -> List[str]:
+        """
+        Relations in the relevance order of GraphExpansion; among equally relevant ones, those whose
+        endpoints appear in the best ranked passages go first (stable otherwise)
+        """
+        relevance = relevance or {}
+        lowered = [p.lower() for p in passages]
+
+        def score(fact: str) -> float:
+            start, _, rest = fact.partition(" - ")
+            end = rest.rpartition(" -> ")[2]
+            total = 0.0
+            for name in (start.strip().lower(), end.strip().lower()):
+                if not name:
+                    continue
+                total += sum(1.0 / (rank + 1) for rank, passage in enumerate(lowered) if name in passage)
+            return total
+
+        return sorted(facts, key=lambda fact: (-relevance.get(fact, 0.0), -score(fact)))
@@ -1,21 +1,80 @@
 from __future__ import annotations
+import asyncio
+import logging
 import threading
-from typing import Dict, Optional
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 import neo4j
 from sqlmodel import Session, select
 
-from app.models.schemas import TenantCreate, TenantInfo
+from app.core.config import settings
+from app.models.schemas import TenantCreate, TenantInfo, TenantStatus
 from app.core.db import engine
-from app.models.db_models import TenantRow
-from app.infrastructure.neo4j_docker import ensure_neo4j_for_tenant
+from app.models.db_models import TenantRow, _utcnow
+from app.infrastructure.neo4j_docker import ensure_neo4j_for_tenant, wait_for_bolt
+from app.infrastructure.neo4j_databases import ensure_database_for_tenant
+from app.services.container_lifecycle import ContainerLifecycle
+from app.services.driver_pool import DriverPool
+from app.services.pipeline_registry import PIPELINES
+from app.services.tenant_schema import TENANT_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# Docker / DDL provisioning runs here, off the request path: a burst of registrations proceeds in parallel
+_PROVISIONING_POOL = ThreadPoolExecutor(max_workers=settings.PROVISIONING_WORKERS, thread_name_prefix="provisioning")
+
+
+class TenantNotReadyError(RuntimeError):
+    """The tenant graph is still being provisioned (or provisioning failed)"""
+
+
+def _is_shared(row: TenantRow) -> bool:
+    # Provisioned in the shared server: no credentials of its own
+    return bool(row.neo4j_database) and row.neo4j_uri == settings.NEO4J_SHARED_URI and not row.neo4j_password
+
+
+def _as_utc(at: datetime) -> datetime:
+    # SQLite hands datetimes back naive
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+def _close(driver) -> None:
+    try:
+        driver.close()
+    except Exception:
+        pass
+
 
 class TenantManager:
 
     def __init__(self):
-        self._lock = threading.RLock()
-        self._drivers: Dict[str, neo4j.Driver] = {}
+        # Guards the per-tenant registration locks and in-flight provisioning; never held across I/O
+        self._lock = threading.Lock()
+        self._register_locks: Dict[str, threading.Lock] = {}
+        self._provisioning: Dict[str, Future] = {}
+        pool_args = dict(
+            max_drivers=settings.NEO4J_MAX_DRIVERS,
+            idle_ttl=settings.NEO4J_DRIVER_IDLE_TTL,
+            close_grace=settings.NEO4J_DRIVER_CLOSE_GRACE,
+        )
+        # Cached pipelines hold the sync driver: evicting it drops them too
+        self._drivers = DriverPool(self._create_driver, on_evict=PIPELINES.invalidate_tenant, **pool_args)
+        self._async_drivers = DriverPool(self._create_async_driver, **pool_args)
+        # Database-per-tenant mode: one driver (and connection pool) for every tenant of the shared server
+        self._shared_lock = threading.Lock()
+        self._shared_driver: Optional[neo4j.Driver] = None
+        self._shared_async_driver: Optional[neo4j.AsyncDriver] = None
+        # Container mode: idle containers are stopped and started again on the next driver creation
+        self.lifecycle = ContainerLifecycle(
+            tenant_ids=self._container_tenant_ids,
+            on_hibernate=self._release,
+            load_access=self._load_last_access,
+            save_access=self._save_last_access,
+        )
+        self._health_task: Optional[asyncio.Task] = None
+        self._health_failures = 0
 
 
     def _row_to_tenant_create(self, row: TenantRow) -> TenantCreate:
@@ -27,92 +86,153 @@ class TenantManager:
             neo4j_uri=row.neo4j_uri,
             neo4j_user=row.neo4j_user,
             neo4j_password=row.neo4j_password,
+            neo4j_database=row.neo4j_database,
         )
 
     # Update config on driver change
     def _config_tuple(self, payload: TenantCreate) -> tuple:
         return (payload.neo4j_uri, payload.neo4j_user, payload.neo4j_password)
 
+    def _row_config(self, row: TenantRow) -> tuple:
+        return (row.neo4j_uri, row.neo4j_user, row.neo4j_password, row.neo4j_database)
+
     def register(self, payload: TenantCreate) -> TenantInfo:
+        """
+        Stores the tenant. Explicit Neo4j credentials are used as given; otherwise the graph is
+        provisioned in the background (pending -> starting -> ready | failed, see status()).
+        """
         def _is_blank(s):
             return s is None or (isinstance(s, str) and not s.strip())
 
-        with self._lock, Session(engine) as session:
-            existing: Optional[TenantRow] = session.get(TenantRow, payload.tenant_id)
+        # Check if Neo4j credentials exist
+        needs_auto = _is_blank(getattr(payload, "neo4j_uri", None)) or \
+                    _is_blank(getattr(payload, "neo4j_user", None)) or \
+                    _is_blank(getattr(payload, "neo4j_password", None))
 
-            # Check if Neo4j credentials exist
-            needs_auto = _is_blank(getattr(payload, "neo4j_uri", None)) or \
-                        _is_blank(getattr(payload, "neo4j_user", None)) or \
-                        _is_blank(getattr(payload, "neo4j_password", None))
+        # Only registrations of the same tenant wait for each other; no lock is held across Docker calls
+        with self._tenant_lock(payload.tenant_id), Session(engine) as session:
+            row: Optional[TenantRow] = session.get(TenantRow, payload.tenant_id)
+            if row is None:
+                row = TenantRow(tenant_id=payload.tenant_id, neo4j_uri="", neo4j_user="", neo4j_password="")
+            old_cfg = self._row_config(row)
 
-            if existing:
-                old_cfg = (existing.neo4j_uri, existing.neo4j_user, existing.neo4j_password)
+            if needs_auto:
+                # Si el payload trae password y aún no hay una, se usará para el contenedor nuevo
+                if not row.neo4j_password and not _is_blank(payload.neo4j_password):
+                    row.neo4j_password = payload.neo4j_password
+                row.provisioning_status = "pending"
+            else:
+                row.neo4j_uri = payload.neo4j_uri
+                row.neo4j_user = payload.neo4j_user
+                row.neo4j_password = payload.neo4j_password
+                row.neo4j_database = payload.neo4j_database
+                row.provisioning_status = "ready"
+            row.provisioning_error = None
 
-                if needs_auto:
-                    # Si el payload trae password y quieres usarla, pásala; si no, None -> genera una segura
-                    desired_pwd = None if _is_blank(getattr(payload, "neo4j_password", None)) else payload.neo4j_password
+            if payload.tenant_name:
+                row.name = payload.tenant_name
+            if payload.tenant_email:
+                row.email = payload.tenant_email
 
-                    bolt_uri, auto_user, auto_pwd = ensure_neo4j_for_tenant(
-                        payload.tenant_id,
-                        existing_password=existing.neo4j_password or desired_pwd
-                    )
-                    existing.neo4j_uri = bolt_uri
-                    existing.neo4j_user = auto_user
+            row.updated_at = _utcnow()
+            session.add(row)
+            session.commit()
+            changed = self._row_config(row) != old_cfg
 
-                    if not existing.neo4j_password:
-                        existing.neo4j_password = auto_pwd
-                        
-                else:
+        if changed:
+            self._reconfigured(payload.tenant_id)
+        if needs_auto:
+            self._submit_provisioning(payload.tenant_id)
+        return TenantInfo(tenant_id=payload.tenant_id, status="pending" if needs_auto else "ready")
+
+    def status(self, tenant_id: str) -> Optional[TenantStatus]:
+        with Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            if not row:
+                return None
+            # Rows from before background provisioning were provisioned inline
+            return TenantStatus(tenant_id=tenant_id, status=row.provisioning_status or "ready", error=row.provisioning_error)
 
-                    existing.neo4j_uri = payload.neo4j_uri
-                    existing.neo4j_user = payload.neo4j_user
-                    existing.neo4j_password = payload.neo4j_password
+    # ---------- Provisioning ----------
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        with self._lock:
+            return self._register_locks.setdefault(tenant_id, threading.Lock())
 
-                if getattr(payload, "name", None):
-                    existing.name = payload.tenant_name
-                if getattr(payload, "email", None):
-                    existing.email = payload.tenant_email
+    def _reconfigured(self, tenant_id: str) -> None:
+        # Cached pipelines hold the old driver: drop them before retiring it
+        PIPELINES.invalidate_tenant(tenant_id)
+        self._drivers.discard(tenant_id, reason="reconfigured")
+        self._async_drivers.discard(tenant_id, reason="reconfigured")
+        # Another graph: its indexes and constraints are not there yet
+        TENANT_SCHEMA.reset(tenant_id)
 
-                existing.updated_at = datetime.utcnow()
-                session.add(existing)
-                session.commit()
+    def _submit_provisioning(self, tenant_id: str) -> None:
+        with self._lock:
+            # A run already in flight reads the row when it starts: one per tenant is enough
+            if tenant_id not in self._provisioning:
+                self._provisioning[tenant_id] = _PROVISIONING_POOL.submit(self._run_provisioning, tenant_id)
 
-                new_cfg = (existing.neo4j_uri, existing.neo4j_user, existing.neo4j_password)
-                if new_cfg != old_cfg and payload.tenant_id in self._drivers:
-                    try:
-                        self._drivers[payload.tenant_id].close()
-                    except Exception:
-                        pass
-                    self._drivers.pop(payload.tenant_id, None)
+    def _set_status(self, tenant_id: str, status: str, error: Optional[str] = None, config: Optional[tuple] = None) -> bool:
+        """Updates the provisioning state (and the Neo4j config when given); returns whether the config changed"""
+        with self._tenant_lock(tenant_id), Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            old_cfg = self._row_config(row)
+            if config is not None:
+                row.neo4j_uri, row.neo4j_user, row.neo4j_password, row.neo4j_database = config
+            row.provisioning_status = status
+            row.provisioning_error = error
+            row.updated_at = _utcnow()
+            session.add(row)
+            session.commit()
+            return self._row_config(row) != old_cfg
 
-            else:
-                if needs_auto:
-                    desired_pwd = None if _is_blank(getattr(payload, "neo4j_password", None)) else payload.neo4j_password
-                    bolt_uri, auto_user, auto_pwd = ensure_neo4j_for_tenant(
-                        payload.tenant_id, existing_password=desired_pwd
-                    )
-                    row = TenantRow(
-                        tenant_id=payload.tenant_id,
-                        name=getattr(payload, "name", None),
-                        email=getattr(payload, "email", None),
-                        neo4j_uri=bolt_uri,
-                        neo4j_user=auto_user,
-                        neo4j_password=desired_pwd or auto_pwd,
-                    )
-                else:
-                    row = TenantRow(
-                        tenant_id=payload.tenant_id,
-                        name=getattr(payload, "name", None),
-                        email=getattr(payload, "email", None),
-                        neo4j_uri=payload.neo4j_uri,
-                        neo4j_user=payload.neo4j_user,
-                        neo4j_password=payload.neo4j_password,
-                    )
-
-                session.add(row)
-                session.commit()
+    def _run_provisioning(self, tenant_id: str) -> None:
+        try:
+            self._set_status(tenant_id, "starting")
+            config = self._provision(self._row(tenant_id))
+            uri, user, password, database = config
+            if database is None:
+                # Container started: registration is only done once Bolt accepts sessions
+                wait_for_bolt(uri, (user, password))
+            if self._set_status(tenant_id, "starting", config=config):
+                self._reconfigured(tenant_id)
+            self._bootstrap_schema(tenant_id, database)
+            self._set_status(tenant_id, "ready")
+        except Exception as e:
+            logger.exception("Provisioning of tenant %s failed", tenant_id)
+            self._set_status(tenant_id, "failed", error=repr(e))
+        finally:
+            with self._lock:
+                self._provisioning.pop(tenant_id, None)
+
+    def _bootstrap_schema(self, tenant_id: str, database: Optional[str]) -> None:
+        # Indexes before the first write; if this fails the tenant stays ready and the first pipeline retries
+        try:
+            TENANT_SCHEMA.ensure(tenant_id, self.get_driver(tenant_id), database)
+        except Exception as e:
+            logger.warning("Schema bootstrap of tenant %s failed: %r", tenant_id, e)
+
+    def resume_provisioning(self) -> int:
+        """Resubmits provisioning interrupted by a restart"""
+        with Session(engine) as session:
+            tenant_ids = list(session.exec(select(TenantRow.tenant_id).where(TenantRow.provisioning_status.in_(["pending", "starting"]))))
+        for tenant_id in tenant_ids:
+            self._submit_provisioning(tenant_id)
+        return len(tenant_ids)
+
+    def _provision(self, row: TenantRow) -> Tuple[str, str, str, Optional[str]]:
+        """
+        Auto-provisioned graph: (uri, user, password, database). Tenants keep the mode they were
+        created with; new ones follow NEO4J_PROVISIONING_MODE.
+        """
+        shared = _is_shared(row) if row.neo4j_uri else settings.NEO4J_PROVISIONING_MODE.lower() == "database"
+        if shared:
+            # A DDL call on the shared server; its credentials stay in settings, not in the row
+            database = ensure_database_for_tenant(self._shared(), row.tenant_id)
+            return settings.NEO4J_SHARED_URI, settings.NEO4J_SHARED_USER, "", database
 
-        return TenantInfo(tenant_id=payload.tenant_id)
+        bolt_uri, auto_user, auto_pwd = ensure_neo4j_for_tenant(row.tenant_id, existing_password=row.neo4j_password or None)
+        return bolt_uri, auto_user, row.neo4j_password or auto_pwd, None
 
     def get(self, tenant_id: str) -> Optional[TenantCreate]:
         with Session(engine) as session:
@@ -121,29 +241,222 @@ class TenantManager:
                 return None
             return self._row_to_tenant_create(row)
 
-    def get_driver(self, tenant_id: str) -> neo4j.Driver:
-        with self._lock:
-            if tenant_id in self._drivers:
-                return self._drivers[tenant_id]
+    # ---------- Drivers ----------
+    def _row(self, tenant_id: str) -> TenantRow:
+        with Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            if not row:
+                raise ValueError(f"Unknown tenant {tenant_id}")
+            return row
 
-            with Session(engine) as session:
-                row = session.get(TenantRow, tenant_id)
-                if not row:
-                    raise ValueError(f"Unknown tenant {tenant_id}")
+    def _shared(self) -> neo4j.Driver:
+        with self._shared_lock:
+            if self._shared_driver is None:
+                self._shared_driver = neo4j.GraphDatabase.driver(
+                    settings.NEO4J_SHARED_URI,
+                    auth=(settings.NEO4J_SHARED_USER, settings.NEO4J_SHARED_PASSWORD),
+                    max_connection_pool_size=settings.NEO4J_SHARED_MAX_CONNECTION_POOL_SIZE,
+                )
+            return self._shared_driver
 
-                driver = neo4j.GraphDatabase.driver(
-                    row.neo4j_uri, auth=(row.neo4j_user, row.neo4j_password)
+    def _shared_async(self) -> neo4j.AsyncDriver:
+        with self._shared_lock:
+            if self._shared_async_driver is None:
+                self._shared_async_driver = neo4j.AsyncGraphDatabase.driver(
+                    settings.NEO4J_SHARED_URI,
+                    auth=(settings.NEO4J_SHARED_USER, settings.NEO4J_SHARED_PASSWORD),
+                    max_connection_pool_size=settings.NEO4J_SHARED_MAX_CONNECTION_POOL_SIZE,
                 )
-                self._drivers[tenant_id] = driver
-                return driver
+            return self._shared_async_driver
+
+    def _awake_row(self, row: TenantRow) -> TenantRow:
+        """Wakes a hibernated container; its Bolt port may have changed, so the row is updated"""
+        if _is_shared(row):
+            return row
+        bolt_uri = self.lifecycle.wake(row.tenant_id, (row.neo4j_user, row.neo4j_password))
+        if bolt_uri and bolt_uri != row.neo4j_uri:
+            with Session(engine) as session:
+                stored = session.get(TenantRow, row.tenant_id)
+                stored.neo4j_uri = bolt_uri
+                stored.updated_at = _utcnow()
+                session.add(stored)
+                session.commit()
+            row.neo4j_uri = bolt_uri
+        return row
+
+    def _container_tenant_ids(self) -> List[str]:
+        with Session(engine) as session:
+            return list(session.exec(select(TenantRow.tenant_id).where(TenantRow.neo4j_database == None)))  # noqa: E711
+
+    def _load_last_access(self) -> Dict[str, float]:
+        with Session(engine) as session:
+            rows = session.exec(select(TenantRow.tenant_id, TenantRow.last_access_at).where(TenantRow.last_access_at != None))  # noqa: E711
+            return {tenant_id: _as_utc(at).timestamp() for tenant_id, at in rows}
+
+    def _save_last_access(self, tenant_id: str, at: float) -> None:
+        with Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            if row is None:
+                return
+            row.last_access_at = datetime.fromtimestamp(at, timezone.utc)
+            session.add(row)
+            session.commit()
+
+    def _release(self, tenant_id: str) -> None:
+        PIPELINES.invalidate_tenant(tenant_id)
+        self._drivers.discard(tenant_id, reason="hibernated")
+        self._async_drivers.discard(tenant_id, reason="hibernated")
+
+    def _ready_row(self, tenant_id: str) -> TenantRow:
+        row = self._row(tenant_id)
+        if not row.neo4j_uri:
+            raise TenantNotReadyError(
+                f"Tenant {tenant_id} is not provisioned yet ({row.provisioning_status}"
+                + (f": {row.provisioning_error})" if row.provisioning_error else ")")
+            )
+        return self._awake_row(row)
+
+    def _create_driver(self, tenant_id: str) -> neo4j.Driver:
+        row = self._ready_row(tenant_id)
+        if _is_shared(row):
+            return self._shared()
+        return neo4j.GraphDatabase.driver(
+            row.neo4j_uri, auth=(row.neo4j_user, row.neo4j_password), max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE
+        )
+
+    def _create_async_driver(self, tenant_id: str) -> neo4j.AsyncDriver:
+        row = self._ready_row(tenant_id)
+        if _is_shared(row):
+            return self._shared_async()
+        return neo4j.AsyncGraphDatabase.driver(
+            row.neo4j_uri, auth=(row.neo4j_user, row.neo4j_password), max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE
+        )
+
+    def _is_shared_driver(self, driver) -> bool:
+        return driver is not None and driver in (self._shared_driver, self._shared_async_driver)
+
+    def get_driver(self, tenant_id: str) -> neo4j.Driver:
+        """
+        Driver for the tenant graph. In database-per-tenant mode it is the shared driver: queries
+        must go to get_database(tenant_id).
+        """
+        self.lifecycle.touch(tenant_id)
+        driver = self._drivers.get(tenant_id)
+        for retired in self._drivers.reap():
+            if not self._is_shared_driver(retired):
+                _close(retired)
+        return driver
+
+    def get_database(self, tenant_id: str) -> Optional[str]:
+        return self._row(tenant_id).neo4j_database
+
+    def get_async_driver(self, tenant_id: str) -> neo4j.AsyncDriver:
+        # Retired async drivers are closed by the health task / aclose_all (close() is a coroutine)
+        self.lifecycle.touch(tenant_id)
+        return self._async_drivers.get(tenant_id)
+
+    def touch(self, tenant_id: str) -> None:
+        """Keeps the tenant's drivers at the recent end of the LRU while its cached pipelines are in use"""
+        self._drivers.touch(tenant_id)
+        self._async_drivers.touch(tenant_id)
+        self.lifecycle.touch(tenant_id)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "drivers": self._drivers.stats(),
+            "async_drivers": self._async_drivers.stats(),
+            "shared_driver": self._shared_driver is not None,
+            "containers": self.lifecycle.stats(),
+            "health_failures": self._health_failures,
+        }
+
+    # ---------- Liveness ----------
+    async def check_health(self) -> int:
+        """Evicts idle and unreachable drivers and closes retired ones; returns how many failed the check"""
+        self._drivers.sweep()
+        self._async_drivers.sweep()
+
+        async def _check(pool: DriverPool, driver, tenant_ids: List[str]) -> bool:
+            try:
+                if isinstance(driver, neo4j.AsyncDriver):
+                    await driver.verify_connectivity()
+                else:
+                    await asyncio.to_thread(driver.verify_connectivity)
+                return True
+            except Exception as e:
+                logger.warning("Neo4j driver of tenants %s failed the liveness check: %r", tenant_ids[:5], e)
+                for tenant_id in tenant_ids:
+                    if pool is self._drivers:
+                        PIPELINES.invalidate_tenant(tenant_id)
+                    pool.discard(tenant_id, reason="unhealthy")
+                return False
+
+        # The shared driver serves many tenants: checked once
+        checks = []
+        for pool in (self._drivers, self._async_drivers):
+            by_driver: Dict[int, Tuple[object, List[str]]] = {}
+            for tenant_id, driver in pool.items():
+                by_driver.setdefault(id(driver), (driver, []))[1].append(tenant_id)
+            checks += [_check(pool, driver, tenant_ids) for driver, tenant_ids in by_driver.values()]
+        failed = sum(1 for ok in await asyncio.gather(*checks) if not ok)
+        self._health_failures += failed
+
+        for driver in self._drivers.reap():
+            if not self._is_shared_driver(driver):
+                await asyncio.to_thread(_close, driver)
+        for driver in self._async_drivers.reap():
+            if self._is_shared_driver(driver):
+                continue
+            try:
+                await driver.close()
+            except Exception:
+                pass
+        return failed
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.NEO4J_HEALTH_CHECK_INTERVAL)
+            try:
+                await self.check_health()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Neo4j driver health check failed")
+
+    async def start(self) -> None:
+        if settings.NEO4J_HEALTH_CHECK_INTERVAL and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(), name="neo4j-driver-health")
+        await self.lifecycle.start()
+        await asyncio.to_thread(self.resume_provisioning)
+
+    async def stop(self) -> None:
+        await self.lifecycle.stop()
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def aclose_all(self):
+        drivers = {id(d): d for d in self._async_drivers.drain()}
+        with self._shared_lock:
+            if self._shared_async_driver is not None:
+                drivers[id(self._shared_async_driver)] = self._shared_async_driver
+                self._shared_async_driver = None
+        for d in drivers.values():
+            try:
+                await d.close()
+            except Exception:
+                pass
 
     def close_all(self):
-        with self._lock:
-            for d in self._drivers.values():
-                try:
-                    d.close()
-                except Exception:
-                    pass
-            self._drivers.clear()
+        drivers = {id(d): d for d in self._drivers.drain()}
+        with self._shared_lock:
+            if self._shared_driver is not None:
+                drivers[id(self._shared_driver)] = self._shared_driver
+                self._shared_driver = None
+        for d in drivers.values():
+            _close(d)
 
 TENANTS = TenantManager()
+# Drivers of tenants whose pipelines are served from the cache stay warm
+PIPELINES.on_access = TENANTS.touch
@@ -0,0 +1,157 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.db_models import TenantRow, _utcnow
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX = "text_embeddings"
+CHUNK_FULLTEXT_INDEX = "chunk_text"
+ENTITY_FULLTEXT_INDEX = "entity_text"
+VECTOR_DIMENSIONS = 1536
+
+# Properties looked up by value (entity resolution, retrieval, memory queries). None of them is
+# unique: the KG writer CREATEs a node per extraction and the entity resolver merges duplicates
+# afterwards, so a uniqueness constraint would fail the whole write batch on a repeated value.
+LOOKUP_PROPERTIES = {"name", "uuid"}
+FULLTEXT_PROPERTIES = ["name", "description"]
+
+
+def _guardar_nodes() -> List[dict]:
+    # Imported here: the pipelines import TENANTS, which imports this module
+    from app.pipelines.pipeline_guardar import PipelineGuardar
+    return PipelineGuardar.NODES
+
+
+def _ident(name: str) -> str:
+    return f"`{name.replace('`', '``')}`"
+
+
+def _index_name(label: str, prop: str, kind: str) -> str:
+    return f"{label.lower()}_{prop.lower()}_{kind}"
+
+
+def schema_v1(nodes: List[dict]) -> List[str]:
+    """Vector and full-text indexes and range indexes for the KG builder entities"""
+    statements = [
+        f"CREATE VECTOR INDEX {VECTOR_INDEX} IF NOT EXISTS FOR (c:Chunk) ON c.embedding "
+        f"OPTIONS {{indexConfig: {{`vector.dimensions`: {VECTOR_DIMENSIONS}, `vector.similarity_function`: 'cosine'}}}}",
+        f"CREATE FULLTEXT INDEX {CHUNK_FULLTEXT_INDEX} IF NOT EXISTS FOR (c:Chunk) ON EACH [c.text]",
+        # The KG writer matches relationship ends on this temporary id right after creating the nodes
+        "CREATE INDEX kgbuilder_tmp_id_range IF NOT EXISTS FOR (n:__KGBuilder__) ON (n.__tmp_internal_id)",
+    ]
+
+    fulltext_labels = []
+    for node in nodes:
+        label = node["label"]
+        props = {p["name"]: p["type"] for p in node.get("properties", [])}
+        for prop, kind in props.items():
+            if prop in LOOKUP_PROPERTIES or kind == "DATE":
+                statements.append(
+                    f"CREATE INDEX {_index_name(label, prop, 'range')} IF NOT EXISTS "
+                    f"FOR (n:{_ident(label)}) ON (n.{_ident(prop)})"
+                )
+        if any(p in props for p in FULLTEXT_PROPERTIES):
+            fulltext_labels.append(label)
+
+    if fulltext_labels:
+        labels = "|".join(_ident(label) for label in fulltext_labels)
+        props = ", ".join(f"n.{_ident(p)}" for p in FULLTEXT_PROPERTIES)
+        statements.append(f"CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS FOR (n:{labels}) ON EACH [{props}]")
+    return statements
+
+
+def schema_v2(nodes: List[dict]) -> List[str]:
+    """Drops the uuid uniqueness constraints the first v1 created; uuid gets a range index instead"""
+    statements = []
+    for node in nodes:
+        label = node["label"]
+        if any(p["name"] == "uuid" for p in node.get("properties", [])):
+            statements += [
+                f"DROP CONSTRAINT {_index_name(label, 'uuid', 'unique')} IF EXISTS",
+                f"CREATE INDEX {_index_name(label, 'uuid', 'range')} IF NOT EXISTS FOR (n:{_ident(label)}) ON (n.`uuid`)",
+            ]
+    return statements
+
+
+# Version N is MIGRATIONS[N - 1]. Append new versions; never edit an applied one (v1 was edited once,
+# to stop creating the uuid constraints that made KG writes fail; v2 cleans up graphs that got them).
+MIGRATIONS: List[Callable[[List[dict]], List[str]]] = [schema_v1, schema_v2]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class TenantSchema:
+    """
+    Versioned indexes and constraints of each tenant graph. Pending migrations run once per tenant
+    (at provisioning or on first pipeline use) and the applied version is kept in TenantRow, so
+    later processes only read SQLite. Statements are idempotent (IF NOT EXISTS): a migration
+    interrupted halfway is simply run again.
+    """
+
+    def __init__(self, nodes: Callable[[], List[dict]] = _guardar_nodes):
+        self._nodes = nodes
+        self._applied: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Métodos públicos ----------
+    def ensure(self, tenant_id: str, driver, database: Optional[str] = None) -> int:
+        """Applies the pending migrations on the tenant graph; returns the version it is at"""
+        if self._applied.get(tenant_id) == SCHEMA_VERSION:
+            return SCHEMA_VERSION
+
+        with self._tenant_lock(tenant_id):
+            current = self._applied.get(tenant_id)
+            if current is None:
+                current = self._stored_version(tenant_id)
+            for version, migration in enumerate(MIGRATIONS, start=1):
+                if version <= current:
+                    continue
+                for statement in migration(self._nodes()):
+                    driver.execute_query(statement, database_=database)
+                self._store_version(tenant_id, version)
+                current = version
+                logger.info("Tenant %s graph schema at version %d", tenant_id, version)
+            self._applied[tenant_id] = current
+            return current
+
+    def try_ensure(self, tenant_id: str, driver, database: Optional[str] = None) -> Optional[int]:
+        """ensure() that only logs: the next pipeline construction retries"""
+        try:
+            return self.ensure(tenant_id, driver, database)
+        except Exception as e:
+            logger.warning("Schema migration of tenant %s failed: %r", tenant_id, e)
+            return None
+
+    def reset(self, tenant_id: str) -> None:
+        """The tenant now points to another graph: migrate it again on next use"""
+        with self._tenant_lock(tenant_id):
+            self._applied.pop(tenant_id, None)
+            self._store_version(tenant_id, None)
+
+    # ---------- Internos ----------
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(tenant_id, threading.Lock())
+
+    def _stored_version(self, tenant_id: str) -> int:
+        with Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            return (row.schema_version or 0) if row else 0
+
+    def _store_version(self, tenant_id: str, version: Optional[int]) -> None:
+        with Session(engine) as session:
+            row = session.get(TenantRow, tenant_id)
+            if row is None or row.schema_version == version:
+                return
+            row.schema_version = version
+            row.updated_at = _utcnow()
+            session.add(row)
+            session.commit()
+
+
+TENANT_SCHEMA = TenantSchema()
@@ -1,13 +1,18 @@
 import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
 from sqlmodel import SQLModel, create_engine, Session
+from app.main import app
+from app.api.v1.endpoints import activities
 from app.models.db_models import Activity, ActivityQuestion
 from app.services.activity_manager import ActivityManager
 
 
 @pytest.fixture
 def engine():
-    # BBDD temporal en memoria
-    engine = create_engine("sqlite:///:memory:")
+    # BBDD temporal en memoria (una sola conexión: el TestClient atiende en otro hilo)
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False})
     SQLModel.metadata.create_all(engine)
     return engine
 
@@ -61,3 +66,51 @@ def test_get_question(manager, session, sample_data):
     assert q is not None
     assert q.id == "Q2"
     assert q.pregunta == "¿Pregunta 2?"
+
+
+def test_reads_are_served_from_snapshot(manager, engine, sample_data):
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    manager.get_question("A1", "Q1")
+    loaded = len(queries)
+    for _ in range(30):
+        assert manager.get_question("A1", "Q2").pregunta == "¿Pregunta 2?"
+        manager.list_activities()
+        manager.get_activity("A1")
+    assert len(queries) == loaded
+
+
+def test_replace_activity_invalidates_snapshot(manager, sample_data):
+    etag = manager.etag()
+    manager.replace_activity(
+        Activity(activity_id="A1", name="Actividad 1 v2"),
+        [ActivityQuestion(question_id="Q3", activity_id="A1", pregunta="¿Nueva?", respuesta_correcta="Sí")],
+    )
+    assert manager.get_activity("A1").name == "Actividad 1 v2"
+    assert manager.get_question("A1", "Q1") is None
+    assert manager.get_question("A1", "Q3").pregunta == "¿Nueva?"
+    assert manager.etag() != etag
+
+
+def test_writes_from_another_process_are_picked_up_after_ttl(engine, sample_data):
+    reader = ActivityManager(engine=engine, ttl=60)
+    assert reader.get_question("A1", "Q1") is not None
+    ActivityManager(engine=engine).delete_activity("A1")  # e.g. the seed script
+    assert reader.get_question("A1", "Q1") is not None
+    reader._checked_at -= 61
+    assert reader.get_question("A1", "Q1") is None
+
+
+def test_activities_endpoint_etag(manager, sample_data, monkeypatch):
+    monkeypatch.setattr(activities, "ACTIVITIES", manager)
+    client = TestClient(app)
+
+    r = client.get("/v1/activities/A1/questions/Q1")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+
+    r = client.get("/v1/activities/A1/questions/Q1", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+    assert client.get("/v1/activities", headers={"If-None-Match": '"otra"'}).status_code == 200
+    assert client.get("/v1/activities/A9", headers={"If-None-Match": etag}).status_code == 404
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from sqlmodel import SQLModel, create_engine
+from app.core.config import settings
+from app.pipelines import pipeline_guardar
+from app.services.bulk_import import ImportStats, parse_ndjson
+from app.services.ingestion_queue import IngestionQueue
+
+
+class FakePipeline:
+    """Records the batched embedding calls and the extractions; texts containing FAIL raise"""
+
+    def __init__(self):
+        self.embedded, self.extracted = [], []
+        self.kg_builder = SimpleNamespace(run_async=self._extract)
+
+    async def aprecalcular_embeddings(self, texts):
+        self.embedded.append(list(texts))
+        return len(texts)
+
+    async def _extract(self, text):
+        if "FAIL" in text:
+            raise RuntimeError("extracción fallida")
+        self.extracted.append(text)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # BBDD temporal en fichero (los workers usan varios hilos)
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    SQLModel.metadata.create_all(engine)
+    queue = IngestionQueue(engine=engine)
+    queue.register_handler(pipeline_guardar.KG_BULK_IMPORT_JOB, pipeline_guardar._kg_bulk_import_job)
+    monkeypatch.setattr(pipeline_guardar, "INGESTION", queue)
+    monkeypatch.setattr(pipeline_guardar, "IMPORTS", ImportStats())
+    return queue
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(pipeline_guardar.PIPELINES, "get_instance", lambda pipeline_id, tenant_id: pipeline)
+    return pipeline
+
+
+def _drain(queue):
+    async def _run():
+        while await queue.run_once():
+            pass
+    asyncio.run(_run())
+
+
+def _ndjson(*memories):
+    return [json.dumps(m) + "\n" for m in memories]
+
+
+# ---------- TESTS ----------
+def test_parse_ndjson_validates_every_line():
+    memories = parse_ndjson(_ndjson({"text": " Boda en Sevilla ", "images": ["foto de la iglesia", " "]}, {"text": "Mi primer coche"}) + ["\n"])
+    assert memories == [
+        {"text": "Boda en Sevilla", "images": ["foto de la iglesia"]},
+        {"text": "Mi primer coche", "images": []},
+    ]
+
+    with pytest.raises(ValueError, match="Línea 2"):
+        parse_ndjson(_ndjson({"text": "ok"}) + ["{no es json\n"])
+    with pytest.raises(ValueError, match="text"):
+        parse_ndjson(_ndjson({"images": ["foto"]}))
+    with pytest.raises(ValueError, match="images"):
+        parse_ndjson(_ndjson({"text": "ok", "images": "foto"}))
+    with pytest.raises(ValueError):
+        parse_ndjson(["\n"])
+
+
+def test_parse_ndjson_limits_the_import_size(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_MAX_ITEMS", 2)
+    with pytest.raises(ValueError, match="Como mucho 2"):
+        parse_ndjson(_ndjson(*({"text": f"recuerdo {i}"} for i in range(3))))
+
+
+def test_bulk_import_runs_in_windows_and_reports_progress(queue, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_WINDOW", 2)
+    memories = [{"text": f"recuerdo {i}", "images": []} for i in range(3)] + [{"text": "FAIL", "images": ["foto"]}, {"text": "recuerdo 4", "images": []}]
+    job_id = queue.enqueue("t1", pipeline_guardar.KG_BULK_IMPORT_JOB, {"memories": memories})
+
+    _drain(queue)
+    # One batched embedding call per window
+    assert pipeline.embedded == [["recuerdo 0", "recuerdo 1"], ["recuerdo 2", pipeline_guardar.memory_text(memories[3])], ["recuerdo 4"]]
+    # Extractions of a window run side by side, each in its own thread
+    assert sorted(pipeline.extracted) == [f"recuerdo {i}" for i in (0, 1, 2, 4)]
+
+    job = queue.get(job_id)
+    assert job.status == "done"
+    assert (job.total, job.done, job.failed) == (5, 5, 1)
+    assert job.throughput is not None  # timed from the claim, first window included
+    stats = pipeline_guardar.IMPORTS.tenant("t1")
+    assert (stats["memories"], stats["failed"]) == (4, 1)
+
+
+def test_window_where_every_memory_fails_is_retried(queue, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_WINDOW", 2)
+    memories = [{"text": "recuerdo 0", "images": []}, {"text": "recuerdo 1", "images": []}, {"text": "FAIL 2", "images": []}, {"text": "FAIL 3", "images": []}]
+    job_id = queue.enqueue("t1", pipeline_guardar.KG_BULK_IMPORT_JOB, {"memories": memories})
+
+    assert asyncio.run(queue.run_once())
+    job = queue.get(job_id)
+    assert job.status == "pending" and "extracción fallida" in job.error
+    # Only the window that went through is saved: the retry starts at the failed one
+    assert (job.done, job.failed) == (2, 0)
+
+
+def test_retried_bulk_import_resumes_after_the_last_window(queue, pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_WINDOW", 2)
+    memories = [{"text": f"recuerdo {i}", "images": []} for i in range(3)]
+    job_id = queue.enqueue("t1", pipeline_guardar.KG_BULK_IMPORT_JOB, {"memories": memories})
+    queue.progress(job_id, done=2, total=3)
+
+    _drain(queue)
+    assert pipeline.extracted == ["recuerdo 2"]
+    assert queue.get(job_id).done == 3
@@ -0,0 +1,114 @@
+import pytest
+from app.services import container_lifecycle
+from app.services.container_lifecycle import ContainerLifecycle
+
+
+class FakeDocker:
+    """The neo4j_docker functions ContainerLifecycle uses, over an in-memory set of containers"""
+
+    def __init__(self, running, stopped=()):
+        self.running, self.stopped = set(running), set(stopped)
+        self.events = []
+        self.warm = 0
+
+    def container_name(self, tenant_id):
+        return f"c-{tenant_id}"
+
+    def running_tenant_containers(self):
+        return {self.container_name(t) for t in self.running}
+
+    def stop_neo4j_container(self, tenant_id):
+        self.events.append(("stop", tenant_id))
+        self.running.discard(tenant_id)
+        self.stopped.add(tenant_id)
+
+    def start_neo4j_container(self, tenant_id):
+        if tenant_id in self.running:
+            return "bolt://localhost:1", True
+        if tenant_id not in self.stopped:
+            return None
+        self.stopped.discard(tenant_id)
+        self.running.add(tenant_id)
+        return "bolt://localhost:2", False
+
+    def wait_for_bolt(self, uri, auth):
+        self.events.append(("wait", uri))
+
+    def warm_container_count(self):
+        return self.warm
+
+    def start_warm_container(self):
+        self.warm += 1
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def docker(monkeypatch):
+    fake = FakeDocker(running={"idle", "busy"}, stopped={"asleep"})
+    monkeypatch.setattr(container_lifecycle, "neo4j_docker", fake)
+    monkeypatch.setattr(container_lifecycle.settings, "NEO4J_HIBERNATE_AFTER", 100)
+    monkeypatch.setattr(container_lifecycle.settings, "NEO4J_WARM_POOL_SIZE", 2)
+    return fake
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+# ---------- TESTS ----------
+def test_idle_containers_are_released_then_stopped(docker, clock):
+    released = []
+
+    def on_hibernate(tenant_id):
+        released.append(tenant_id)
+        docker.events.append(("release", tenant_id))
+
+    lifecycle = ContainerLifecycle(lambda: ["idle", "busy", "asleep", "byo"], on_hibernate, clock=clock)
+    clock.now = 150
+    lifecycle.touch("busy")
+    clock.now = 200
+
+    assert lifecycle.hibernate_idle() == ["idle"]
+    assert docker.events == [("release", "idle"), ("stop", "idle")]
+    assert docker.running == {"busy"}
+
+
+def test_wake_restarts_and_waits_for_bolt(docker, clock):
+    lifecycle = ContainerLifecycle(lambda: [], lambda t: None, clock=clock)
+
+    assert lifecycle.wake("asleep", ("neo4j", "pwd")) == "bolt://localhost:2"
+    assert docker.events == [("wait", "bolt://localhost:2")]
+    assert lifecycle.wake("busy", ("neo4j", "pwd")) == "bolt://localhost:1"
+    assert lifecycle.wake("byo", ("neo4j", "pwd")) is None
+    assert lifecycle.stats()["woken"] == 1
+
+
+def test_warm_pool_is_topped_up(docker, clock):
+    lifecycle = ContainerLifecycle(lambda: [], lambda t: None, clock=clock)
+    assert lifecycle.fill_warm_pool() == 2
+    assert lifecycle.fill_warm_pool() == 0
+
+
+def test_access_from_another_worker_keeps_the_container_running(docker, clock, monkeypatch):
+    monkeypatch.setattr(container_lifecycle.settings, "NEO4J_ACCESS_WRITE_INTERVAL", 60)
+    saved = {}
+    # Two workers sharing the saved accesses (TenantRow.last_access_at in production)
+    busy_worker = ContainerLifecycle(lambda: ["busy"], lambda t: None, lambda: dict(saved), saved.__setitem__, clock=clock)
+    idle_worker = ContainerLifecycle(lambda: ["idle", "busy"], lambda t: None, lambda: dict(saved), saved.__setitem__, clock=clock)
+
+    clock.now = 150
+    busy_worker.touch("busy")
+    clock.now = 170
+    busy_worker.touch("busy")  # throttled: not written again
+    assert saved == {"busy": 150}
+
+    clock.now = 200
+    assert idle_worker.hibernate_idle() == ["idle"]
+    assert docker.running == {"busy"}
@@ -0,0 +1,214 @@
+import pytest
+from app.services.bounded_store import BoundedSessionMap
+from app.services.conversation_store import InMemoryConversationStore, SQLiteConversationStore, RedisConversationStore
+from app.services.memory_store import MemoryStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class FakeRedis:
+    """Sustituto local de Redis con el subconjunto del API de redis-py que se usa"""
+
+    def __init__(self):
+        self.data, self.ttl = {}, {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        return items[max(len(items) + start, 0) if start < 0 else start:end]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.lrange(key, start, end)
+
+    def expire(self, key, seconds):
+        self.ttl[key] = seconds
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hdel(self, key, field):
+        self.data.get(key, {}).pop(field, None)
+
+
+@pytest.fixture
+def store():
+    return InMemoryConversationStore(max_sessions=3, max_sessions_per_tenant=2, max_messages=3, idle_ttl=0)
+
+
+# ---------- TESTS ----------
+def test_get_missing_does_not_insert(store):
+    assert store.get("t1", "s1") == []
+    assert store.stats()["sessions"] == 0
+
+
+def test_append_and_get(store):
+    store.append("t1", "s1", role="user", content="hola")
+    store.append("t1", "s1", role="assistant", content="adiós")
+    assert [m["content"] for m in store.get("t1", "s1")] == ["hola", "adiós"]
+    assert store.stats()["resident_bytes"] == len("user") + len("hola") + len("assistant") + len("adiós".encode("utf-8"))
+
+
+def test_message_limit_keeps_system_preamble(store):
+    store.append("t1", "s1", role="system", content="preámbulo")
+    for i in range(4):
+        store.append("t1", "s1", role="user", content=str(i))
+    history = store.get("t1", "s1")
+    assert [m["content"] for m in history] == ["preámbulo", "1", "2", "3"]
+    assert store.stats()["evictions"]["message_limit"] == 1
+
+
+def test_per_tenant_limit_evicts_lru(store):
+    store.append("t1", "s1", role="user", content="a")
+    store.append("t1", "s2", role="user", content="b")
+    store.get("t1", "s1")
+    store.append("t1", "s3", role="user", content="c")
+    assert store.get("t1", "s2") == []
+    assert store.get("t1", "s1") != []
+    assert store.stats()["evictions"]["tenant_limit"] == 1
+
+
+def test_global_limit(store):
+    for tenant in ("t1", "t2", "t3", "t4"):
+        store.append(tenant, "s", role="user", content="x")
+    assert store.stats()["sessions"] == 3
+    assert store.get("t1", "s") == []
+    assert store.stats()["evictions"]["global_limit"] == 1
+
+
+def test_idle_ttl():
+    clock = FakeClock()
+    data = BoundedSessionMap(max_sessions=10, max_sessions_per_tenant=10, idle_ttl=60, sizeof=len, clock=clock)
+    data.put(("t1", "s1"), "a")
+    clock.now = 30
+    data.put(("t1", "s2"), "b")
+    clock.now = 70
+    assert data.get(("t1", "s1")) is None
+    assert data.get(("t1", "s2")) == "b"
+    assert data.stats()["evictions"]["ttl"] == 1
+
+
+def test_memory_store_default_and_clear():
+    memories = MemoryStore(max_sessions=10, max_sessions_per_tenant=10, idle_ttl=0)
+    assert memories.get("t1", "s1") == ""
+    memories.set("t1", "s1", "recuerdo")
+    assert memories.get("t1", "s1") == "recuerdo"
+    memories.clear("t1", "s1")
+    assert memories.get("t1", "s1") == ""
+    assert memories.stats()["sessions"] == 0
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteConversationStore(tmp_path / "conversations.db", max_messages=3)
+    if request.param == "redis":
+        return RedisConversationStore(FakeRedis(), max_messages=3, idle_ttl=60)
+    return InMemoryConversationStore(max_sessions=10, max_sessions_per_tenant=10, max_messages=3, idle_ttl=0)
+
+
+def test_backend_window_keeps_preamble(backend):
+    backend.append("t1", "s1", role="system", content="preámbulo")
+    for i in range(5):
+        backend.append("t1", "s1", role="user", content=str(i))
+    assert [m["content"] for m in backend.get("t1", "s1")] == ["preámbulo", "2", "3", "4"]
+    assert [m["content"] for m in backend.get("t1", "s1", last_n=1)] == ["preámbulo", "4"]
+    assert backend.get("t1", "other") == []
+
+
+def test_backend_without_message_limit_returns_everything(backend):
+    backend.max_messages = 0  # unlimited: nothing trimmed and the whole history returned
+    backend.append("t1", "s1", role="system", content="preámbulo")
+    for i in range(5):
+        backend.append("t1", "s1", role="user", content=str(i))
+    assert [m["content"] for m in backend.get("t1", "s1")] == ["preámbulo", "0", "1", "2", "3", "4"]
+
+
+def test_backend_set_and_clear(backend):
+    backend.set("t1", "s1", [{"role": "system", "content": "p"}, {"role": "user", "content": "a"}])
+    assert backend.get("t1", "s1") == [{"role": "system", "content": "p"}, {"role": "user", "content": "a"}]
+    backend.clear("t1", "s1")
+    assert backend.get("t1", "s1") == []
+
+
+def test_backend_state_lives_and_dies_with_the_conversation(backend):
+    backend.append("t1", "s1", role="user", content="hola")
+    backend.set_state("t1", "s1", "summary:p", {"summary": "resumen", "anchor": "abc"})
+    assert backend.get_state("t1", "s1", "summary:p") == {"summary": "resumen", "anchor": "abc"}
+    assert backend.get_state("t1", "s2", "summary:p") is None
+
+    backend.set_state("t1", "s1", "summary:p", None)
+    assert backend.get_state("t1", "s1", "summary:p") is None
+    backend.set_state("t1", "s1", "summary:p", {"summary": "otro"})
+    backend.clear("t1", "s1")
+    assert backend.get_state("t1", "s1", "summary:p") is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = tmp_path / "conversations.db"
+    SQLiteConversationStore(path).append("t1", "s1", role="user", content="hola")
+    assert SQLiteConversationStore(path).get("t1", "s1") == [{"role": "user", "content": "hola"}]
+
+
+def test_sqlite_store_keeps_only_max_messages_turns(tmp_path):
+    store = SQLiteConversationStore(tmp_path / "conversations.db", max_messages=2)
+    store.append("t1", "s1", role="system", content="preámbulo")
+    for i in range(5):
+        store.append("t1", "s1", role="user", content=str(i))
+    store.append("t1", "s2", role="user", content="otra")
+
+    rows = store._conn().execute("SELECT session_id, content FROM conversation_message ORDER BY id").fetchall()
+    assert rows == [("s1", "preámbulo"), ("s1", "3"), ("s1", "4"), ("s2", "otra")]
+
+
+def test_sqlite_store_purges_idle_sessions(tmp_path):
+    store = SQLiteConversationStore(tmp_path / "conversations.db", idle_ttl=60, purge_interval=0)
+    store.append("t1", "old", role="user", content="hola")
+    store.set_state("t1", "old", "summary:p", {"summary": "resumen"})
+    store._conn().execute("UPDATE conversation_message SET created_at = created_at - 120")
+    store._conn().commit()
+
+    store.append("t1", "new", role="user", content="hola")
+    assert store.get("t1", "old") == [] and store.get_state("t1", "old", "summary:p") is None
+    assert store.get("t1", "new") == [{"role": "user", "content": "hola"}]
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.driver_pool import DriverPool
+from app.services.tenant_manager import TenantManager
+
+
+class FakeDriver:
+    def __init__(self, tenant_id, healthy=True):
+        self.tenant_id = tenant_id
+        self.healthy = healthy
+        self.closed = False
+
+    def verify_connectivity(self):
+        if not self.healthy:
+            raise ConnectionError("down")
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def evicted():
+    return []
+
+
+@pytest.fixture
+def pool(clock, evicted):
+    return DriverPool(FakeDriver, max_drivers=2, idle_ttl=100, close_grace=10, on_evict=evicted.append, clock=clock)
+
+
+# ---------- TESTS ----------
+def test_creation_is_single_flight_per_tenant():
+    built, gate = [], threading.Event()
+
+    def slow_factory(tenant_id):
+        built.append(tenant_id)
+        gate.wait(1)
+        return FakeDriver(tenant_id)
+
+    pool = DriverPool(slow_factory, max_drivers=10, idle_ttl=0, close_grace=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get("t1"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    assert pool.items() == []  # still connecting
+    gate.set()
+    for t in threads:
+        t.join()
+    assert built == ["t1"]
+    assert len({id(d) for d in results}) == 1
+
+
+def test_lru_eviction_retires_and_closes_after_grace(pool, clock, evicted):
+    d1 = pool.get("t1")
+    pool.get("t2")
+    pool.touch("t1")
+    pool.get("t3")  # t2 is the least recently used
+    assert evicted == ["t2"]
+    assert sorted(t for t, _ in pool.items()) == ["t1", "t3"]
+    assert pool.get("t1") is d1
+
+    assert pool.reap() == []
+    clock.now += 11
+    assert [d.tenant_id for d in pool.reap()] == ["t2"]
+    assert pool.stats()["evictions"] == {"lru": 1}
+
+
+def test_idle_drivers_are_evicted(pool, clock, evicted):
+    d1 = pool.get("t1")
+    clock.now += 101
+    assert pool.sweep() == ["t1"]
+    assert pool.get("t1") is not d1
+    assert evicted == ["t1"]
+
+
+def test_discard_while_connecting_rebuilds(clock):
+    pool = None
+
+    def factory(tenant_id):
+        if factory.calls == 0:
+            pool.discard(tenant_id, reason="reconfigured")  # credentials changed mid-connect
+        factory.calls += 1
+        return FakeDriver(tenant_id)
+    factory.calls = 0
+
+    pool = DriverPool(factory, max_drivers=2, idle_ttl=0, close_grace=0, clock=clock)
+    driver = pool.get("t1")
+    assert factory.calls == 2
+    stale = pool.reap()
+    assert len(stale) == 1 and stale[0] is not driver
+    assert pool.get("t1") is driver
+
+
+def test_unknown_tenant_does_not_leak_build_locks(pool):
+    def failing(tenant_id):
+        raise ValueError(f"Unknown tenant {tenant_id}")
+    pool._factory = failing
+    with pytest.raises(ValueError):
+        pool.get("nope")
+    assert pool._build_locks == {}
+
+
+def test_health_check_drops_unreachable_drivers(clock):
+    manager = TenantManager()
+    manager._drivers = DriverPool(lambda t: FakeDriver(t, healthy=(t != "down")), max_drivers=10, idle_ttl=0, close_grace=0, clock=clock)
+    up, down = manager.get_driver("up"), manager.get_driver("down")
+
+    assert asyncio.run(manager.check_health()) == 1
+    assert [t for t, _ in manager._drivers.items()] == ["up"]
+    assert down.closed and not up.closed
+    assert manager.stats()["health_failures"] == 1
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import pytest
+from types import SimpleNamespace
+from app.core import embeddings
+from app.core.embeddings import CachedEmbedder, EmbeddingCache, EmbeddingDiskStore
+
+
+class FakeEmbeddingsAPI:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, input, model):
+        self.calls.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(input)])
+
+
+class FakeAsyncEmbeddingsAPI(FakeEmbeddingsAPI):
+    async def create(self, input, model):
+        return super().create(input, model)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    sync_api, async_api = FakeEmbeddingsAPI(), FakeAsyncEmbeddingsAPI()
+    monkeypatch.setattr(embeddings, "openai_client", SimpleNamespace(embeddings=sync_api))
+    monkeypatch.setattr(embeddings, "async_openai_client", SimpleNamespace(embeddings=async_api))
+    return sync_api, async_api
+
+
+# ---------- TESTS ----------
+def test_repeated_queries_hit_the_cache(api):
+    embedder = CachedEmbedder("m", cache=EmbeddingCache(max_size=10))
+    first = embedder.embed_query("hola")
+    assert embedder.embed_query("hola") == first
+    assert asyncio.run(embedder.async_embed_query("hola")) == first
+    assert api[0].calls == [["hola"]]
+    assert api[1].calls == []
+    assert embedder.cache.stats()["hits"] == 2
+
+
+def test_misses_are_batched_and_deduplicated(api):
+    embedder = CachedEmbedder("m", cache=EmbeddingCache(max_size=10), batch_size=2)
+    embedder.embed_query("a")
+    vectors = embedder.embed_documents(["a", "bb", "ccc", "bb", "dddd"])
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0, 2.0, 4.0]
+    assert api[0].calls == [["a"], ["bb", "ccc"], ["dddd"]]
+
+
+def test_async_path_keeps_the_disk_cache_off_the_event_loop(api, tmp_path):
+    threads = []
+
+    class RecordingDiskStore(EmbeddingDiskStore):
+        def get_many(self, keys):
+            threads.append(threading.current_thread())
+            return super().get_many(keys)
+
+        def put_many(self, items):
+            threads.append(threading.current_thread())
+            super().put_many(items)
+
+    embedder = CachedEmbedder("m", cache=EmbeddingCache(max_size=10, disk=RecordingDiskStore(tmp_path / "emb.db")))
+    asyncio.run(embedder.aembed_documents(["a", "bb"]))
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_cache_is_per_model(api):
+    cache = EmbeddingCache(max_size=10)
+    CachedEmbedder("m1", cache=cache).embed_query("hola")
+    CachedEmbedder("m2", cache=cache).embed_query("hola")
+    assert len(api[0].calls) == 2
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2)
+    cache.put_many({("m", "a"): [1.0], ("m", "b"): [2.0]})
+    cache.get_many([("m", "a")])
+    cache.put_many({("m", "c"): [3.0]})
+    assert set(cache.get_many([("m", "a"), ("m", "b"), ("m", "c")])) == {("m", "a"), ("m", "c")}
+
+
+def test_disk_store_survives_restart(api, tmp_path):
+    path = tmp_path / "embeddings.db"
+    CachedEmbedder("m", cache=EmbeddingCache(max_size=10, disk=EmbeddingDiskStore(path))).embed_query("hola")
+    fresh = CachedEmbedder("m", cache=EmbeddingCache(max_size=10, disk=EmbeddingDiskStore(path)))
+    assert fresh.embed_query("hola") == [4.0, 0.0]
+    assert api[0].calls == [["hola"]]
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.conversation_store import SQLiteConversationStore
+from app.services.history_compactor import HistoryCompactor, TokenCounter
+
+
+def _history(turns: int):
+    history = [{"role": "system", "content": "preámbulo"}]
+    for i in range(turns):
+        history.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"mensaje {i} " + "x" * 40})
+    return history
+
+
+@pytest.fixture
+def compactor(monkeypatch):
+    calls = []
+
+    def fake_summarize(self, summary, new_turns):
+        calls.append([m["content"].split()[1] for m in new_turns])
+        return (summary + " " + ",".join(calls[-1])).strip()
+
+    async def fake_asummarize(self, summary, new_turns):
+        return fake_summarize(self, summary, new_turns)
+
+    monkeypatch.setattr(HistoryCompactor, "_summarize", fake_summarize)
+    monkeypatch.setattr(HistoryCompactor, "_asummarize", fake_asummarize)
+    compactor = HistoryCompactor("test_pipeline", budget_tokens=100, keep_recent=2)
+    compactor.calls = calls
+    yield compactor
+    compactor.reset("t1", "s1")
+
+
+# ---------- TESTS ----------
+def test_history_within_budget_is_untouched(compactor):
+    history = _history(2)
+    assert compactor.compact("t1", "s1", history) == history
+    assert compactor.calls == []
+
+
+def test_older_turns_are_folded_into_summary(compactor, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_TOKENS", 35)
+    compacted = compactor.compact("t1", "s1", _history(8))
+
+    assert compacted[0]["content"] == "preámbulo"
+    assert compacted[1]["role"] == "system"
+    assert compacted[1]["content"].startswith("Resumen de la conversación anterior:")
+    assert [m["content"].split()[1] for m in compacted[2:]] == ["5", "6", "7"]
+    assert compactor.calls == [["0", "1", "2", "3", "4"]]
+
+
+def test_summary_is_incremental(compactor, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_TOKENS", 35)
+    compactor.compact("t1", "s1", _history(8))
+    compactor.compact("t1", "s1", _history(8))  # nothing new to fold
+    compacted = compactor.compact("t1", "s1", _history(10))
+
+    assert compactor.calls == [["0", "1", "2", "3", "4"], ["5", "6"]]
+    assert compactor.summary("t1", "s1") == "0,1,2,3,4 5,6"
+    assert [m["content"].split()[1] for m in compacted[2:]] == ["7", "8", "9"]
+
+
+def test_failed_summary_is_retried_on_the_next_turn(compactor, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_TOKENS", 35)
+    compactor.compact("t1", "s1", _history(8))
+    summarize = HistoryCompactor._summarize
+    monkeypatch.setattr(HistoryCompactor, "_summarize", lambda self, summary, new_turns: None)
+    compacted = compactor.compact("t1", "s1", _history(10))
+    assert compacted[1]["content"].endswith("0,1,2,3,4")  # previous summary, anchor unchanged
+
+    monkeypatch.setattr(HistoryCompactor, "_summarize", summarize)
+    compactor.compact("t1", "s1", _history(10))
+    assert compactor.summary("t1", "s1") == "0,1,2,3,4 5,6"
+
+
+def test_keep_recent_wins_over_budget(compactor):
+    compactor.budget_tokens = 1
+    compacted = asyncio.run(compactor.acompact("t1", "s1", _history(6)))
+    assert [m["content"].split()[1] for m in compacted[2:]] == ["4", "5"]
+
+
+def test_reset_drops_summary(compactor):
+    compactor.compact("t1", "s1", _history(8))
+    compactor.reset("t1", "s1")
+    assert compactor.summary("t1", "s1") == ""
+
+
+def test_summary_is_shared_through_the_conversation_store(compactor, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_TOKENS", 35)
+    store = SQLiteConversationStore(tmp_path / "conversations.db")
+    compactor.store = store
+    compactor.compact("t1", "s1", _history(8))
+
+    # Another worker (its own compactor, same store) only folds what is new
+    other = HistoryCompactor("test_pipeline", budget_tokens=100, keep_recent=2, store=store)
+    other.compact("t1", "s1", _history(10))
+    assert compactor.calls == [["0", "1", "2", "3", "4"], ["5", "6"]]
+    assert other.summary("t1", "s1") == "0,1,2,3,4 5,6"
+
+    # The folded turns are still in the history until the store trims them
+    assert not other.folded_out("t1", "s1", _history(10))
+    assert other.folded_out("t1", "s1", _history(10)[:1] + _history(10)[3:])
+
+
+def test_token_counts_are_cached():
+    counter = TokenCounter(max_entries=2)
+    message = {"role": "user", "content": "hola"}
+    assert counter.count(message) == counter.count(dict(message))
+    counter.count({"role": "user", "content": "a"})
+    counter.count({"role": "user", "content": "b"})
+    assert len(counter._cache) == 2
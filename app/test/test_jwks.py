@@ -0,0 +1,108 @@
+import json
+import time
+import pytest
+import jwt
+from jwt import InvalidTokenError, PyJWKClientError
+from jwt.algorithms import RSAAlgorithm
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app.core.jwks import JWKSCache, ClaimsCache
+
+
+def _make_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private_key, jwk
+
+
+@pytest.fixture
+def jwks_file(tmp_path):
+    """JWKS local servido como fichero (file://)"""
+    path = tmp_path / "certs.json"
+
+    def _write(*jwks):
+        path.write_text(json.dumps({"keys": list(jwks)}))
+        return path.as_uri()
+
+    return _write
+
+
+# ---------- TESTS ----------
+def test_key_is_cached_until_ttl(jwks_file):
+    _, jwk1 = _make_key("k1")
+    url = jwks_file(jwk1)
+    cache = JWKSCache(url, ttl=3600, min_refresh_interval=0)
+    assert cache.get_signing_key("k1").key_id == "k1"
+
+    # Removing the key from the source does not affect the cached copy
+    jwks_file()
+    assert cache.get_signing_key("k1").key_id == "k1"
+
+
+def test_unknown_kid_forces_refetch(jwks_file):
+    _, jwk1 = _make_key("k1")
+    _, jwk2 = _make_key("k2")
+    url = jwks_file(jwk1)
+    cache = JWKSCache(url, ttl=3600, min_refresh_interval=0)
+    cache.get_signing_key("k1")
+
+    jwks_file(jwk1, jwk2)
+    assert cache.get_signing_key("k2").key_id == "k2"
+
+
+def test_unknown_kid_refetch_is_rate_limited(jwks_file):
+    _, jwk1 = _make_key("k1")
+    _, jwk2 = _make_key("k2")
+    url = jwks_file(jwk1)
+    cache = JWKSCache(url, ttl=3600, min_refresh_interval=3600)
+    cache.get_signing_key("k1")
+
+    jwks_file(jwk1, jwk2)
+    with pytest.raises(InvalidTokenError):
+        cache.get_signing_key("k2")
+
+
+def test_idp_outage_serves_cached_keys_and_backs_off(jwks_file, tmp_path):
+    _, jwk1 = _make_key("k1")
+    cache = JWKSCache(jwks_file(jwk1), ttl=0, min_refresh_interval=0, retry_delay=3600)
+    cache.get_signing_key("k1")
+
+    (tmp_path / "certs.json").unlink()
+    calls = []
+    fetch = cache._fetch
+    cache._fetch = lambda: calls.append(1) or fetch()
+    assert cache.get_signing_key("k1").key_id == "k1"
+    assert cache.get_signing_key("k1").key_id == "k1"
+    with pytest.raises(InvalidTokenError):
+        cache.get_signing_key("k2")
+    assert len(calls) == 1
+
+    # Nothing cached: the failure surfaces
+    cache.clear()
+    with pytest.raises(PyJWKClientError):
+        cache.get_signing_key("k1")
+
+
+def test_signature_validates_with_cached_key(jwks_file):
+    private_key, jwk1 = _make_key("k1")
+    cache = JWKSCache(jwks_file(jwk1))
+    token = jwt.encode({"sub": "t1", "exp": int(time.time()) + 60}, private_key, algorithm="RS256", headers={"kid": "k1"})
+    key = cache.get_signing_key(jwt.get_unverified_header(token)["kid"]).key
+    assert jwt.decode(token, key, algorithms=["RS256"])["sub"] == "t1"
+
+
+def test_claims_cache_expires_with_token():
+    cache = ClaimsCache(max_size=2)
+    cache.put("valid", {"sub": "a", "exp": time.time() + 60})
+    cache.put("expired", {"sub": "b", "exp": time.time() - 1})
+    assert cache.get("valid")["sub"] == "a"
+    assert cache.get("expired") is None
+
+
+def test_claims_cache_is_bounded():
+    cache = ClaimsCache(max_size=2)
+    exp = time.time() + 60
+    for token in ("t1", "t2", "t3"):
+        cache.put(token, {"sub": token, "exp": exp})
+    assert cache.get("t1") is None
+    assert cache.get("t3")["sub"] == "t3"
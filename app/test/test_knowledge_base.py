@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from app.services import knowledge_base
+from app.services.knowledge_base import NumpyIndexWriter, NumpyKnowledgeBase, get_knowledge_base, KNOWLEDGE_BASE
+
+
+def build(path, vectors, dtype="float32"):
+    texts = [f"pasaje {i} ñ" for i in range(len(vectors))]
+    with NumpyIndexWriter(path, dim=vectors.shape[1], dtype=dtype) as writer:
+        for start in range(0, len(texts), 7):
+            writer.add(texts[start:start + 7], vectors[start:start + 7])
+    return texts
+
+
+# ---------- TESTS ----------
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_numpy_search_matches_brute_force(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 8)).astype(np.float32)
+    texts = build(tmp_path, vectors, dtype)
+    kb = NumpyKnowledgeBase(tmp_path)
+
+    queries = rng.standard_normal((3, 8)).astype(np.float32)
+    results = kb.search_many(queries.tolist(), limit=4)
+
+    stored = vectors.astype(dtype).astype(np.float32)
+    for query, got in zip(queries, results):
+        expected = [texts[i] for i in np.argsort(-(stored @ query))[:4]]
+        assert got == expected
+    assert kb.search(queries[0].tolist(), limit=100) == [texts[i] for i in np.argsort(-(stored @ queries[0]))]
+
+
+def test_empty_index(tmp_path):
+    with NumpyIndexWriter(tmp_path, dim=4):
+        pass
+    assert NumpyKnowledgeBase(tmp_path).search([1.0, 0.0, 0.0, 0.0]) == []
+
+
+def test_backend_is_selected_per_activity_and_loaded_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(knowledge_base.settings, "KNOWLEDGE_BASE_NUMPY_DIR", tmp_path)
+    monkeypatch.setattr(knowledge_base.settings, "KNOWLEDGE_BASE_BACKENDS", {"act": "numpy"})
+    monkeypatch.setattr(knowledge_base, "_knowledge_bases", {})
+    build(tmp_path / "act", np.eye(3, dtype=np.float32))
+
+    kb = get_knowledge_base("act")
+    assert isinstance(kb, NumpyKnowledgeBase)
+    assert get_knowledge_base("act") is kb
+    assert kb.search([0.0, 1.0, 0.0], limit=1) == ["pasaje 1 ñ"]
+    assert get_knowledge_base("otra") is KNOWLEDGE_BASE
+
+
+def test_reseeded_index_gets_a_new_version_and_is_mapped_again(tmp_path):
+    build(tmp_path, np.eye(3, dtype=np.float32))
+    kb = NumpyKnowledgeBase(tmp_path)
+    version = kb.version()
+    assert kb.search([0.0, 1.0, 0.0], limit=1) == ["pasaje 1 ñ"]
+
+    with NumpyIndexWriter(tmp_path, dim=3) as writer:
+        writer.add(["nuevo"], [[0.0, 1.0, 0.0]])
+    assert kb.version() != version
+    assert kb.search([0.0, 1.0, 0.0], limit=3) == ["nuevo"]
+
+
+def test_meta_json_publishes_a_complete_version(tmp_path):
+    build(tmp_path, np.eye(3, dtype=np.float32))
+    with pytest.raises(RuntimeError):
+        with NumpyIndexWriter(tmp_path, dim=3) as writer:
+            writer.add(["a medias"], [[1.0, 0.0, 0.0]])
+            raise RuntimeError("seed interrumpido")
+    # The interrupted write never became visible, and left nothing behind
+    assert NumpyKnowledgeBase(tmp_path).search([1.0, 0.0, 0.0], limit=1) == ["pasaje 0 ñ"]
+    assert len(list(tmp_path.glob("vectors*.bin"))) == 1
+
+    # Each write keeps only the previous version around, for readers that already read meta.json
+    for _ in range(3):
+        build(tmp_path, np.eye(3, dtype=np.float32))
+    assert len(list(tmp_path.glob("vectors*.bin"))) == 2 and not list(tmp_path.glob("*.tmp"))
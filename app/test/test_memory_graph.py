@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from neo4j.time import Date
+from app.services import memory_graph
+from app.services.memory_graph import MemoryGraph, decode_cursor
+
+NODES = [
+    {"label": "Person", "properties": [{"name": "name", "type": "STRING"}, {"name": "birthDate", "type": "DATE"}]},
+    {"label": "Event", "properties": [{"name": "name", "type": "STRING"}, {"name": "fromDate", "type": "DATE"}]},
+]
+RELATIONS = [{"label": "KNOWS", "properties": []}, {"label": "FEATURES_IN", "properties": []}]
+
+
+def person(i):
+    return {"id": f"4:db:{i}", "labels": ["__Entity__", "Person"], "score": 1.0,
+            "props": {"name": f"Persona {i:02d}", "birthDate": Date(1950, 1, i + 1), "embedding": [0.1]},
+            "keys": [f"Persona {i:02d}", f"4:db:{i}"]}
+
+
+class FakeAsyncDriver:
+    """Serves PEOPLE sorted by name, honouring the keyset and LIMIT parameters of the list query"""
+
+    def __init__(self, people):
+        self.people, self.calls = people, []
+
+    async def execute_query(self, query, params, database_=None, routing_=None):
+        self.calls.append((query, params, database_))
+        if "OPTIONAL MATCH (n)-[r]-(m)" in query:  # neighbours of an unknown entity
+            return [], None, None
+        rows = [p for p in self.people if params.get("after_name") is None or p["keys"] > [params["after_name"], params["after_id"]]]
+        return rows[:params["limit"]], None, None
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    driver = FakeAsyncDriver([person(i) for i in range(5)])
+    monkeypatch.setattr(memory_graph.TENANTS, "get_async_driver", lambda tenant_id: driver)
+    monkeypatch.setattr(memory_graph.TENANTS, "get_database", lambda tenant_id: f"db-{tenant_id}")
+    return MemoryGraph(schema=lambda: (NODES, RELATIONS)), driver
+
+
+# ---------- TESTS ----------
+def test_listing_pages_with_cursors_and_returns_only_schema_properties(graph):
+    graph, driver = graph
+    first = asyncio.run(graph.list_entities("t1", "Person", limit=2))
+    assert [e.properties for e in first.items] == [
+        {"name": "Persona 00", "birthDate": "1950-01-01"},
+        {"name": "Persona 01", "birthDate": "1950-01-02"},
+    ]
+    assert first.items[0].label == "Person" and driver.calls[0][2] == "db-t1"
+
+    names, page = [], first
+    while page.next_cursor:
+        page = asyncio.run(graph.list_entities("t1", "Person", limit=2, cursor=page.next_cursor))
+        names += [e.properties["name"] for e in page.items]
+    assert names == ["Persona 02", "Persona 03", "Persona 04"]
+
+
+def test_pages_are_cached_until_the_graph_changes(graph):
+    graph, driver = graph
+    asyncio.run(graph.list_entities("t1", "Person", limit=2))
+    asyncio.run(graph.list_entities("t1", "Person", limit=2))
+    assert len(driver.calls) == 1 and graph.hits == 1
+
+    graph.invalidate("t1")
+    asyncio.run(graph.list_entities("t1", "Person", limit=2))
+    assert len(driver.calls) == 2
+
+
+def test_unknown_labels_types_and_cursors_are_rejected(graph):
+    graph, driver = graph
+    with pytest.raises(ValueError):
+        asyncio.run(graph.list_entities("t1", "Person`) DETACH DELETE n //"))
+    with pytest.raises(ValueError):
+        asyncio.run(graph.neighbors("t1", "4:db:1", rel_type="FROM_CHUNK"))
+    with pytest.raises(ValueError):
+        decode_cursor("no-es-un-cursor", 2)
+    assert driver.calls == []
+
+    # Unknown entity
+    assert asyncio.run(graph.neighbors("t1", "4:db:99")) is None
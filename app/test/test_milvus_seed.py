@@ -0,0 +1,100 @@
+import json
+import re
+from types import SimpleNamespace
+from app.scripts import milvus
+from app.scripts.milvus import iter_paragraphs, iter_chunks, seed_documents
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+class FakeMilvus:
+    """Only what seed_documents uses; filters are the two shapes it builds"""
+
+    def __init__(self):
+        self.rows = {}
+        self.upserts = []
+        self.deletes = []
+
+    def get(self, collection_name, ids, output_fields=None):
+        return [{"id": i} for i in ids if i in self.rows]
+
+    def upsert(self, collection_name, data):
+        self.upserts.append(len(data))
+        for row in data:
+            self.rows[row["id"]] = row
+
+    def query_iterator(self, collection_name, batch_size, filter, output_fields):
+        source = json.loads(re.fullmatch(r"source == (\".*?\")", filter).group(1))
+        ids = [i for i, r in self.rows.items() if r["source"] == source]
+        pages = iter([[{"id": i} for i in ids[start:start + batch_size]] for start in range(0, len(ids), batch_size)])
+        return SimpleNamespace(next=lambda: next(pages, []), close=lambda: None)
+
+    def delete(self, collection_name, ids=None, filter=None):
+        if ids is not None:
+            self.deletes.append(len(ids))
+            doomed = ids
+        else:
+            sources = json.loads(re.fullmatch(r"source not in (\[.*\])", filter).group(1))
+            doomed = [i for i, r in self.rows.items() if r["source"] not in sources]
+        for i in doomed:
+            del self.rows[i]
+        return {"delete_count": len(doomed)} if doomed else {}
+
+
+def texts(client, source):
+    return sorted(r["text"] for r in client.rows.values() if r["source"] == source)
+
+
+# ---------- TESTS ----------
+def test_paragraphs_span_pages_and_long_ones_are_cut():
+    pages = ["Primer párrafo.\n\nSegundo empieza", " y acaba aquí.\n\nTercero"]
+    assert list(iter_paragraphs(pages)) == ["Primer párrafo.", "Segundo empieza y acaba aquí.", "Tercero"]
+
+    chunks = list(iter_chunks(["uno dos tres cuatro cinco", "x"], max_chars=10, min_chars=2))
+    assert chunks == ["uno dos", "tres", "cuatro", "cinco"]
+    assert all(len(c) <= 10 for c in chunks)
+
+
+def test_batches_are_bounded_and_reseed_only_embeds_changes(monkeypatch):
+    monkeypatch.setattr(milvus.settings, "KB_CHUNK_MIN_CHARS", 1)
+    client, embedder = FakeMilvus(), FakeEmbedder()
+    doc_a = ["\n\n".join(f"párrafo {i}" for i in range(7))]
+    doc_b = ["otro documento"]
+
+    stats = seed_documents(client, embedder, [("a.pdf", doc_a), ("b.pdf", doc_b)], batch_size=3, workers=2)
+    assert (stats.chunks, stats.embedded, stats.skipped) == (8, 8, 0)
+    assert max(len(b) for b in embedder.batches) <= 3
+    assert max(client.upserts) <= 3
+
+    # a.pdf: one paragraph edited, one removed; b.pdf dropped from the corpus
+    embedder.batches.clear()
+    doc_a = ["\n\n".join(["párrafo 0 editado"] + [f"párrafo {i}" for i in range(1, 6)])]
+    stats = seed_documents(client, embedder, [("a.pdf", doc_a)], batch_size=3, workers=2)
+
+    assert (stats.embedded, stats.skipped, stats.deleted) == (1, 5, 3)  # 2 of a.pdf, b.pdf
+    # Stale chunks go by primary key, in batches
+    assert client.deletes and max(client.deletes) <= 3
+    assert embedder.batches == [["párrafo 0 editado"]]
+    assert texts(client, "a.pdf") == sorted(["párrafo 0 editado"] + [f"párrafo {i}" for i in range(1, 6)])
+    assert texts(client, "b.pdf") == []
+
+
+def test_seed_only_bumps_the_version_when_the_corpus_changes(monkeypatch, tmp_path):
+    monkeypatch.setattr(milvus.settings, "KB_CHUNK_MIN_CHARS", 1)
+    client, versions = FakeMilvus(), []
+    monkeypatch.setattr(milvus, "KNOWLEDGE_BASE", SimpleNamespace(client=client, set_version=lambda: versions.append(1)))
+    monkeypatch.setattr(milvus, "ensure_collection", lambda client, rebuild=False: False)
+    monkeypatch.setattr(milvus, "get_embedder", lambda model: FakeEmbedder())
+    monkeypatch.setattr(milvus, "iter_pages", lambda path: ["un párrafo"])
+    (tmp_path / "a.pdf").write_bytes(b"")
+
+    milvus.seed(str(tmp_path / "*.pdf"))
+    milvus.seed(str(tmp_path / "*.pdf"))  # nothing new, nothing removed
+    assert versions == [1]
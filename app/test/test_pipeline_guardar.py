@@ -0,0 +1,109 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from app.pipelines.pipeline_guardar import PipelineGuardar
+from app.services.conversation_store import CONVERSATIONS
+from app.services.history_compactor import HistoryCompactor
+from app.models.schemas import EndConversationResponse
+
+DELAY = 0.2
+
+
+class FakeOpenAI:
+    """Classifier (responses) and chat (chat.completions) calls that both take DELAY seconds"""
+
+    def __init__(self, fin: bool):
+        self.fin, self.calls = fin, []
+        self.responses = SimpleNamespace(create=self._classify)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def _classify(self, **kwargs):
+        self.calls.append("classifier")
+        time.sleep(DELAY)
+        return SimpleNamespace(output_text="True" if self.fin else "False")
+
+    def _chat(self, **kwargs):
+        self.calls.append("chat")
+        time.sleep(DELAY)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="¿Con quién fuiste?"))])
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    def __init__(self, fin: bool):
+        super().__init__(fin)
+        self.responses = SimpleNamespace(create=self._aclassify)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._achat))
+
+    async def _aclassify(self, **kwargs):
+        self.calls.append("classifier")
+        await asyncio.sleep(DELAY)
+        return SimpleNamespace(output_text="True" if self.fin else "False")
+
+    async def _achat(self, **kwargs):
+        self.calls.append("chat")
+        await asyncio.sleep(DELAY)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="¿Con quién fuiste?"))])
+
+
+def _pipeline(fin: bool, monkeypatch) -> PipelineGuardar:
+    # Skip __init__: no Neo4j driver or KG builder needed for the chat turn
+    pipeline = object.__new__(PipelineGuardar)
+    pipeline.tenant_id = "guardar-test"
+    pipeline.clientOpenAI = FakeOpenAI(fin)
+    pipeline.async_clientOpenAI = FakeAsyncOpenAI(fin)
+    pipeline.vision_llm = pipeline.async_vision_llm = None
+    pipeline.compactor = HistoryCompactor(PipelineGuardar.id, budget_tokens=0)
+
+    def finalizar(tenant_id, session_id):
+        CONVERSATIONS.clear(tenant_id, session_id)
+        return EndConversationResponse(message="fin")
+
+    async def afinalizar(tenant_id, session_id):
+        return finalizar(tenant_id, session_id)
+
+    monkeypatch.setattr(pipeline, "finalizar_conversacion", finalizar)
+    monkeypatch.setattr(pipeline, "afinalizar_conversacion", afinalizar)
+    return pipeline
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    yield
+    CONVERSATIONS.clear("guardar-test", "s1")
+
+
+def _turns():
+    return [(m["role"], m["content"]) for m in CONVERSATIONS.get("guardar-test", "s1") if m["role"] != "system"]
+
+
+# ---------- TESTS ----------
+def test_classifier_and_chat_run_concurrently(monkeypatch):
+    pipeline = _pipeline(False, monkeypatch)
+    started = time.perf_counter()
+    assert pipeline.invoke("guardar-test", "s1", "Fui a un concierto", []) == "¿Con quién fuiste?"
+    assert time.perf_counter() - started < 2 * DELAY
+    assert _turns() == [("user", "Fui a un concierto"), ("assistant", "¿Con quién fuiste?")]
+
+
+def test_async_classifier_and_chat_run_concurrently(monkeypatch):
+    pipeline = _pipeline(False, monkeypatch)
+    started = time.perf_counter()
+    assert asyncio.run(pipeline.ainvoke("guardar-test", "s1", "Fui a un concierto", [])) == "¿Con quién fuiste?"
+    assert time.perf_counter() - started < 2 * DELAY
+    assert _turns() == [("user", "Fui a un concierto"), ("assistant", "¿Con quién fuiste?")]
+
+
+def test_chat_answer_is_discarded_when_ending(monkeypatch):
+    pipeline = _pipeline(True, monkeypatch)
+    assert pipeline.invoke("guardar-test", "s1", "Creo que ya lo tienes todo", []) == "fin"
+    assert asyncio.run(pipeline.ainvoke("guardar-test", "s1", "Creo que ya lo tienes todo", [])) == "fin"
+    assert _turns() == []
+
+
+@pytest.mark.parametrize("text", ["END_MEMORY", "Eso es todo.", "  finalizar CONVERSACION!"])
+def test_local_fast_path_skips_the_models(monkeypatch, text):
+    pipeline = _pipeline(False, monkeypatch)
+    assert pipeline.invoke("guardar-test", "s1", text, []) == "fin"
+    assert asyncio.run(pipeline.ainvoke("guardar-test", "s1", text, [])) == "fin"
+    assert pipeline.clientOpenAI.calls == pipeline.async_clientOpenAI.calls == []
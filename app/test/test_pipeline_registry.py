@@ -0,0 +1,61 @@
+import pytest
+from app.services.pipeline_registry import PipelineRegistry, RegisteredPipeline
+
+
+class DummyPipeline:
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+
+
+@pytest.fixture
+def builds():
+    return []
+
+
+@pytest.fixture
+def registry(builds):
+    def _builder(tenant_id: str) -> DummyPipeline:
+        builds.append(tenant_id)
+        return DummyPipeline(tenant_id)
+
+    reg = PipelineRegistry(max_instances=2, idle_ttl=0)
+    reg.register(RegisteredPipeline(id="dummy", name="Dummy", description="Dummy", factory=_builder))
+    return reg
+
+
+# ---------- TESTS ----------
+def test_instance_is_reused(registry, builds):
+    p1 = registry.get_instance("dummy", "t1")
+    p2 = registry.get_instance("dummy", "t1")
+    assert p1 is p2
+    assert builds == ["t1"]
+
+
+def test_lru_eviction(registry, builds):
+    registry.get_instance("dummy", "t1")
+    registry.get_instance("dummy", "t2")
+    registry.get_instance("dummy", "t1")
+    registry.get_instance("dummy", "t3")  # evicts t2, least recently used
+    registry.get_instance("dummy", "t1")
+    registry.get_instance("dummy", "t2")
+    assert builds == ["t1", "t2", "t3", "t2"]
+
+
+def test_invalidate_tenant(registry, builds):
+    p1 = registry.get_instance("dummy", "t1")
+    registry.invalidate_tenant("t1")
+    p2 = registry.get_instance("dummy", "t1")
+    assert p1 is not p2
+    assert builds == ["t1", "t1"]
+
+
+def test_build_locks_leave_with_their_instances(registry):
+    for tenant_id in ("t1", "t2", "t3"):
+        registry.get_instance("dummy", tenant_id)
+    registry.invalidate_tenant("t3")
+    assert set(registry._build_locks) == {("dummy", "t2")}
+
+
+def test_unknown_pipeline(registry):
+    with pytest.raises(KeyError):
+        registry.get_instance("missing", "t1")
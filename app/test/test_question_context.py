@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+import pytest
+from sqlmodel import SQLModel, create_engine
+from app.models.schemas import QuestionDetail
+from app.services.question_context import QuestionContextStore, QuestionContextInfo
+from app.pipelines import pipeline_historia
+from app.pipelines.pipeline_historia import PipelineHistoria
+
+QUESTION = QuestionDetail(id="q01", activity_id="act", contexto="Los cántabros", pregunta="¿Con quién limitaban?", respuesta_correcta="Astures")
+
+
+class FakeEmbedder:
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [1.0, 0.0]
+
+
+class FakeKnowledgeBase:
+    def __init__(self):
+        self.calls = 0
+        self.seed = "v1"
+
+    def version(self):
+        return self.seed
+
+    def search(self, vector, limit=3):
+        self.calls += 1
+        return ["Los astures vivían al oeste", "Los autrigones al este"][:limit]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'questions.db'}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+# ---------- TESTS ----------
+def test_context_is_computed_once_and_persisted(engine):
+    embedder, kb = FakeEmbedder(), FakeKnowledgeBase()
+    store = QuestionContextStore(engine=engine, knowledge_base=kb, embedder=embedder, top_k=2)
+    info = store.get_or_compute(QUESTION)
+    assert info.passages == ["Los astures vivían al oeste", "Los autrigones al este"]
+    assert store.get_or_compute(QUESTION) == info
+
+    # A fresh process reads the row instead of embedding / searching again
+    fresh = QuestionContextStore(engine=engine, knowledge_base=kb, embedder=embedder, top_k=2)
+    assert fresh.get_or_compute(QUESTION) == info
+    assert len(embedder.calls) == 1 and kb.calls == 1
+
+
+def test_reseeded_knowledge_base_is_searched_again(engine):
+    embedder, kb = FakeEmbedder(), FakeKnowledgeBase()
+    store = QuestionContextStore(engine=engine, knowledge_base=kb, embedder=embedder)
+    store.get_or_compute(QUESTION)
+
+    kb.seed = "v2"
+    assert store.get(QUESTION) is None
+    assert QuestionContextStore(engine=engine, knowledge_base=kb, embedder=embedder).get(QUESTION) is None
+    assert store.get_or_compute(QUESTION).kb_version == "v2" and kb.calls == 2
+
+
+def test_changed_question_is_recomputed(engine):
+    embedder, kb = FakeEmbedder(), FakeKnowledgeBase()
+    store = QuestionContextStore(engine=engine, knowledge_base=kb, embedder=embedder)
+    store.get_or_compute(QUESTION)
+    store.get_or_compute(QUESTION.model_copy(update={"pregunta": "¿Y al sur?"}))
+    assert kb.calls == 2
+
+
+@pytest.mark.parametrize("probe, live", [([0.9, 0.1], False), ([0.0, 1.0], True)])
+def test_historia_reuses_precomputed_context_unless_drifting(monkeypatch, probe, live):
+    topic_calls = []
+    precomputed = QuestionContextInfo("h", [1.0, 0.0], ["pasaje precalculado"])
+    monkeypatch.setattr(pipeline_historia, "QUESTION_CONTEXTS", SimpleNamespace(get_or_compute=lambda q: precomputed))
+    monkeypatch.setattr(pipeline_historia, "openai_client", SimpleNamespace(responses=SimpleNamespace(
+        create=lambda **kwargs: topic_calls.append(kwargs) or SimpleNamespace(output_text="astures"))))
+
+    pipeline = object.__new__(PipelineHistoria)
+    monkeypatch.setattr(pipeline, "emb_text", lambda text: probe)
+    monkeypatch.setattr(pipeline, "get_rag_context", lambda topic, activity_id=None: f"búsqueda en vivo: {topic}")
+
+    history = [{"role": "system", "content": "preámbulo"}, {"role": "assistant", "content": "¿Con quién limitaban?"}, {"role": "user", "content": "astures"}]
+    context = pipeline._rag_context(QUESTION, history)
+    assert context == ("búsqueda en vivo: astures" if live else "pasaje precalculado")
+    assert len(topic_calls) == int(live)
+    assert pipeline._with_context(history, context)[1]["role"] == "system"
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+import pytest
+from neo4j_graphrag.types import RetrieverResultItem
+from app.services.retrieval import FusedRetriever, GraphExpansion, lucene_query
+from app.services.conversation_store import CONVERSATIONS
+from app.services.memory_store import MEMORIES
+from app.services.history_compactor import HistoryCompactor
+from app.pipelines.pipeline_preguntas import PipelinePreguntas
+from app.pipelines.pipeline_recuperar import PipelineRecuperar
+from neo4j_graphrag.generation import RagTemplate
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [0.1, 0.2]
+
+    async def async_embed_query(self, text):
+        return self.embed_query(text)
+
+
+class FakeRetriever:
+    def __init__(self, items, barrier=None, fail=False):
+        self.items, self.barrier, self.fail, self.vectors = items, barrier, fail, []
+
+    def search(self, query_vector=None, top_k=5):
+        self.vectors.append(query_vector)
+        if self.barrier:
+            self.barrier.wait(timeout=2)  # only passes if both searches run at the same time
+        if self.fail:
+            raise RuntimeError("neo4j down")
+        return SimpleNamespace(items=self.items)
+
+
+GRAPH = [RetrieverResultItem(content="Fuimos a la playa de Laredo\nAna - KNOWS amiga -> Luis\nAna - KNOWS amiga -> Luis")]
+VECTOR = [
+    RetrieverResultItem(content="Comimos paella", metadata={"score": 0.7}),
+    RetrieverResultItem(content="Fuimos a la playa de Laredo", metadata={"score": 0.9}),
+]
+
+
+# ---------- TESTS ----------
+def test_fused_search_shares_embedding_and_runs_in_parallel():
+    barrier = threading.Barrier(2)
+    embedder = FakeEmbedder()
+    graph, vector = FakeRetriever(GRAPH, barrier), FakeRetriever(VECTOR, barrier)
+    context = FusedRetriever(embedder, graph, vector).search("playa")
+
+    assert embedder.calls == 1
+    assert graph.vectors == vector.vectors == [[0.1, 0.2]]
+    assert context.passages == ["Fuimos a la playa de Laredo", "Comimos paella"]
+    assert context.facts == ["Ana - KNOWS amiga -> Luis"]
+
+
+def test_fused_search_survives_one_failing_retriever():
+    embedder = FakeEmbedder()
+    context = asyncio.run(FusedRetriever(embedder, FakeRetriever(GRAPH, fail=True), FakeRetriever(VECTOR)).asearch("playa"))
+    assert context.text() == "Fuimos a la playa de Laredo\nComimos paella"
+
+    empty = FusedRetriever(embedder, FakeRetriever([], fail=True), FakeRetriever([])).search("nada")
+    assert not empty and empty.text() == ""
+
+
+def test_preguntas_resolves_gate_and_topic_in_one_call(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if "text" in kwargs:
+            return SimpleNamespace(output_text=json.dumps({"same_memory": False, "topic": "viaje a Laredo"}))
+        return SimpleNamespace(output_text="¿Con quién fuiste a la playa?")
+
+    pipeline = object.__new__(PipelinePreguntas)
+    pipeline.tenant_id = "preguntas-test"
+    pipeline.clientOpenAI = SimpleNamespace(responses=SimpleNamespace(create=create))
+    pipeline.compactor = HistoryCompactor(PipelinePreguntas.id, budget_tokens=0)
+    pipeline.retriever = FusedRetriever(FakeEmbedder(), FakeRetriever(GRAPH), FakeRetriever(VECTOR))
+    try:
+        assert pipeline.invoke("preguntas-test", "s1", "Pregúntame por Laredo", []) == "¿Con quién fuiste a la playa?"
+        assert len(calls) == 2  # resolution + quiz, no RAG generation
+        assert "Fuimos a la playa de Laredo" in calls[1]["instructions"]
+        assert MEMORIES.get("preguntas-test", "s1").startswith("Fuimos a la playa de Laredo")
+    finally:
+        CONVERSATIONS.clear("preguntas-test", "s1")
+        MEMORIES.clear("preguntas-test", "s1")
+
+
+def test_unparseable_resolution_falls_back_to_new_topic():
+    pipeline = object.__new__(PipelinePreguntas)
+    assert pipeline._parse_resolucion("True", "mi boda") == (False, "mi boda")
+
+
+def test_facts_keep_graph_relevance_and_break_ties_by_passages():
+    facts = ["Pedro - OWNS -> coche", "Ana - KNOWS -> Luis", "Luis - LIVES_IN -> Laredo"]
+    passages = ["Ana y Luis en Laredo", "El coche de Pedro"]
+    assert FusedRetriever._rank_facts(facts[:2], passages) == ["Ana - KNOWS -> Luis", "Pedro - OWNS -> coche"]
+
+    relevance = {"Pedro - OWNS -> coche": 0.9, "Ana - KNOWS -> Luis": 0.5, "Luis - LIVES_IN -> Laredo": 0.9}
+    assert FusedRetriever._rank_facts(facts, passages, relevance) == ["Luis - LIVES_IN -> Laredo", "Pedro - OWNS -> coche", "Ana - KNOWS -> Luis"]
+
+
+def test_recuperar_makes_a_single_generation(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Fuiste a Laredo con Ana."))])
+
+    monkeypatch.setattr("app.pipelines.pipeline_recuperar.openai_client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    pipeline = object.__new__(PipelineRecuperar)
+    pipeline.rag_template = RagTemplate()
+    pipeline.retriever = FusedRetriever(FakeEmbedder(), FakeRetriever(GRAPH), FakeRetriever(VECTOR, fail=True))
+    try:
+        assert pipeline.invoke("recuperar-test", "s1", "¿Dónde fui?", []) == "Fuiste a Laredo con Ana."
+        assert len(calls) == 1
+        assert "Ana - KNOWS amiga -> Luis" in calls[0]["messages"][1]["content"]
+    finally:
+        CONVERSATIONS.clear("recuperar-test", "s1")
+
+
+class FakeFulltext:
+    def __init__(self, items):
+        self.items, self.queries = items, []
+
+    def search(self, query_text, top_k=5):
+        self.queries.append(query_text)
+        return SimpleNamespace(items=self.items)
+
+
+def test_hybrid_search_fuses_keyword_hits_by_reciprocal_rank():
+    vector = [
+        RetrieverResultItem(content="Comimos paella", metadata={"score": 0.9}),
+        RetrieverResultItem(content="Ana vive en Santander", metadata={"score": 0.5}),
+        RetrieverResultItem(content="Llovía mucho", metadata={"score": 0.4}),
+    ]
+    fulltext = FakeFulltext([RetrieverResultItem(content="Ana vive en Santander"), RetrieverResultItem(content="Ana y Luis")])
+    retriever = FusedRetriever(FakeEmbedder(), FakeRetriever([]), FakeRetriever(vector), fulltext_retriever=fulltext, rrf_k=60)
+
+    context = retriever.search("¿Dónde vive Ana?")
+    assert fulltext.queries == ["¿Dónde vive Ana?"]
+    # In both lists beats first in one; keyword-only hits still make it in
+    assert context.passages == ["Ana vive en Santander", "Comimos paella", "Ana y Luis", "Llovía mucho"]
+
+    # A failing keyword search degrades to the vector ranking
+    fulltext.search = lambda query_text, top_k=5: (_ for _ in ()).throw(RuntimeError("no index"))
+    context = asyncio.run(retriever.asearch("¿Dónde vive Ana?"))
+    assert context.passages == ["Comimos paella", "Ana vive en Santander", "Llovía mucho"]
+
+
+def test_lucene_query_keeps_only_plain_terms():
+    assert lucene_query("¿Dónde vive Ana? (Santander) AND*") == "dónde OR vive OR ana OR santander OR and"
+    assert lucene_query("¿y tú?") == ""
+
+
+def test_graph_expansion_cuts_facts_to_the_token_budget_and_reports_stats():
+    expansion = GraphExpansion(token_budget=12)
+    record = {"facts": ["Ana - KNOWS amiga -> Luis", None, "Ana - LIVES_IN -> Santander", "Luis - OWNS -> coche rojo"],
+              "relevances": [0.9, 0.8, 0.8, 0.7],
+              "stats": {"expanded": 40, "entities": 3, "hubs_skipped": 1}}
+
+    item = expansion.format(record)
+    kept = item.content.split("\n")
+    assert kept[0] == "Ana - KNOWS amiga -> Luis" and 0 < len(kept) < 3
+    stats = item.metadata["expansion"]
+    assert stats["facts"] == 3 and stats["facts_kept"] == len(kept) and 0 < stats["tokens"] <= 12
+    assert stats["hubs_skipped"] == 1
+    assert item.metadata["relevance"]["Ana - KNOWS amiga -> Luis"] == 0.9
+    assert expansion.stats()["truncated"] == 1
+
+    class ParamRetriever(FakeRetriever):
+        def search(self, query_vector=None, top_k=5, query_params=None):
+            self.params = query_params
+            return super().search(query_vector=query_vector, top_k=top_k)
+
+    graph = ParamRetriever([item])
+    context = FusedRetriever(FakeEmbedder(), graph, FakeRetriever(VECTOR), graph_params=expansion.params).search("Ana")
+    assert graph.params["max_fanout"] == expansion.params["max_fanout"]
+    assert context.facts[0] == "Ana - KNOWS amiga -> Luis"
+    assert context.stats["expanded"] == 40
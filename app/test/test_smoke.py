@@ -5,4 +5,20 @@ def test_health():
     client = TestClient(app)
     r = client.get("/health")
     assert r.status_code == 200
-    assert r.json()["status"] == "ok"
\ No newline at end of file
+    assert r.json()["status"] == "ok"
+
+
+def test_memories_status_is_mounted_and_authenticated(monkeypatch):
+    from app.api.v1.deps import get_current_tenant_id
+    from app.models.schemas import TenantStatus
+    from app.services.tenant_manager import TENANTS
+
+    client = TestClient(app)
+    assert client.get("/v1/memories/status").status_code in (401, 403)
+
+    monkeypatch.setattr(TENANTS, "status", lambda tenant_id: TenantStatus(tenant_id=tenant_id, status="starting"))
+    app.dependency_overrides[get_current_tenant_id] = lambda: "t1"
+    try:
+        assert client.get("/v1/memories/status").json() == {"tenant_id": "t1", "status": "starting", "error": None}
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.v1.deps import get_current_tenant_id
+from app.services.pipeline_registry import PIPELINES
+from app.services.retrieval import FusedRetriever, RetrievedContext
+from app.utils.streaming import sse_events, stream_chat_completion, aiter_text
+
+
+class FakeCompletions:
+    def create(self, stream=False, **kwargs):
+        assert stream
+        for text in ("Hola", " ", "mundo", None):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeClient:
+    chat = SimpleNamespace(completions=FakeCompletions())
+
+
+class FakePipeline:
+    def invoke(self, tenant_id, session_id, user_message, messages, stream=False):
+        return iter(["uno", "dos"]) if stream else "unodos"
+
+
+class FakeAsyncPipeline:
+    async def ainvoke(self, tenant_id, session_id, user_message, messages, stream=False):
+        return aiter_text(f"{tenant_id}:{user_message}") if stream else f"{tenant_id}:{user_message}"
+
+
+class FakeRetrievingPipeline:
+    """Sync pipeline (runs in the threadpool) whose retrieval goes through FusedRetriever._record"""
+
+    def invoke(self, tenant_id, session_id, user_message, messages, stream=False):
+        context = RetrievedContext(passages=["p1", "p2"], facts=["a - CONOCE -> b"], stats={"expanded": 3})
+        return FusedRetriever._record(user_message, context).text()
+
+
+def _parse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines.get("event"), json.loads(lines["data"])))
+    return events
+
+
+# ---------- TESTS ----------
+def test_stream_chat_completion_calls_on_complete():
+    completed = []
+    deltas = list(stream_chat_completion(FakeClient(), on_complete=completed.append, model="m", messages=[]))
+    assert deltas == ["Hola", " ", "mundo"]
+    assert completed == ["Hola mundo"]
+
+
+def test_sse_events_end_with_done():
+    events = _parse("".join(sse_events(iter(["a", "b"]))))
+    assert events == [(None, {"delta": "a"}), (None, {"delta": "b"}), ("done", {"output": "ab"})]
+
+
+def test_invoke_endpoint_streams(monkeypatch):
+    monkeypatch.setattr(PIPELINES, "get_instance", lambda pipeline_id, tenant_id: FakePipeline())
+    app.dependency_overrides[get_current_tenant_id] = lambda: "t1"
+    try:
+        client = TestClient(app)
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola", "stream": True})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert _parse(r.text)[-1] == ("done", {"output": "unodos"})
+
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola"})
+        assert r.json() == {"output": "unodos"}
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_invoke_endpoint_uses_ainvoke(monkeypatch):
+    monkeypatch.setattr(PIPELINES, "get_instance", lambda pipeline_id, tenant_id: FakeAsyncPipeline())
+    app.dependency_overrides[get_current_tenant_id] = lambda: "t1"
+    try:
+        client = TestClient(app)
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola"})
+        assert r.json() == {"output": "t1:hola"}
+
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola", "stream": True})
+        assert _parse(r.text) == [(None, {"delta": "t1:hola"}), ("done", {"output": "t1:hola"})]
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_invoke_endpoint_returns_retrieval_stats_in_debug(monkeypatch):
+    monkeypatch.setattr(PIPELINES, "get_instance", lambda pipeline_id, tenant_id: FakeRetrievingPipeline())
+    app.dependency_overrides[get_current_tenant_id] = lambda: "t1"
+    try:
+        client = TestClient(app)
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola", "debug": True})
+        assert r.json()["metadata"] == {"retrieval": [{"query": "hola", "passages": 2, "facts": 1, "expanded": 3}]}
+
+        r = client.post("/v1/memories/invoke", json={"pipeline_id": "fake", "user_message": "hola"})
+        assert "metadata" not in r.json()
+    finally:
+        app.dependency_overrides.clear()
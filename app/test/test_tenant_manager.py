@@ -0,0 +1,148 @@
+import re
+import threading
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+from app.core.db import ensure_columns
+from app.infrastructure.neo4j_databases import database_name
+from app.models.schemas import TenantCreate
+from app.services import tenant_manager, tenant_schema
+from app.services.tenant_manager import TenantManager, TenantNotReadyError
+from app.services.tenant_schema import SCHEMA_VERSION, TenantSchema
+
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+
+    def execute_query(self, query, database_=None):
+        self.queries.append((database_, query))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # A file, not StaticPool: provisioning threads need their own connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenants.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(tenant_manager, "engine", engine)
+    monkeypatch.setattr(tenant_schema, "engine", engine)
+    return engine
+
+
+@pytest.fixture
+def manager(engine, monkeypatch):
+    monkeypatch.setattr(tenant_manager.settings, "NEO4J_PROVISIONING_MODE", "database")
+    monkeypatch.setattr(tenant_manager, "ensure_database_for_tenant", lambda driver, tenant_id: database_name(tenant_id))
+    manager = TenantManager()
+    shared = FakeDriver()
+    monkeypatch.setattr(manager, "_shared", lambda: shared)
+    return manager
+
+
+def wait_until(manager, tenant_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while manager.status(tenant_id).status != status:
+        assert time.monotonic() < deadline, manager.status(tenant_id)
+        time.sleep(0.01)
+
+
+# ---------- TESTS ----------
+def test_database_names_are_valid_and_distinct():
+    names = {database_name(t) for t in ["Ana_García", "ana-garcía", "ÑÑÑ", "x" * 200]}
+    assert len(names) == 4
+    assert all(re.fullmatch(r"[a-z][a-z0-9-]{2,62}", n) for n in names)
+
+
+def test_tenants_share_one_driver_and_get_their_own_database(manager):
+    manager.register(TenantCreate(tenant_id="t1"))
+    manager.register(TenantCreate(tenant_id="t2"))
+    wait_until(manager, "t1", "ready")
+    wait_until(manager, "t2", "ready")
+
+    assert manager.get_driver("t1") is manager.get_driver("t2")
+    assert manager.get_database("t1") == database_name("t1") != manager.get_database("t2")
+    assert manager.get("t1").neo4j_password == ""
+    assert manager.stats()["drivers"]["drivers"] == 1
+    # Each database got its indexes during provisioning
+    migrated = {db for db, _ in manager.get_driver("t1").queries}
+    assert migrated == {database_name("t1"), database_name("t2")}
+
+
+def test_existing_tables_gain_new_nullable_columns():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE tenantrow (tenant_id VARCHAR PRIMARY KEY, neo4j_uri VARCHAR NOT NULL, neo4j_user VARCHAR NOT NULL, neo4j_password VARCHAR NOT NULL)"))
+    ensure_columns(engine)
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(tenantrow)"))]
+    assert "neo4j_database" in columns
+
+
+def test_container_provisioning_runs_in_background_and_in_parallel(engine, monkeypatch):
+    monkeypatch.setattr(tenant_manager.settings, "NEO4J_PROVISIONING_MODE", "container")
+    started, release = [], threading.Event()
+
+    def slow_container(tenant_id, existing_password):
+        started.append(tenant_id)
+        assert release.wait(5)
+        if tenant_id == "broken":
+            raise RuntimeError("No se puede conectar con Docker")
+        return f"bolt://localhost:{7000 + len(tenant_id)}", "neo4j", existing_password or "auto"
+
+    monkeypatch.setattr(tenant_manager, "ensure_neo4j_for_tenant", slow_container)
+    monkeypatch.setattr(tenant_manager, "wait_for_bolt", lambda uri, auth: None)
+    monkeypatch.setattr(tenant_manager.TENANT_SCHEMA, "ensure", lambda tenant_id, driver, database: SCHEMA_VERSION)
+    manager = TenantManager()
+    monkeypatch.setattr(manager.lifecycle, "wake", lambda tenant_id, auth: None)
+
+    assert manager.register(TenantCreate(tenant_id="alumno1", neo4j_password="secreto")).status == "pending"
+    manager.register(TenantCreate(tenant_id="broken"))
+    deadline = time.monotonic() + 5
+    while len(started) < 2:  # both containers start before either finishes
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with pytest.raises(TenantNotReadyError):
+        manager.get_driver("alumno1")
+
+    release.set()
+    wait_until(manager, "alumno1", "ready")
+    wait_until(manager, "broken", "failed")
+    assert manager.get("alumno1").neo4j_password == "secreto"
+    assert "Docker" in manager.status("broken").error
+    manager.close_all()
+
+
+def test_schema_is_derived_from_guardar_nodes_and_applied_once_per_tenant(manager):
+    nodes = [
+        {"label": "Person", "properties": [{"name": "uuid", "type": "STRING"}, {"name": "name", "type": "STRING"},
+                                           {"name": "birthDate", "type": "DATE"}, {"name": "gender", "type": "STRING"}]},
+        {"label": "Smell", "properties": [{"name": "name", "type": "STRING"}]},
+    ]
+    manager.register(TenantCreate(tenant_id="t1", neo4j_uri="bolt://x:7687", neo4j_user="neo4j", neo4j_password="pw"))
+    driver = FakeDriver()
+
+    assert TenantSchema(nodes=lambda: nodes).ensure("t1", driver) == SCHEMA_VERSION
+    queries = [q for _, q in driver.queries]
+    assert any("VECTOR INDEX text_embeddings IF NOT EXISTS" in q for q in queries)
+    # The KG writer creates duplicates before resolving them: uuid is indexed, never unique
+    assert any("(n:`Person`) ON (n.`uuid`)" in q for q in queries)
+    assert not any("IS UNIQUE" in q for q in queries)
+    assert any("(n:`Person`) ON (n.`birthDate`)" in q for q in queries)
+    assert any("(n:`Smell`) ON (n.`name`)" in q for q in queries)
+    assert not any("gender" in q for q in queries)
+    assert any("FOR (n:`Person`|`Smell`) ON EACH" in q for q in queries)
+
+    # Another process only reads the version from SQLite
+    driver.queries.clear()
+    other = TenantSchema(nodes=lambda: nodes)
+    assert other.ensure("t1", driver) == SCHEMA_VERSION and driver.queries == []
+
+    # New credentials point to another graph: migrated again
+    manager.register(TenantCreate(tenant_id="t1", neo4j_uri="bolt://y:7687", neo4j_user="neo4j", neo4j_password="pw"))
+    assert manager.get("t1") and TenantSchema(nodes=lambda: nodes).ensure("t1", driver) == SCHEMA_VERSION
+    assert driver.queries
@@ -0,0 +1,100 @@
+import json
+import logging
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def stream_chat_completion(client, on_complete: Optional[Callable[[str], None]] = None, **kwargs) -> Iterator[str]:
+    """Streams the text deltas of a chat.completions call; `on_complete` receives the full text at the end."""
+    parts = []
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    if on_complete:
+        on_complete("".join(parts))
+
+
+def stream_response_text(client, on_complete: Optional[Callable[[str], None]] = None, **kwargs) -> Iterator[str]:
+    """Streams the text deltas of a responses.create call; `on_complete` receives the full text at the end."""
+    parts = []
+    for event in client.responses.create(stream=True, **kwargs):
+        if event.type == "response.output_text.delta" and event.delta:
+            parts.append(event.delta)
+            yield event.delta
+    if on_complete:
+        on_complete("".join(parts))
+
+
+async def astream_chat_completion(client, on_complete: Optional[Callable[[str], None]] = None, **kwargs) -> AsyncIterator[str]:
+    """Async counterpart of `stream_chat_completion` for an AsyncOpenAI client."""
+    parts = []
+    async for chunk in await client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    if on_complete:
+        on_complete("".join(parts))
+
+
+async def astream_response_text(client, on_complete: Optional[Callable[[str], None]] = None, **kwargs) -> AsyncIterator[str]:
+    """Async counterpart of `stream_response_text` for an AsyncOpenAI client."""
+    parts = []
+    async for event in await client.responses.create(stream=True, **kwargs):
+        if event.type == "response.output_text.delta" and event.delta:
+            parts.append(event.delta)
+            yield event.delta
+    if on_complete:
+        on_complete("".join(parts))
+
+
+async def aiter_text(text: str) -> AsyncIterator[str]:
+    """Wraps an already computed answer as a one-chunk async stream."""
+    yield text
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_events(chunks: Iterable[str]) -> Iterator[str]:
+    """Formats a stream of text deltas as Server-Sent Events, ending with a `done` event carrying the full output."""
+    parts = []
+    try:
+        for delta in chunks:
+            parts.append(delta)
+            yield _sse({"delta": delta})
+    except Exception as e:
+        logger.exception("Error while streaming pipeline output")
+        yield _sse({"detail": str(e)}, event="error")
+        return
+    yield _sse({"output": "".join(parts)}, event="done")
+
+
+async def asse_events(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async counterpart of `sse_events`."""
+    parts = []
+    try:
+        async for delta in chunks:
+            parts.append(delta)
+            yield _sse({"delta": delta})
+    except Exception as e:
+        logger.exception("Error while streaming pipeline output")
+        yield _sse({"detail": str(e)}, event="error")
+        return
+    yield _sse({"output": "".join(parts)}, event="done")
+
+
+def sse_response(chunks: Union[Iterable[str], AsyncIterable[str]]) -> StreamingResponse:
+    events = asse_events(chunks) if hasattr(chunks, "__aiter__") else sse_events(chunks)
+    return StreamingResponse(events, media_type="text/event-stream")